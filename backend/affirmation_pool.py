@@ -0,0 +1,206 @@
+"""
+Warm pool of pregenerated affirmations for Wellness Arcade
+A background worker keeps the most requested word sets generated ahead of
+time in the affirmation cache so they are served without an AIML round trip.
+Only the worker holding the pool's leader lock calls the API; it shares what
+it generates through the warm_affirmations table, and every worker loads that
+table into its own cache each cycle.
+"""
+
+import asyncio
+import json
+import os
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+
+import ai_call
+from coordination import LeaderLock
+from database import WarmAffirmation, open_async_session, upsert_insert
+
+# Pool configuration
+AFFIRMATION_POOL_ENABLED = os.getenv("AFFIRMATION_POOL_ENABLED", "true").lower() == "true"
+AFFIRMATION_POOL_SIZE = int(os.getenv("AFFIRMATION_POOL_SIZE", "20"))  # word sets kept warm
+AFFIRMATION_POOL_REFILL_SECONDS = float(os.getenv("AFFIRMATION_POOL_REFILL_SECONDS", "60"))
+AFFIRMATION_POOL_REFILL_BATCH = int(os.getenv("AFFIRMATION_POOL_REFILL_BATCH", "5"))  # generations per cycle
+
+# Word sets kept warm before any traffic has been seen (semicolon separated)
+DEFAULT_POOL_SEEDS = "I,am,strong;I,am,capable;I,am,worthy;I,am,brave;I,am,confident;I,am,grateful"
+AFFIRMATION_POOL_SEEDS = os.getenv("AFFIRMATION_POOL_SEEDS", DEFAULT_POOL_SEEDS)
+
+# Popularity tracking is trimmed back to this many word sets
+MAX_TRACKED_WORD_SETS = 10000
+
+
+def parse_seeds(seeds: str) -> List[List[str]]:
+    return [
+        [word.strip() for word in seed.split(",") if word.strip()]
+        for seed in seeds.split(";")
+        if seed.strip()
+    ]
+
+
+class AffirmationPool:
+    """Tracks word set popularity and refills the most popular ones in the background"""
+
+    def __init__(self, size: int = AFFIRMATION_POOL_SIZE, refill_seconds: float = AFFIRMATION_POOL_REFILL_SECONDS,
+                 refill_batch: int = AFFIRMATION_POOL_REFILL_BATCH, seeds: str = AFFIRMATION_POOL_SEEDS):
+        self.size = size
+        self.refill_seconds = refill_seconds
+        self.refill_batch = refill_batch
+        self.seeds = parse_seeds(seeds)
+        self.request_counts: Counter = Counter()
+        self.words_by_key: Dict[Tuple[str, ...], List[str]] = {}
+        self.pregenerated = set()
+        self.requests = 0
+        self.pool_hits = 0
+        self.refills = 0
+        self.refill_failures = 0
+        self.loaded = 0
+        self.leader_lock = LeaderLock("affirmation_pool")
+        self._task: Optional[asyncio.Task] = None
+
+    def record_request(self, selected_words: List[str]):
+        """Count a generate request; call before generating so pool hits are measured"""
+        key = ai_call.normalize_words(selected_words)
+        self.requests += 1
+        self.request_counts[key] += 1
+        self.words_by_key.setdefault(key, list(selected_words))
+        if key in self.pregenerated and ai_call.affirmation_cache.peek(key) is not None:
+            self.pool_hits += 1
+
+        if len(self.request_counts) > MAX_TRACKED_WORD_SETS:
+            self.request_counts = Counter(dict(self.request_counts.most_common(MAX_TRACKED_WORD_SETS // 2)))
+            self.words_by_key = {key: self.words_by_key[key] for key in self.request_counts}
+
+    def warm_word_sets(self) -> List[Tuple[Tuple[str, ...], List[str]]]:
+        """The word sets to keep warm: most requested first, topped up with seeds"""
+        warm = [(key, self.words_by_key[key]) for key, _ in self.request_counts.most_common(self.size)]
+        seen = {key for key, _ in warm}
+        for words in self.seeds:
+            if len(warm) >= self.size:
+                break
+            key = ai_call.normalize_words(words)
+            if key not in seen:
+                warm.append((key, words))
+                seen.add(key)
+        return warm
+
+    async def refill_once(self) -> int:
+        """Generate missing or soon-to-expire warm word sets; returns how many were refilled"""
+        aiml_api_key = os.getenv("AIML_API_KEY")
+        if not aiml_api_key:
+            return 0
+
+        tasks = []
+        for key, words in self.warm_word_sets():
+            if len(tasks) >= self.refill_batch:
+                break
+            remaining = ai_call.affirmation_cache.peek(key)
+            if remaining is not None and remaining > self.refill_seconds:
+                continue
+            task = ai_call.start_generation(key, words, aiml_api_key)
+            if task is None:
+                break  # Circuit breaker is open; try again next cycle
+            tasks.append((key, task))
+
+        refilled = []
+        for key, task in tasks:
+            text = await asyncio.shield(task)
+            if text:
+                self.pregenerated.add(key)
+                refilled.append((key, text))
+            else:
+                self.refill_failures += 1
+        self.refills += len(refilled)
+        if refilled:
+            await self.share(refilled)
+        return len(refilled)
+
+    async def share(self, entries: List[Tuple[Tuple[str, ...], str]]):
+        """Store generated affirmations for the other workers and drop expired ones"""
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=ai_call.affirmation_cache.ttl_seconds)
+        statement = upsert_insert(WarmAffirmation).values([
+            {"word_key": json.dumps(list(key)), "affirmation": text, "expires_at": expires_at}
+            for key, text in entries
+        ])
+        statement = statement.on_conflict_do_update(
+            index_elements=["word_key"],
+            set_={"affirmation": statement.excluded.affirmation, "expires_at": statement.excluded.expires_at}
+        )
+        async with open_async_session() as db:
+            await db.execute(delete(WarmAffirmation).where(WarmAffirmation.expires_at <= now))
+            await db.execute(statement)
+            await db.commit()
+
+    async def load_shared(self) -> int:
+        """Copy affirmations shared by the leader into this worker's cache; returns how many were new"""
+        now = datetime.utcnow()
+        async with open_async_session() as db:
+            rows = await db.execute(select(
+                WarmAffirmation.word_key, WarmAffirmation.affirmation, WarmAffirmation.expires_at
+            ).where(WarmAffirmation.expires_at > now))
+            loaded = 0
+            for word_key, text, expires_at in rows:
+                key = tuple(json.loads(word_key))
+                remaining = (expires_at - now).total_seconds()
+                cached = ai_call.affirmation_cache.peek(key)
+                if cached is None or cached < remaining - 1:  # only newer generations
+                    ai_call.affirmation_cache.put(key, text, remaining)
+                    self.pregenerated.add(key)
+                    loaded += 1
+        self.loaded += loaded
+        return loaded
+
+    async def run(self):
+        while True:
+            try:
+                # A new leader picks up the shared entries first, so it only
+                # generates the ones that are missing or about to expire
+                await self.load_shared()
+                if await asyncio.to_thread(self.leader_lock.acquire):
+                    await self.refill_once()
+            except Exception as e:
+                print(f"[ERROR] Affirmation pool refill failed: {e}")
+            # Jitter so replicas do not refill in lockstep
+            await asyncio.sleep(self.refill_seconds * random.uniform(0.9, 1.1))
+
+    def start(self):
+        if not AFFIRMATION_POOL_ENABLED or self.size <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.leader_lock.release)
+
+    def stats(self) -> dict:
+        warm = self.warm_word_sets()
+        return {
+            "enabled": AFFIRMATION_POOL_ENABLED,
+            "leader": self.leader_lock.is_leader,
+            "size": self.size,
+            "warm": sum(1 for key, _ in warm if ai_call.affirmation_cache.peek(key) is not None),
+            "refill_seconds": self.refill_seconds,
+            "refill_batch": self.refill_batch,
+            "refills": self.refills,
+            "refill_failures": self.refill_failures,
+            "loaded": self.loaded,
+            "requests": self.requests,
+            "pool_hits": self.pool_hits,
+            "hit_ratio": self.pool_hits / self.requests if self.requests else 0.0,
+        }
+
+
+# Shared pool used by the API
+affirmation_pool = AffirmationPool()
@@ -2,17 +2,219 @@
 AIML API service for generating AI-powered affirmations
 """
 
+import asyncio
 import os
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
-import httpx
-from typing import List
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Tuple
+import json
+
+from metrics import observe_upstream
 
 load_dotenv()
 
+# httpx is imported on first use so it does not add to startup time
+if TYPE_CHECKING:
+    import httpx
+
+AIML_API_URL = os.getenv("AIML_API_URL", "https://api.aimlapi.com/v1/chat/completions")
+AFFIRMATION_CACHE_SIZE = int(os.getenv("AFFIRMATION_CACHE_SIZE", "1024"))
+AFFIRMATION_CACHE_TTL_SECONDS = int(os.getenv("AFFIRMATION_CACHE_TTL_SECONDS", "3600"))
+
+# Upstream protection: concurrent call limit, per-call latency budget (which
+# includes waiting for a slot) and circuit breaker thresholds
+AIML_MAX_CONCURRENCY = int(os.getenv("AIML_MAX_CONCURRENCY", "10"))
+AIML_TIMEOUT_SECONDS = float(os.getenv("AIML_TIMEOUT_SECONDS", "8"))
+AIML_BREAKER_FAILURES = int(os.getenv("AIML_BREAKER_FAILURES", "5"))
+AIML_BREAKER_RESET_SECONDS = float(os.getenv("AIML_BREAKER_RESET_SECONDS", "30"))
+
+# Shared HTTP client so connections (and TLS sessions) are reused across requests
+_http_client: Optional["httpx.AsyncClient"] = None
+_upstream_slots: Optional[asyncio.Semaphore] = None
+
+
+def get_http_client() -> "httpx.AsyncClient":
+    """Return the app-lifetime pooled client, creating it on first use"""
+    global _http_client
+    import httpx
+    
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=30.0,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        )
+    return _http_client
+
+
+def get_upstream_slots() -> asyncio.Semaphore:
+    """Semaphore bounding concurrent upstream calls"""
+    global _upstream_slots
+    if _upstream_slots is None:
+        _upstream_slots = asyncio.Semaphore(AIML_MAX_CONCURRENCY)
+    return _upstream_slots
+
+
+async def close_http_client():
+    """Close the pooled client on shutdown"""
+    global _http_client, _upstream_slots
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    _upstream_slots = None
+
+
+class CircuitBreaker:
+    """Stops calling the upstream after repeated failures.
+
+    closed: calls go through. open: calls are skipped until reset_seconds
+    have passed. half_open: one probe call is let through; success closes
+    the breaker, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = AIML_BREAKER_FAILURES, reset_seconds: float = AIML_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+        }
+
+
+circuit_breaker = CircuitBreaker()
+
+# Counters for generate requests that needed the upstream (cache misses)
+upstream_stats = {
+    "requests": 0,
+    "fallbacks": 0,
+    "short_circuited": 0,
+    "timeouts": 0,
+}
+
+
+def normalize_words(selected_words: List[str]) -> Tuple[str, ...]:
+    """Cache key for a word selection: lower-cased, de-duplicated and sorted"""
+    return tuple(sorted({word.strip().lower() for word in selected_words if word.strip()}))
+
+
+class AffirmationCache:
+    """LRU cache of generated affirmations with a TTL and hit/miss counters.
+
+    Also tracks in-flight upstream calls (tasks for plain calls, futures for
+    streamed ones) so concurrent requests for the same word set share one
+    call instead of each hitting the API.
+    """
+
+    def __init__(self, max_size: int = AFFIRMATION_CACHE_SIZE, ttl_seconds: int = AFFIRMATION_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, ...], Tuple[str, float]]" = OrderedDict()
+        self.inflight: Dict[Tuple[str, ...], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key: Tuple[str, ...]) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        text, expires_at = entry
+        if time.monotonic() > expires_at:
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return text
+
+    def put(self, key: Tuple[str, ...], text: str, ttl_seconds: Optional[float] = None):
+        if self.max_size <= 0:
+            return
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries[key] = (text, time.monotonic() + ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def peek(self, key: Tuple[str, ...]) -> Optional[float]:
+        """Seconds until a cached entry expires, or None; does not touch counters or LRU order"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        remaining = entry[1] - time.monotonic()
+        return remaining if remaining > 0 else None
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+affirmation_cache = AffirmationCache()
+
+
+def get_ai_stats() -> dict:
+    """Cache, circuit breaker and upstream counters for monitoring"""
+    requests = upstream_stats["requests"]
+    return {
+        "cache": affirmation_cache.stats(),
+        "circuit_breaker": circuit_breaker.stats(),
+        "upstream": {
+            **upstream_stats,
+            "fallback_rate": upstream_stats["fallbacks"] / requests if requests else 0.0,
+        },
+    }
+
 
 async def generate_ai_affirmation(selected_words: List[str]) -> str:
     """
     Generate an affirmation using AIML API based on selected words.
+    Results are cached per normalized word set and identical concurrent
+    requests share one upstream call.
     
     Args:
         selected_words: List of words selected by the user
@@ -26,70 +228,258 @@ async def generate_ai_affirmation(selected_words: List[str]) -> str:
         print("AIML_API_KEY not found, using fallback generation")
         return _fallback_generation(selected_words)
     
+    key = normalize_words(selected_words)
+    cached = affirmation_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    upstream_stats["requests"] += 1
+    task = start_generation(key, selected_words, aiml_api_key)
+    if task is None:
+        upstream_stats["short_circuited"] += 1
+        upstream_stats["fallbacks"] += 1
+        return _fallback_generation(selected_words)
+    
+    # Shield so one disconnecting caller does not cancel the shared call
+    generated_text = await asyncio.shield(task)
+    if not generated_text:
+        upstream_stats["fallbacks"] += 1
+        return _fallback_generation(selected_words)
+    return generated_text
+
+
+def start_generation(key: Tuple[str, ...], selected_words: List[str], aiml_api_key: str) -> Optional[asyncio.Task]:
+    """Return the in-flight upstream task for a word set, starting one if needed.
+    Returns None when the circuit breaker is open."""
+    task = affirmation_cache.inflight.get(key)
+    if task is not None:
+        affirmation_cache.coalesced += 1
+        return task
+    
+    if not circuit_breaker.allow_request():
+        return None
+    
+    task = asyncio.create_task(_guarded_aiml_call(selected_words, aiml_api_key))
+    affirmation_cache.inflight[key] = task
+    
+    def _finish(done_task: asyncio.Task):
+        affirmation_cache.inflight.pop(key, None)
+        if not done_task.cancelled() and done_task.result():
+            affirmation_cache.put(key, done_task.result())
+    
+    task.add_done_callback(_finish)
+    return task
+
+
+async def stream_ai_affirmation(selected_words: List[str]) -> AsyncIterator[str]:
+    """
+    Stream an affirmation as text chunks. Cached word sets and fallbacks
+    arrive as a single chunk; cache misses are streamed from the AIML API
+    token by token so the first words arrive before the full completion.
+    """
+    aiml_api_key = os.getenv("AIML_API_KEY")
+    if not aiml_api_key:
+        yield _fallback_generation(selected_words)
+        return
+    import httpx
+    
+    key = normalize_words(selected_words)
+    cached = affirmation_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+    
+    upstream_stats["requests"] += 1
+    shared = affirmation_cache.inflight.get(key)
+    if shared is not None:
+        # Another request (plain or streamed) is already generating this word
+        # set; its full text arrives as one chunk
+        affirmation_cache.coalesced += 1
+        generated_text = await asyncio.shield(shared)
+        if not generated_text:
+            upstream_stats["fallbacks"] += 1
+        yield generated_text or _fallback_generation(selected_words)
+        return
+    
+    if not circuit_breaker.allow_request():
+        upstream_stats["short_circuited"] += 1
+        upstream_stats["fallbacks"] += 1
+        yield _fallback_generation(selected_words)
+        return
+    
+    # Identical requests arriving while this one streams wait on this future
+    generation = asyncio.get_running_loop().create_future()
+    affirmation_cache.inflight[key] = generation
+    chunks = []
+    completed = False
+    generated_text = ""
+    slots = get_upstream_slots()
+    started = time.perf_counter()
+    outcome = "error"
+    
+    def remaining() -> float:
+        return max(0.0, started + AIML_TIMEOUT_SECONDS - time.perf_counter())
+    
     try:
-        # Prepare user words as comma-separated string
-        user_words = ", ".join(selected_words)
-        prompt = f"""
-        
-        You are a compassionate wellness coach whose only task is to create **short, positive, and empowering affirmations**. 
+        # One latency budget covers waiting for a slot, the response headers and
+        # every line of the body, so a stalled stream still ends in the fallback
+        await asyncio.wait_for(slots.acquire(), timeout=remaining())
+        try:
+            client = get_http_client()
+            headers, payload = _build_request(selected_words, aiml_api_key)
+            payload["stream"] = True
+            request = client.build_request("POST", AIML_API_URL, headers=headers, json=payload)
+            response = await asyncio.wait_for(client.send(request, stream=True), timeout=remaining())
+            try:
+                response.raise_for_status()
+                lines = response.aiter_lines()
+                while True:
+                    try:
+                        line = await asyncio.wait_for(lines.__anext__(), timeout=remaining())
+                    except StopAsyncIteration:
+                        break
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    choices = json.loads(data).get("choices") or [{}]
+                    delta = (choices[0].get("delta") or {}).get("content")
+                    if delta:
+                        chunks.append(delta)
+                        yield delta
+                completed = True
+            finally:
+                await response.aclose()
+        finally:
+            slots.release()
+    except asyncio.TimeoutError:
+        print(f"[ERROR] AIML API stream exceeded {AIML_TIMEOUT_SECONDS}s budget")
+        upstream_stats["timeouts"] += 1
+        outcome = "timeout"
+    except httpx.HTTPError as e:
+        print(f"[ERROR] AIML API streaming error: {e}")
+    except Exception as e:
+        # Malformed chunks (bad JSON, unexpected shapes) fall back like any other failure
+        print(f"[ERROR] Unexpected AIML API stream chunk: {type(e).__name__}: {e}")
+    finally:
+        # Also runs when the client disconnects mid-stream (GeneratorExit or
+        # CancelledError): an aborted or partial stream counts as a failure,
+        # so a half-open breaker's probe is always settled
+        generated_text = "".join(chunks).strip() if completed else ""
+        observe_upstream("ok" if generated_text else outcome, time.perf_counter() - started)
+        if generated_text:
+            circuit_breaker.record_success()
+            affirmation_cache.put(key, generated_text)
+        else:
+            circuit_breaker.record_failure()
+        affirmation_cache.inflight.pop(key, None)
+        generation.set_result(generated_text or None)
+    
+    if not generated_text:
+        upstream_stats["fallbacks"] += 1
+        yield _fallback_generation(selected_words)
 
-        You will be given a list of words that a user selects based on their feelings. Generate a **motivational affirmation** that reflects these feelings. 
 
-        **IMPORTANT RULES:**
-        - Output **exactly 1-2 sentences**.
-        - Do **NOT** give advice, instructions, or steps.
-        - Do **NOT** apologize or explain anything.
-        - Focus entirely on encouragement and positivity.
+async def _guarded_aiml_call(selected_words: List[str], aiml_api_key: str) -> Optional[str]:
+    """Call the upstream within the concurrency limit and latency budget, feeding the breaker"""
+    async def _limited_call():
+        async with get_upstream_slots():
+            return await _call_aiml_api(selected_words, aiml_api_key)
+    
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        generated_text = await asyncio.wait_for(_limited_call(), timeout=AIML_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        print(f"[ERROR] AIML API call exceeded {AIML_TIMEOUT_SECONDS}s budget")
+        upstream_stats["timeouts"] += 1
+        generated_text = None
+        outcome = "timeout"
+    
+    observe_upstream("ok" if generated_text else outcome, time.perf_counter() - started)
+    if generated_text:
+        circuit_breaker.record_success()
+    else:
+        circuit_breaker.record_failure()
+    return generated_text
 
-        User words: {user_words}
-        """
+
+async def _call_aiml_api(selected_words: List[str], aiml_api_key: str) -> Optional[str]:
+    """Call the AIML API once; returns None when no affirmation could be produced"""
+    import httpx
+    
+    try:
+        client = get_http_client()
+        url = AIML_API_URL
+        headers, payload = _build_request(selected_words, aiml_api_key)
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            url = "https://api.aimlapi.com/v1/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {aiml_api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "model": "gpt-4o-mini",
-                "messages": [
-                    { "role": "user", "content":prompt }
-                ],
-                "temperature": 0.2
-            }
-            
-            response = await client.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            result = response.json()
-            
-            # Extract the generated affirmation from response
-            # AIML API typically returns content in choices[0].message.content
-            if "choices" in result and len(result["choices"]) > 0:
-                message = result["choices"][0].get("message", {})
-                generated_text = message.get("content", "").strip()
-                
-                if generated_text:
-                    return generated_text
-            
-            # If we can't extract the affirmation, use fallback
-            return _fallback_generation(selected_words)
+        response = await client.post(url, headers=headers, json=payload)
+        response.raise_for_status()
+        result = response.json()
+        
+        # Extract the generated affirmation from response
+        # AIML API typically returns content in choices[0].message.content
+        if "choices" in result and len(result["choices"]) > 0:
+            message = result["choices"][0].get("message", {})
+            generated_text = message.get("content", "").strip()
             
+            if generated_text:
+                return generated_text
+        
+        # If we can't extract the affirmation, the caller uses the fallback
+        return None
+        
     except httpx.HTTPStatusError as e:
         print(f"[ERROR] AIML API HTTP error: {e}")
         print(f"[ERROR] Status code: {e.response.status_code}")
         print(f"[ERROR] Response text: {e.response.text}")
-        return _fallback_generation(selected_words)
+        return None
     except httpx.HTTPError as e:
         print(f"[ERROR] AIML API HTTP error: {e}")
         print(f"[ERROR] Error type: {type(e)}")
-        return _fallback_generation(selected_words)
+        return None
     except Exception as e:
         print(f"[ERROR] Unexpected error generating affirmation with AIML API: {e}")
         print(f"[ERROR] Error type: {type(e)}")
         import traceback
         print(f"[ERROR] Traceback: {traceback.format_exc()}")
-        return _fallback_generation(selected_words)
+        return None
+
+
+def _build_request(selected_words: List[str], aiml_api_key: str) -> Tuple[dict, dict]:
+    """Headers and chat completion payload for a word selection"""
+    # Prepare user words as comma-separated string
+    user_words = ", ".join(selected_words)
+    prompt = f"""
+    
+    You are a compassionate wellness coach whose only task is to create **short, positive, and empowering affirmations**. 
+
+    You will be given a list of words that a user selects based on their feelings. Generate a **motivational affirmation** that reflects these feelings. 
+
+    **IMPORTANT RULES:**
+    - Output **exactly 1-2 sentences**.
+    - Do **NOT** give advice, instructions, or steps.
+    - Do **NOT** apologize or explain anything.
+    - Focus entirely on encouragement and positivity.
+
+    User words: {user_words}
+    """
+    
+    headers = {
+        "Authorization": f"Bearer {aiml_api_key}",
+        "Content-Type": "application/json"
+    }
+    
+    payload = {
+        "model": "gpt-4o-mini",
+        "messages": [
+            { "role": "user", "content":prompt }
+        ],
+        "temperature": 0.2
+    }
+    
+    return headers, payload
 
 
 def _fallback_generation(selected_words: List[str]) -> str:
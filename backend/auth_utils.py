@@ -3,8 +3,35 @@ Authentication utilities for password hashing and verification
 """
 
 import bcrypt
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from datetime import datetime, timedelta, timezone
+import asyncio
+import os
 import secrets
+import threading
+
+# Password hashing pool configuration
+# bcrypt releases the GIL while hashing, so a thread pool keeps the event loop
+# responsive. Set PASSWORD_HASH_WORKERS=0 to hash inline on the event loop.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Authentication mode: "session" (opaque tokens in user_sessions) or "jwt"
+# (signed tokens verified without database access)
+AUTH_MODE = os.getenv("AUTH_MODE", "session").lower()
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
+JWT_SECRET_MIN_LENGTH = 32
+JWT_PLACEHOLDER_SECRETS = {"change_me", "changeme", "secret", "your_secret_key", "jwt_secret"}
+if AUTH_MODE == "jwt" and not JWT_SECRET_KEY:
+    # Tokens will not survive restarts or work across workers without a shared key
+    print("JWT_SECRET_KEY not set, using a random per-process key")
+    JWT_SECRET_KEY = secrets.token_urlsafe(64)
+elif AUTH_MODE == "jwt" and (JWT_SECRET_KEY.lower() in JWT_PLACEHOLDER_SECRETS
+                             or len(JWT_SECRET_KEY) < JWT_SECRET_MIN_LENGTH):
+    # Anyone who knows (or guesses) the key can mint tokens for any user
+    raise ValueError(f"JWT_SECRET_KEY must be a random value of at least {JWT_SECRET_MIN_LENGTH} characters, "
+                     "e.g. python -c \"import secrets; print(secrets.token_urlsafe(64))\"")
 
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt"""
@@ -16,6 +43,67 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
+class PasswordHashPool:
+    """Runs bcrypt calls on a dedicated thread pool and tracks queue depth"""
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS):
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    def _track(self, func, *args):
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+
+    async def run(self, func, *args):
+        if self.workers <= 0:
+            return func(*args)
+
+        with self._lock:
+            self.queued += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), self._track, func, *args)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_depth": self.queued,
+                "active": self.active,
+                "completed": self.completed,
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+password_pool = PasswordHashPool()
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the password hashing pool"""
+    return await password_pool.run(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the password hashing pool"""
+    return await password_pool.run(verify_password, plain_password, hashed_password)
+
 def generate_session_token() -> str:
     """Generate a secure session token"""
     # Generate a random token with timestamp
@@ -31,3 +119,30 @@ def get_token_expiry() -> datetime:
 def is_token_expired(expires_at: datetime) -> bool:
     """Check if a token has expired"""
     return datetime.utcnow() > expires_at
+
+def utc_timestamp(value: datetime) -> float:
+    """POSIX timestamp for a naive UTC datetime (as stored in the database)"""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+def create_access_token(user_id: int, username: str, expires_at: datetime) -> str:
+    """Create a signed JWT carrying the user id, username and expiry"""
+    # Imported on first use: only JWT mode needs python-jose
+    from jose import jwt
+    
+    claims = {
+        "sub": str(user_id),
+        "username": username,
+        # Sub-second issue time so revocations at login/logout are exact
+        "iat": utc_timestamp(datetime.utcnow()),
+        "exp": utc_timestamp(expires_at),
+    }
+    return jwt.encode(claims, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+
+def decode_access_token(token: str, verify_exp: bool = True) -> Optional[dict]:
+    """Verify a JWT and return its claims, or None if it is invalid or expired"""
+    from jose import jwt, JWTError, ExpiredSignatureError
+    
+    try:
+        return jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM], options={"verify_exp": verify_exp})
+    except (ExpiredSignatureError, JWTError):
+        return None
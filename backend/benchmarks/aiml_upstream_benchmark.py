@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+AIML upstream resilience benchmark for Wellness Arcade
+Starts the mock AIML server in-process and drives generate_ai_affirmation
+through healthy, slow and failing phases, printing latency, cache and
+circuit breaker stats after each phase:
+
+    python benchmarks/aiml_upstream_benchmark.py --requests 200 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+
+PORT = 9123
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the AIML upstream guards")
+    parser.add_argument("--requests", type=int, default=200, help="Generate calls per phase")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent generate calls")
+    parser.add_argument("--word-sets", type=int, default=10, help="Distinct word sets requested")
+    return parser.parse_args()
+
+
+def start_mock_server():
+    import uvicorn
+    from mock_aiml_server import create_app
+
+    mock_app = create_app()
+    server = uvicorn.Server(uvicorn.Config(mock_app, host="127.0.0.1", port=PORT, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return mock_app, server
+
+
+async def run_phase(ai_call, label, args, phase):
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            words = ["I", "am", f"phase{phase}", f"set{i % args.word_sets}"]
+            started = time.perf_counter()
+            await ai_call.generate_ai_affirmation(words)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    stats = ai_call.get_ai_stats()
+    print(f"[{label}] {args.requests} calls in {elapsed:.2f}s, "
+          f"p50 {statistics.median(latencies):.1f} ms, max {max(latencies):.1f} ms")
+    print(f"    cache {stats['cache']}")
+    print(f"    breaker {stats['circuit_breaker']}")
+    print(f"    upstream {stats['upstream']}")
+
+
+async def run(args, mock_app):
+    import ai_call
+
+    await run_phase(ai_call, "healthy", args, 1)
+    print(f"    mock upstream calls so far: {mock_app.state.calls}")
+
+    mock_app.state.delay = 5.0
+    await run_phase(ai_call, "slow upstream", args, 2)
+
+    mock_app.state.delay = 0.0
+    mock_app.state.failure_rate = 1.0
+    await asyncio.sleep(ai_call.AIML_BREAKER_RESET_SECONDS)
+    await run_phase(ai_call, "failing upstream", args, 3)
+
+    mock_app.state.failure_rate = 0.0
+    await asyncio.sleep(ai_call.AIML_BREAKER_RESET_SECONDS)
+    await run_phase(ai_call, "recovered", args, 4)
+
+    await ai_call.close_http_client()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    # Configure the backend before importing it
+    os.environ["AIML_API_KEY"] = "benchmark-key"
+    os.environ["AIML_API_URL"] = f"http://127.0.0.1:{PORT}/v1/chat/completions"
+    os.environ.setdefault("AIML_TIMEOUT_SECONDS", "0.5")
+    os.environ.setdefault("AIML_BREAKER_RESET_SECONDS", "2")
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.join(here, ".."))
+    sys.path.insert(0, here)
+
+    mock_app, server = start_mock_server()
+    try:
+        asyncio.run(run(args, mock_app))
+    finally:
+        server.should_exit = True
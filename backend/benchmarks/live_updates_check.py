@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Live update check for Wellness Arcade
+Starts uvicorn with the in-process (memory) broker, opens an /api/live/ stream
+with a ticket and logs counters through the single and batch endpoints. Each
+logged counter must reach the stream with the right total, and the daily row
+must already hold that total when the event arrives (with write-behind, events
+are published after the group commit). Also checks that a ticket works once
+and that logging out ends the stream. Runs with write-behind off and on:
+
+    python benchmarks/live_updates_check.py
+    python benchmarks/live_updates_check.py --write-behind on
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND_PATH = os.path.join(HERE, "..")
+EVENT_TIMEOUT_SECONDS = 5
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check that logged counters reach open live update streams")
+    parser.add_argument("--write-behind", choices=["off", "on"], action="append",
+                        help="WRITE_BEHIND_ENABLED setting to check (repeatable; default: both)")
+    return parser.parse_args()
+
+
+async def next_event(lines):
+    """(event, data) of the next SSE event, skipping comments and the retry line"""
+    event = None
+    while True:
+        line = await asyncio.wait_for(lines.__anext__(), EVENT_TIMEOUT_SECONDS)
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: ") and event:
+            return event, json.loads(line[len("data: "):])
+
+
+def stored_count(database_url, username, data_type):
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine(database_url)
+    try:
+        with engine.connect() as connection:
+            return connection.execute(text(
+                "SELECT d.count FROM daily_wellness_data d JOIN users u ON u.id = d.user_id "
+                "WHERE u.username = :username AND d.data_type = :data_type ORDER BY d.date DESC LIMIT 1"
+            ), {"username": username, "data_type": data_type}).scalar()
+    finally:
+        engine.dispose()
+
+
+async def check(port, database_url, username):
+    import httpx
+    from live_connections_benchmark import wait_until_ready
+    from load_benchmark import PASSWORD
+
+    failures = []
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+        await wait_until_ready(client)
+        response = await client.post("/api/login/", json={"username": username, "password": PASSWORD})
+        response.raise_for_status()
+        token = response.json()["session_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        response = await client.post("/api/live/ticket/", headers=headers)
+        response.raise_for_status()
+        ticket = response.json()["ticket"]
+
+        async with client.stream("GET", f"/api/live/?ticket={ticket}") as stream:
+            stream.raise_for_status()
+            lines = stream.aiter_lines()
+            await asyncio.wait_for(lines.__anext__(), EVENT_TIMEOUT_SECONDS)  # retry: line, stream is subscribed
+
+            reused = await client.get(f"/api/live/?ticket={ticket}")
+            if reused.status_code != 401:
+                failures.append(f"a used ticket answered {reused.status_code}")
+
+            expected_totals = {}
+            requests = [
+                ("/api/hydration/log/", {"glasses": 2}, "hydration", 2),
+                ("/api/brushing/log/", {"session_type": "morning"}, "brushing", 1),
+                ("/api/events/batch/", {"events": [{"type": "hydration", "glasses": 1}]}, "hydration", 1),
+            ]
+            for path, body, data_type, delta in requests:
+                (await client.post(path, json=body, headers=headers)).raise_for_status()
+                expected_totals[data_type] = expected_totals.get(data_type, 0) + delta
+                try:
+                    event, data = await next_event(lines)
+                except asyncio.TimeoutError:
+                    failures.append(f"{path}: no event within {EVENT_TIMEOUT_SECONDS} s")
+                    continue
+                stored = stored_count(database_url, username, data_type)
+                print(f"  {path:<22} {event} {data_type} delta {data.get('delta')} total {data.get('total_today')}, stored {stored}")
+                if event != "counter" or data.get("data_type") != data_type or data.get("delta") != delta:
+                    failures.append(f"{path}: unexpected event {event} {data}")
+                if data.get("total_today") != expected_totals[data_type]:
+                    failures.append(f"{path}: total {data.get('total_today')}, expected {expected_totals[data_type]}")
+                if stored != data.get("total_today"):
+                    failures.append(f"{path}: event published before commit (stored {stored})")
+
+            (await client.post("/api/logout/", json={"session_token": token})).raise_for_status()
+            try:
+                while True:
+                    await asyncio.wait_for(lines.__anext__(), EVENT_TIMEOUT_SECONDS)
+            except StopAsyncIteration:
+                print("  stream ended on logout")
+            except asyncio.TimeoutError:
+                failures.append("stream still open after logout")
+    return failures
+
+
+def run_mode(write_behind):
+    from live_connections_benchmark import free_port
+
+    workdir = tempfile.mkdtemp(prefix="wellness_check_")
+    database_url = f"sqlite:///{os.path.join(workdir, 'check.db')}"
+    subprocess.run([sys.executable, "-c", (
+        "import sys; sys.path[:0] = [sys.argv[1], sys.argv[2]]\n"
+        "import database\nfrom load_benchmark import seed\n"
+        "database.init_database(); seed(database, 1, 0)"
+    ), BACKEND_PATH, HERE], env=dict(os.environ, DATABASE_URL=database_url), check=True, stdout=subprocess.DEVNULL)
+
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=database_url, AUTH_MODE="session", PUSH_ENABLED="true", PUSH_BROKER="memory",
+               WRITE_BEHIND_ENABLED="true" if write_behind == "on" else "false", DB_INIT_ON_STARTUP="false",
+               AFFIRMATION_POOL_ENABLED="false", SESSION_SWEEP_INTERVAL_SECONDS="0")
+    env.pop("AIML_API_KEY", None)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_PATH, env=env
+    )
+    try:
+        return asyncio.run(check(port, database_url, "load_user_0"))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main_cli():
+    args = parse_args()
+    sys.path.insert(0, HERE)
+
+    failed = []
+    for write_behind in args.write_behind or ["off", "on"]:
+        print(f"WRITE_BEHIND_ENABLED={'true' if write_behind == 'on' else 'false'}")
+        failures = run_mode(write_behind)
+        for failure in failures:
+            print(f"  FAIL {failure}")
+        if failures:
+            failed.append(write_behind)
+    print("FAILED with write-behind " + ", ".join(failed) if failed else "Logged counters reach open live update streams")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main_cli()
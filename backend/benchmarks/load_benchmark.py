@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Load and latency benchmark for Wellness Arcade
+Seeds users and days of history into a fresh database, then drives the real
+API endpoints (register, login, log, status, dashboard, history, streaks and
+affirmation generation against the mock AIML server) at a fixed concurrency.
+Each scenario reports p50/p95/p99 latency, requests/s and database queries per
+request, and the whole run is written to a JSON file so runs from different
+commits can be compared:
+
+    python benchmarks/load_benchmark.py --users 200 --days 90 --requests 1000 --concurrency 50
+    python benchmarks/load_benchmark.py --compare benchmarks/results/load_<commit>_<time>.json
+    python benchmarks/load_benchmark.py --http   # through uvicorn on a local port instead of in-process
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MOCK_PORT = 9124
+APP_PORT = 9125
+PASSWORD = "bench-password"
+SCENARIOS = ["register", "login", "log", "status", "dashboard", "history", "streaks", "generate"]
+AUTH_SCENARIOS = {"register", "login"}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test the Wellness Arcade API")
+    parser.add_argument("--database-url", help="Database to seed and use (default: a temporary SQLite file)")
+    parser.add_argument("--users", type=int, default=100, help="Users to seed")
+    parser.add_argument("--days", type=int, default=30, help="Days of history to seed per user")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--auth-requests", type=int, default=50, help="Requests for the bcrypt-bound register/login scenarios")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent requests")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--word-sets", type=int, default=20, help="Distinct word sets for the generate scenario")
+    parser.add_argument("--aiml-delay", type=float, default=0.05, help="Mock AIML response delay in seconds")
+    parser.add_argument("--http", action="store_true", help="Serve the app with uvicorn and go through real HTTP")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/load_<commit>_<time>.json)")
+    parser.add_argument("--compare", help="Earlier results file to print deltas against")
+    return parser.parse_args()
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def start_server(app, port):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+class QueryCounter:
+    """Counts statements sent to the database by any engine in this process"""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        with self._lock:
+            self.count += 1
+
+    def attach(self, database):
+        from sqlalchemy import event
+
+        engines = [database.engine]
+        if database.async_engine is not None:
+            engines.append(database.async_engine.sync_engine)
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self)
+
+
+def seed(database, users, days):
+    """Bulk insert users, daily counters and events; every user shares one password hash"""
+    from auth_utils import hash_password
+
+    hashed = hash_password(PASSWORD)
+    now = datetime.utcnow()
+    today = date.today()
+    rng = random.Random(42)
+    users_table = database.User.__table__
+    daily_table = database.DailyWellnessData.__table__
+    events_table = database.WellnessEvent.__table__
+
+    with database.engine.begin() as connection:
+        connection.execute(users_table.insert(), [
+            {"username": f"load_user_{i}", "email": f"load_user_{i}@example.com", "hashed_password": hashed,
+             "created_at": now, "is_active": True}
+            for i in range(users)
+        ])
+        user_ids = [row[0] for row in connection.execute(users_table.select().with_only_columns(users_table.c.id))]
+
+        daily_rows, event_rows = [], []
+        for user_id in user_ids:
+            for offset in range(1, days + 1):
+                day = (today - timedelta(days=offset)).isoformat()
+                for data_type in ["hydration", "brushing", "breathing", "puzzles", "emotions", "affirmations"]:
+                    count = rng.randint(0, 4)
+                    if not count:
+                        continue
+                    daily_rows.append({"user_id": user_id, "date": day, "data_type": data_type, "count": count,
+                                       "created_at": now, "updated_at": now})
+                    event_rows.extend(
+                        {"user_id": user_id, "date": day, "data_type": data_type,
+                         "payload": json.dumps({"timestamp": now.isoformat()}), "created_at": now}
+                        for _ in range(count)
+                    )
+            if len(event_rows) > 20000:
+                connection.execute(daily_table.insert(), daily_rows)
+                connection.execute(events_table.insert(), event_rows)
+                daily_rows, event_rows = [], []
+        if daily_rows:
+            connection.execute(daily_table.insert(), daily_rows)
+            connection.execute(events_table.insert(), event_rows)
+
+    database.backfill_wellness_streaks()
+    return [f"load_user_{i}" for i in range(users)]
+
+
+def build_requests(args, usernames):
+    """Request factories per scenario: each takes (index, tokens) and returns (method, path, json, headers)"""
+    words = ["strong", "calm", "brave", "kind", "capable", "worthy", "grateful", "focused"]
+    today = date.today()
+    history_from = (today - timedelta(days=args.days)).isoformat()
+
+    def auth(tokens, i):
+        return {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+
+    return {
+        "register": lambda i, tokens: ("POST", "/api/register/", {
+            "username": f"load_new_{i}_{os.getpid()}", "email": f"load_new_{i}_{os.getpid()}@example.com", "password": PASSWORD
+        }, None),
+        "login": lambda i, tokens: ("POST", "/api/login/", {
+            "username": usernames[i % len(usernames)], "password": PASSWORD
+        }, None),
+        "log": lambda i, tokens: ("POST", "/api/hydration/log/", {"glasses": 1}, auth(tokens, i)),
+        "status": lambda i, tokens: ("GET", "/api/hydration/status/", None, auth(tokens, i)),
+        "dashboard": lambda i, tokens: ("GET", "/api/dashboard/", None, auth(tokens, i)),
+        "history": lambda i, tokens: ("GET", f"/api/stats/history/?from={history_from}", None, auth(tokens, i)),
+        "streaks": lambda i, tokens: ("GET", "/api/stats/streaks/", None, auth(tokens, i)),
+        "generate": lambda i, tokens: ("GET", "/api/affirmations/generate/?words=I,am," + ",".join(
+            words[(i % args.word_sets + j) % len(words)] for j in range(2)
+        ) + f",set{i % args.word_sets}", None, None),
+    }
+
+
+async def run_scenario(client, name, factory, total, concurrency, tokens, counter):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        method, path, body, headers = factory(i, tokens)
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body, headers=headers)
+                if response.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    queries_before = counter.count
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    queries = counter.count - queries_before
+
+    return {
+        "requests": total,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies), 2),
+        "queries_per_request": round(queries / total, 2),
+    }
+
+
+async def run(args, usernames, counter):
+    import httpx
+    import main
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    factories = build_requests(args, usernames)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    server = None
+    if args.http:
+        server, server_thread = start_server(main.app, APP_PORT)
+        client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", limits=limits, timeout=60)
+    else:
+        await main.startup_event()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=60)
+
+    async def login_token_pool():
+        tokens = []
+        for username in usernames[:max(1, min(len(usernames), args.concurrency))]:
+            response = await client.post("/api/login/", json={"username": username, "password": PASSWORD})
+            response.raise_for_status()
+            tokens.append(response.json()["session_token"])
+        return tokens
+
+    results = {}
+    tokens = None
+    try:
+        for name in scenarios:
+            if name in AUTH_SCENARIOS:
+                # Logging in again replaces a user's session, so the token pool is fetched afresh afterwards
+                tokens = None
+                total = args.auth_requests
+            else:
+                if tokens is None:
+                    tokens = await login_token_pool()
+                total = args.requests
+            results[name] = await run_scenario(client, name, factories[name], total, args.concurrency, tokens or [], counter)
+            print_row(name, results[name])
+    finally:
+        await client.aclose()
+        if server is not None:
+            server.should_exit = True
+            await asyncio.to_thread(server_thread.join)
+        else:
+            await main.shutdown_event()
+    return results
+
+
+def print_header():
+    print(f"{'scenario':<11}{'requests':>9}{'errors':>8}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries/req':>13}")
+
+
+def print_row(name, result):
+    print(f"{name:<11}{result['requests']:>9}{result['errors']:>8}{result['rps']:>9.1f}{result['p50_ms']:>9.1f}"
+          f"{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}{result['queries_per_request']:>13.2f}")
+
+
+def print_comparison(baseline_path, results):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nChange vs {baseline_path} (commit {baseline.get('commit', 'unknown')}):")
+    print(f"{'scenario':<11}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'queries/req':>13}")
+    for name, result in results.items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+
+        def delta(key):
+            if not before[key]:
+                return "n/a"
+            return f"{(result[key] - before[key]) / before[key] * 100:+.0f}%"
+
+        print(f"{name:<11}{delta('rps'):>10}{delta('p50_ms'):>10}{delta('p95_ms'):>10}{delta('p99_ms'):>10}"
+              f"{result['queries_per_request'] - before['queries_per_request']:>+13.2f}")
+
+
+def main_cli():
+    args = parse_args()
+
+    # Configure the backend before importing it
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        workdir = tempfile.mkdtemp(prefix="wellness_bench_")
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["AIML_API_KEY"] = "benchmark-key"
+    os.environ["AIML_API_URL"] = f"http://127.0.0.1:{MOCK_PORT}/v1/chat/completions"
+    os.environ.setdefault("AFFIRMATION_POOL_ENABLED", "false")  # measure on-demand generation
+    os.environ.setdefault("SESSION_SWEEP_INTERVAL_SECONDS", "0")
+    sys.path.insert(0, os.path.join(HERE, ".."))
+    sys.path.insert(0, HERE)
+
+    import database
+    from mock_aiml_server import create_app
+
+    database.init_database()
+    started = time.perf_counter()
+    usernames = seed(database, args.users, args.days)
+    print(f"Seeded {args.users} users x {args.days} days in {time.perf_counter() - started:.1f}s")
+
+    counter = QueryCounter()
+    counter.attach(database)
+    mock_server, _ = start_server(create_app(delay=args.aiml_delay), MOCK_PORT)
+
+    print_header()
+    try:
+        results = asyncio.run(run(args, usernames, counter))
+    finally:
+        mock_server.should_exit = True
+
+    commit = git_commit()
+    output = args.output or os.path.join(
+        HERE, "results", f"load_{commit}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(),
+        "database": os.environ["DATABASE_URL"].split("://")[0],
+        "db_mode": database.DB_MODE,
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "database_url")},
+        "scenarios": results,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        print_comparison(args.compare, results)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Login throughput benchmark for Wellness Arcade
+Fires a storm of concurrent logins while pinging /api/ping/ and reports
+login throughput and ping latency. Compare inline hashing with the pool:
+
+    python benchmarks/login_benchmark.py --workers 0
+    python benchmarks/login_benchmark.py --workers 4
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark login throughput")
+    parser.add_argument("--workers", type=int, default=4, help="PASSWORD_HASH_WORKERS (0 = hash inline)")
+    parser.add_argument("--users", type=int, default=8, help="Number of users to register")
+    parser.add_argument("--logins", type=int, default=32, help="Total logins to perform")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent logins")
+    return parser.parse_args()
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(args):
+    import httpx
+    import main
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await main.startup_event()
+
+        usernames = [f"bench_user_{i}" for i in range(args.users)]
+        for username in usernames:
+            await client.post("/api/register/", json={
+                "username": username,
+                "email": f"{username}@example.com",
+                "password": "bench-password",
+            })
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+        done = asyncio.Event()
+        ping_latencies = []
+        ping_times = []
+
+        async def login(i):
+            async with semaphore:
+                response = await client.post("/api/login/", json={
+                    "username": usernames[i % len(usernames)],
+                    "password": "bench-password",
+                })
+                response.raise_for_status()
+
+        async def pinger():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/api/ping/")
+                ping_latencies.append((time.perf_counter() - started) * 1000)
+                ping_times.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+
+        ping_task = asyncio.create_task(pinger())
+        started = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(args.logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await ping_task
+
+        await main.shutdown_event()
+
+    print(f"workers:          {args.workers}")
+    print(f"logins:           {args.logins} in {elapsed:.2f}s ({args.logins / elapsed:.1f} logins/s)")
+    print(f"pings during run: {len(ping_latencies)}")
+    if ping_latencies:
+        print(f"ping p50:         {statistics.median(ping_latencies):.1f} ms")
+        print(f"ping p99:         {percentile(ping_latencies, 99):.1f} ms")
+        print(f"ping max:         {max(ping_latencies):.1f} ms")
+    if len(ping_times) > 1:
+        # Longest stretch the event loop could not answer a ping
+        max_gap = max(later - earlier for earlier, later in zip(ping_times, ping_times[1:]))
+        print(f"max ping gap:     {max_gap * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    # Configure the app before importing it
+    workdir = tempfile.mkdtemp(prefix="wellness_bench_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+    asyncio.run(run(args))
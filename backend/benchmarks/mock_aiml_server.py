@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the AIML chat completions API
+Point the backend at it with AIML_API_URL=http://127.0.0.1:9100/v1/chat/completions
+and any AIML_API_KEY. Latency and failures are configurable to exercise
+caching, coalescing and fallback behaviour:
+
+    python benchmarks/mock_aiml_server.py --port 9100 --delay 0.5 --failure-rate 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import random
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+
+def create_app(delay: float = 0.0, failure_rate: float = 0.0) -> FastAPI:
+    """Build the mock app; settings live on app.state so tests can change them"""
+    app = FastAPI(title="Mock AIML API")
+    app.state.delay = delay
+    app.state.failure_rate = failure_rate
+    app.state.calls = 0
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        app.state.calls += 1
+        body = await request.json()
+        if app.state.delay:
+            await asyncio.sleep(app.state.delay)
+        if random.random() < app.state.failure_rate:
+            raise HTTPException(status_code=503, detail="Mock upstream failure")
+
+        prompt = body["messages"][0]["content"]
+        words = prompt.rsplit("User words:", 1)[-1].strip()
+        content = f"I embrace {words} and grow stronger every day."
+
+        if body.get("stream"):
+            async def chunks():
+                for token in content.split(" "):
+                    chunk = {"choices": [{"delta": {"content": token + " "}}]}
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    await asyncio.sleep(0.01)
+                yield "data: [DONE]\n\n"
+            return StreamingResponse(chunks(), media_type="text/event-stream")
+
+        return {
+            "choices": [
+                {"message": {"role": "assistant", "content": content}}
+            ]
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return {"calls": app.state.calls, "delay": app.state.delay, "failure_rate": app.state.failure_rate}
+
+    @app.post("/config")
+    async def configure(settings: dict):
+        """Change delay/failure_rate while running, e.g. to simulate an outage and recovery"""
+        app.state.delay = float(settings.get("delay", app.state.delay))
+        app.state.failure_rate = float(settings.get("failure_rate", app.state.failure_rate))
+        return {"delay": app.state.delay, "failure_rate": app.state.failure_rate}
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run a mock AIML API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to wait before answering")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of calls that return 503")
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args.delay, args.failure_rate), host=args.host, port=args.port, log_level="warning")
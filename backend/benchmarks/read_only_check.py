@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Read-only GET check for Wellness Arcade
+Seeds a user with history and today's events, then calls every
+authenticated GET endpoint (found from the app's routes, so new ones are
+covered automatically) with a cold session cache while a
+before_cursor_execute hook records every statement. Fails if any of them
+runs an INSERT, UPDATE or DELETE. Each database mode runs in its own process
+because DB_MODE is read at import:
+
+    python benchmarks/read_only_check.py
+    python benchmarks/read_only_check.py --db-mode sync
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WRITE_KEYWORDS = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+# Endpoints that must be among the checked routes
+REQUIRED_PATHS = {
+    "/api/dashboard/", "/api/user/", "/api/brushing/detailed/", "/api/affirmations/history/",
+    "/api/stats/history/", "/api/stats/streaks/", "/api/hydration/status/", "/api/brushing/status/",
+    "/api/breathing/status/", "/api/puzzles/status/", "/api/emotions/status/", "/api/affirmations/status/",
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Assert authenticated GET endpoints never write to the database")
+    parser.add_argument("--db-mode", choices=["async", "sync"], action="append",
+                        help="Database mode to check (repeatable; default: both)")
+    parser.add_argument("--run", choices=["async", "sync"], help=argparse.SUPPRESS)  # child process
+    return parser.parse_args()
+
+
+def authenticated_get_paths(main):
+    from fastapi.routing import APIRoute
+
+    paths = []
+    for route in main.app.routes:
+        if not isinstance(route, APIRoute) or "GET" not in route.methods:
+            continue
+        if any(dependency.call is main.get_current_user for dependency in route.dependant.dependencies):
+            paths.append(route.path)
+    return sorted(paths)
+
+
+async def check(db_mode):
+    import httpx
+    from sqlalchemy import event
+
+    import database
+    import main
+    from load_benchmark import PASSWORD, seed
+
+    database.init_database()
+    usernames = seed(database, 1, 7)
+    await main.startup_event()
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://check")
+    failures = []
+    try:
+        response = await client.post("/api/login/", json={"username": usernames[0], "password": PASSWORD})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['session_token']}"}
+        # Today's rows exist for some types and not for others
+        for path, body in (("/api/hydration/log/", {"glasses": 2}), ("/api/brushing/log/", {"session_type": "morning"}),
+                           ("/api/puzzles/submit/", {"puzzle_id": "seq-0-1", "user_sequence": [1]})):
+            (await client.post(path, json=body, headers=headers)).raise_for_status()
+
+        writes = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith(WRITE_KEYWORDS):
+                writes.append(" ".join(statement.split())[:120])
+
+        engines = [database.engine] + ([database.async_engine.sync_engine] if database.async_engine is not None else [])
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", record)
+
+        paths = authenticated_get_paths(main)
+        missing = REQUIRED_PATHS - set(paths)
+        if missing:
+            failures.append(f"not found among authenticated GET routes: {', '.join(sorted(missing))}")
+        for path in paths:
+            # A cold cache sends authentication through the database as well
+            main.session_cache.clear()
+            writes.clear()
+            response = await client.get(path, headers=headers)
+            status = "ok" if response.status_code == 200 and not writes else "FAIL"
+            print(f"  {status:<5}{response.status_code:>4}  {path}")
+            if response.status_code != 200:
+                failures.append(f"{path} answered {response.status_code}")
+            failures.extend(f"{path} wrote: {statement}" for statement in writes)
+    finally:
+        await client.aclose()
+        await main.shutdown_event()
+    return failures
+
+
+def run_child(db_mode):
+    workdir = tempfile.mkdtemp(prefix="wellness_check_")
+    os.environ.update(DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'check.db')}", DB_MODE=db_mode,
+                      AUTH_MODE="session", WRITE_BEHIND_ENABLED="false", AFFIRMATION_POOL_ENABLED="false",
+                      SESSION_SWEEP_INTERVAL_SECONDS="0", PUSH_ENABLED="false")
+    os.environ.pop("AIML_API_KEY", None)
+    sys.path.insert(0, os.path.join(HERE, ".."))
+    sys.path.insert(0, HERE)
+
+    failures = asyncio.run(check(db_mode))
+    for failure in failures:
+        print(f"  {failure}")
+    return 1 if failures else 0
+
+
+def main_cli():
+    args = parse_args()
+    if args.run:
+        sys.exit(run_child(args.run))
+
+    failed = []
+    for db_mode in args.db_mode or ["async", "sync"]:
+        print(f"DB_MODE={db_mode}")
+        result = subprocess.run([sys.executable, os.path.abspath(__file__), "--run", db_mode])
+        if result.returncode:
+            failed.append(db_mode)
+    print("FAILED: " + ", ".join(failed) if failed else "All authenticated GET endpoints are read-only")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Startup time benchmark for Wellness Arcade
+Measures, in fresh interpreters, how long `import main` takes and how long a
+uvicorn process takes from launch to its first 200 on /api/ping/, against a
+brand-new database (schema created at boot) and an existing one (schema
+version check only). Compare with the full setup on every boot:
+
+    python benchmarks/startup_benchmark.py --runs 5
+    python benchmarks/startup_benchmark.py --schema-check full
+    python benchmarks/startup_benchmark.py --show-imports 15
+"""
+
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+IMPORT_SNIPPET = "import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark import and boot time")
+    parser.add_argument("--runs", type=int, default=5, help="Measurements per phase")
+    parser.add_argument("--schema-check", choices=["version", "full"], default="version", help="DB_SCHEMA_CHECK for the runs")
+    parser.add_argument("--show-imports", type=int, default=0, help="Print the N slowest top-level imports of main")
+    return parser.parse_args()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import(env) -> float:
+    output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_PATH, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_first_ping(env, timeout: float = 60.0) -> float:
+    """Seconds from launching uvicorn until /api/ping/ answers 200"""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_PATH, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+                connection.request("GET", "/api/ping/")
+                if connection.getresponse().status == 200:
+                    return time.perf_counter() - started
+            except OSError:
+                pass
+            finally:
+                connection.close()
+            time.sleep(0.005)
+        raise RuntimeError("server did not answer /api/ping/ in time")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def show_imports(env, count: int):
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=BACKEND_PATH, env=env,
+                            capture_output=True, text=True, check=True).stderr
+    top_level = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Direct imports of main (and main itself) are indented by two spaces or less
+        if cumulative.strip().isdigit() and len(name) - len(name.lstrip()) <= 3:
+            top_level.append((int(cumulative), name.strip()))
+    print(f"\nSlowest top-level imports (cumulative):")
+    for cumulative, name in sorted(top_level, reverse=True)[:count]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+
+def summary(label: str, values):
+    values_ms = [value * 1000 for value in values]
+    print(f"{label:<32} median {statistics.median(values_ms):8.1f} ms   "
+          f"min {min(values_ms):8.1f} ms   max {max(values_ms):8.1f} ms")
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="wellness_bench_")
+    env = dict(os.environ, DB_SCHEMA_CHECK=args.schema_check, AFFIRMATION_POOL_ENABLED="false")
+    env.pop("AIML_API_KEY", None)
+
+    # Warm the bytecode cache so the first run is not an outlier
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'warmup.db')}"
+    measure_import(env)
+
+    imports = [measure_import(env) for _ in range(args.runs)]
+
+    fresh = []
+    for run in range(args.runs):
+        env["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, f'fresh_{run}.db')}"
+        fresh.append(measure_first_ping(env))
+
+    # The last fresh database now has its schema; boot against it repeatedly
+    existing = [measure_first_ping(env) for _ in range(args.runs)]
+
+    print(f"DB_SCHEMA_CHECK={args.schema_check}, {args.runs} runs each")
+    summary("import main", imports)
+    summary("first 200, new database", fresh)
+    summary("first 200, existing database", existing)
+
+    if args.show_imports:
+        show_imports(env, args.show_imports)
+
+
+if __name__ == "__main__":
+    main()
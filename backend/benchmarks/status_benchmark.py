@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Status endpoint benchmark for Wellness Arcade
+Seeds a large daily_wellness_data table and times /api/hydration/status/
+(and, as a breakdown, the bare (user_id, date, data_type) row lookup) with
+the composite index and again after dropping it, so both configurations go
+through the same endpoint:
+
+    python benchmarks/status_benchmark.py --users 2000 --days 30
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+GAME_TYPES = ["hydration", "brushing", "breathing", "puzzles", "emotions", "affirmations"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark status endpoint latency on a large table")
+    parser.add_argument("--users", type=int, default=2000, help="Users to seed")
+    parser.add_argument("--days", type=int, default=30, help="Days of history per user")
+    parser.add_argument("--requests", type=int, default=500, help="Status requests to time")
+    return parser.parse_args()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(label, latencies):
+    print(f"{label:<28} p50 {statistics.median(latencies):7.3f} ms   "
+          f"p95 {percentile(latencies, 95):7.3f} ms   p99 {percentile(latencies, 99):7.3f} ms")
+
+
+def seed(database, users, days):
+    """Bulk insert users, sessions and daily rows with executemany"""
+    today = date.today()
+    now = datetime.utcnow()
+    with database.engine.begin() as connection:
+        connection.execute(database.User.__table__.insert(), [
+            {"id": i + 1, "username": f"seed_{i}", "email": f"seed_{i}@example.com",
+             "hashed_password": "x", "created_at": now, "is_active": True}
+            for i in range(users)
+        ])
+        connection.execute(database.UserSession.__table__.insert(), [
+            {"session_token": f"seed_token_{i}", "user_id": i + 1,
+             "created_at": now, "expires_at": now + timedelta(days=1)}
+            for i in range(users)
+        ])
+        batch = []
+        for user_id in range(1, users + 1):
+            for offset in range(days):
+                day = (today - timedelta(days=offset)).isoformat()
+                for data_type in GAME_TYPES:
+                    batch.append({"user_id": user_id, "date": day, "data_type": data_type,
+                                  "count": offset % 8, "created_at": now, "updated_at": now})
+            if len(batch) >= 20000:
+                connection.execute(database.DailyWellnessData.__table__.insert(), batch)
+                batch = []
+        if batch:
+            connection.execute(database.DailyWellnessData.__table__.insert(), batch)
+
+
+def time_lookup(database, users, iterations):
+    """Time the raw daily row lookup that every status call performs"""
+    from sqlalchemy import select
+    table = database.DailyWellnessData.__table__
+    today = date.today().isoformat()
+    latencies = []
+    with database.engine.connect() as connection:
+        for i in range(iterations):
+            started = time.perf_counter()
+            connection.execute(select(table.c.count).where(
+                table.c.user_id == (i % users) + 1,
+                table.c.date == today,
+                table.c.data_type == "hydration"
+            )).first()
+            latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+async def time_endpoint(main, users, iterations):
+    import httpx
+    # Every run starts with a cold session cache so runs are comparable
+    main.session_cache.clear()
+    transport = httpx.ASGITransport(app=main.app)
+    latencies = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(iterations):
+            headers = {"Authorization": f"Bearer seed_token_{i % users}"}
+            started = time.perf_counter()
+            response = await client.get("/api/hydration/status/", headers=headers)
+            latencies.append((time.perf_counter() - started) * 1000)
+            response.raise_for_status()
+    return latencies
+
+
+def main_benchmark(args):
+    import database
+    import main
+
+    database.init_database()
+    started = time.perf_counter()
+    seed(database, args.users, args.days)
+    rows = args.users * args.days * len(GAME_TYPES)
+    print(f"seeded {rows} daily rows in {time.perf_counter() - started:.1f}s")
+
+    report("status endpoint (indexed)", asyncio.run(time_endpoint(main, args.users, args.requests)))
+    report("row lookup (indexed)", time_lookup(database, args.users, args.requests))
+
+    # Drop the composite index to reproduce the previous full-scan access path;
+    # the status endpoint only reads, so it runs unchanged without the index
+    with database.engine.begin() as connection:
+        connection.exec_driver_sql("DROP INDEX ux_daily_wellness_data_user_date_type")
+    report("status endpoint (no index)", asyncio.run(time_endpoint(main, args.users, args.requests)))
+    report("row lookup (no index)", time_lookup(database, args.users, args.requests))
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    # Configure the app before importing it
+    workdir = tempfile.mkdtemp(prefix="wellness_bench_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+    main_benchmark(args)
@@ -0,0 +1,103 @@
+"""
+Cross-process coordination for Wellness Arcade
+Background jobs that should run once (such as the expired session sweep and
+the affirmation pool refill) are guarded by a leader lock. On PostgreSQL it is
+a session-level advisory lock held on a dedicated connection, so it picks one
+worker across every host sharing the database. Otherwise it is an exclusive
+file lock, which only covers workers on one host; that is enough for SQLite,
+whose database file cannot be shared between hosts anyway. The worker holding
+the lock leads until it exits; the others retry on their next cycle and take
+over if the leader dies.
+"""
+
+import hashlib
+import os
+import tempfile
+from typing import Optional, TextIO
+
+try:
+    import fcntl
+except ImportError:  # No flock on Windows: every process leads
+    fcntl = None
+
+from sqlalchemy import text
+
+from database import DATABASE_URL, IS_POSTGRES, engine
+
+COORDINATION_LOCK_DIR = os.getenv("COORDINATION_LOCK_DIR", tempfile.gettempdir())
+
+
+class LeaderLock:
+    """Non-blocking exclusive lock shared by every process using the same database"""
+
+    def __init__(self, name: str, lock_dir: str = COORDINATION_LOCK_DIR):
+        database_key = hashlib.sha1(DATABASE_URL.encode()).hexdigest()[:10]
+        self.path = os.path.join(lock_dir, f"wellness_arcade_{name}_{database_key}.lock")
+        # Advisory lock keys are signed 64-bit integers
+        self.advisory_key = int.from_bytes(hashlib.sha1(f"wellness_arcade_{name}".encode()).digest()[:8], "big", signed=True)
+        self._file: Optional[TextIO] = None
+        self._connection = None
+
+    @property
+    def is_leader(self) -> bool:
+        if IS_POSTGRES:
+            return self._connection is not None
+        return fcntl is None or self._file is not None
+
+    def acquire(self) -> bool:
+        """Take the lock if it is free; the lock is held until release() or process exit.
+        On PostgreSQL this runs a query, so call it from a worker thread."""
+        if IS_POSTGRES:
+            return self._acquire_advisory()
+        if self.is_leader:
+            return True
+        lock_file = open(self.path, "a+")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+    def _acquire_advisory(self) -> bool:
+        if self._connection is not None:
+            # The lock lives as long as the connection; make sure it still does
+            try:
+                self._connection.execute(text("SELECT 1"))
+                self._connection.commit()
+                return True
+            except Exception as e:
+                print(f"Lost leader lock connection: {e}")
+                self._connection.invalidate()
+                self._connection.close()
+                self._connection = None
+
+        connection = engine.connect()
+        try:
+            acquired = connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.advisory_key}).scalar()
+            connection.commit()
+        except Exception:
+            connection.close()
+            raise
+        if not acquired:
+            connection.close()
+            return False
+        # Kept checked out of the pool: closing it would hand the lock to another checkout
+        self._connection = connection
+        return True
+
+    def release(self):
+        if self._connection is not None:
+            try:
+                self._connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.advisory_key})
+                self._connection.commit()
+            except Exception as e:
+                print(f"Error releasing leader lock: {e}")
+                self._connection.invalidate()
+            self._connection.close()
+            self._connection = None
+        if self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
@@ -0,0 +1,165 @@
+"""
+Streaming data export for Wellness Arcade
+/api/export/ streams a user's daily counters and logged events, and
+/api/admin/export/ those of every user, as NDJSON or CSV. Rows are read
+through a server-side cursor EXPORT_BATCH_SIZE at a time and each batch is
+encoded and sent before the next one is fetched, so memory stays flat however
+long the history is. An export holds one database connection until it ends,
+so EXPORT_MAX_CONCURRENT caps how many run at once per worker.
+"""
+
+import csv
+import hmac
+import io
+import json
+import os
+import time
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+
+from sqlalchemy import select
+
+from database import open_async_session, DailyWellnessData, WellnessEvent
+
+# Export configuration
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))  # rows fetched and sent per chunk
+EXPORT_MAX_CONCURRENT = int(os.getenv("EXPORT_MAX_CONCURRENT", "4"))  # per worker
+EXPORT_ADMIN_TOKEN = os.getenv("EXPORT_ADMIN_TOKEN", "")  # enables /api/admin/export/ when set
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+DAILY_COLUMNS = ["id", "user_id", "date", "data_type", "count", "current_run", "best_run", "created_at", "updated_at"]
+EVENT_COLUMNS = ["id", "user_id", "date", "data_type", "payload", "created_at"]
+# Both record kinds share one CSV header; columns that do not apply are empty
+CSV_COLUMNS = ["record", "id", "user_id", "date", "data_type", "count", "current_run", "best_run",
+               "payload", "created_at", "updated_at"]
+
+
+def _text(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def encode_ndjson(record: str, columns: List[str], rows) -> str:
+    lines = []
+    for row in rows:
+        values = {"record": record, **{column: _text(value) for column, value in zip(columns, row)}}
+        payload = values.pop("payload", None)
+        line = json.dumps(values, separators=(",", ":"))
+        if payload is not None:
+            # Payloads are stored as JSON; splice them in rather than parsing each one
+            line = f'{line[:-1]},"payload":{payload}}}'
+        lines.append(line)
+    lines.append("")
+    return "\n".join(lines)
+
+
+def encode_csv(record: str, columns: List[str], rows) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        values = dict(zip(columns, row), record=record)
+        writer.writerow([_text(values.get(column)) for column in CSV_COLUMNS])
+    return buffer.getvalue()
+
+
+class ExportSlot:
+    """One of the concurrent export places, held from the request until the
+    body ends; release() may be called more than once"""
+
+    def __init__(self, exporter: "DataExporter"):
+        self._exporter = exporter
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self._exporter.active -= 1
+
+
+class DataExporter:
+    """Streams daily counters and events out of the database in constant memory"""
+
+    def __init__(self, batch_size: int = EXPORT_BATCH_SIZE, max_concurrent: int = EXPORT_MAX_CONCURRENT,
+                 admin_token: str = EXPORT_ADMIN_TOKEN):
+        self.batch_size = max(1, batch_size)
+        self.max_concurrent = max_concurrent
+        self.admin_token = admin_token
+        self.active = 0
+        self.exports = 0
+        self.rows = 0
+        self.rejected = 0
+        self.failed = 0
+        self.last_export_ms: Optional[float] = None
+
+    def acquire(self) -> Optional[ExportSlot]:
+        """Reserve an export slot before the response is returned, so requests
+        arriving before any body starts are still counted; None when all are taken"""
+        if self.active >= self.max_concurrent:
+            self.rejected += 1
+            return None
+        self.active += 1
+        return ExportSlot(self)
+
+    def is_admin_token(self, token: Optional[str]) -> bool:
+        return bool(self.admin_token and token) and hmac.compare_digest(token.encode(), self.admin_token.encode())
+
+    def statements(self, user_id: Optional[int], start: Optional[str], end: Optional[str],
+                   data_types: Optional[List[str]]):
+        """(record, columns, select) for the daily rows and then the events"""
+        for record, model, columns in (("daily", DailyWellnessData, DAILY_COLUMNS),
+                                       ("event", WellnessEvent, EVENT_COLUMNS)):
+            statement = select(*(getattr(model, column) for column in columns))
+            if user_id is not None:
+                # A single user's rows come off the (user_id, date, data_type) index in order
+                statement = statement.where(model.user_id == user_id).order_by(model.date, model.data_type, model.id)
+            else:
+                statement = statement.order_by(model.id)
+            if start:
+                statement = statement.where(model.date >= start)
+            if end:
+                statement = statement.where(model.date <= end)
+            if data_types:
+                statement = statement.where(model.data_type.in_(data_types))
+            yield record, columns, statement.execution_options(yield_per=self.batch_size)
+
+    async def stream(self, slot: ExportSlot, export_format: str, user_id: Optional[int] = None,
+                     start: Optional[str] = None, end: Optional[str] = None,
+                     data_types: Optional[List[str]] = None) -> AsyncIterator[str]:
+        """Encoded chunks of one user's rows (every user's for None), one batch
+        per chunk; releases slot when done"""
+        encode = encode_csv if export_format == "csv" else encode_ndjson
+        self.exports += 1
+        started = time.perf_counter()
+        try:
+            if export_format == "csv":
+                yield ",".join(CSV_COLUMNS) + "\r\n"
+            # Its own session: the request's session is closed before the body is sent
+            async with open_async_session() as db:
+                for record, columns, statement in self.statements(user_id, start, end, data_types):
+                    result = await db.stream(statement)
+                    async for rows in result.partitions():
+                        self.rows += len(rows)
+                        yield encode(record, columns, rows)
+            self.last_export_ms = round((time.perf_counter() - started) * 1000, 2)
+        except Exception as e:
+            # The status line is already sent; ending the body early tells the client
+            self.failed += 1
+            print(f"Error streaming data export: {e}")
+            raise
+        finally:
+            slot.release()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "max_concurrent": self.max_concurrent,
+            "exports": self.exports,
+            "rows": self.rows,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "last_export_ms": self.last_export_ms or 0,
+        }
+
+
+# Shared exporter used by the API
+data_exporter = DataExporter()
@@ -3,29 +3,122 @@ Database configuration and setup for Wellness Arcade
 Supports both SQLite (development) and PostgreSQL (production)
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Text, Float
+from sqlalchemy import create_engine, event, inspect, func, select, insert, update, Column, Integer, String, DateTime, Boolean, Text, Float, Index
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime, date, timedelta
+from typing import Iterable, Optional, Tuple
+import asyncio
+import contextvars
+import functools
+import json
 import os
 
+from puzzle_engine import apply_results
+
 # Database URL - supports both SQLite and PostgreSQL
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./wellness_arcade.db")
 
+# API handlers use the async engine by default ("async"); set DB_MODE=sync to
+# run them on the synchronous engine through a worker thread instead
+DB_MODE = os.getenv("DB_MODE", "async").lower()
+
+# Engine profile for PostgreSQL: connection pool sizing and a per-statement
+# timeout so one slow query cannot hold a pooled connection indefinitely
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT_SECONDS = int(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+
+# Engine profile for SQLite: pragmas applied to every new connection. WAL lets
+# readers run alongside the single writer and busy_timeout makes writers wait
+# for the lock instead of failing with "database is locked"
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Worker threads (and concurrent sessions) for DB_MODE=sync; keep this at or
+# below the engine's pool capacity so sessions never wait on each other
+DB_SYNC_THREADS = int(os.getenv("DB_SYNC_THREADS", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+
+IS_POSTGRES = DATABASE_URL.startswith("postgresql")
+
+def postgres_engine_options(async_driver: bool = False) -> dict:
+    """Pool and statement timeout settings for the PostgreSQL engines"""
+    if async_driver:
+        connect_args = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+    else:
+        connect_args = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Set the SQLite pragmas on each new connection"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+    cursor.close()
+
 # Create SQLAlchemy engine with appropriate settings
-if DATABASE_URL.startswith("postgresql"):
+if IS_POSTGRES:
     # PostgreSQL configuration
-    engine = create_engine(DATABASE_URL)
+    from sqlalchemy.dialects.postgresql import insert as upsert_insert
+    engine = create_engine(DATABASE_URL, **postgres_engine_options())
 else:
+    from sqlalchemy.dialects.sqlite import insert as upsert_insert  # Supports ON CONFLICT
     # SQLite configuration (development)
     engine = create_engine(
         DATABASE_URL, 
         connect_args={"check_same_thread": False}  # Needed for SQLite
     )
+    event.listen(engine, "connect", apply_sqlite_pragmas)
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def get_async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto its async driver (aiosqlite / asyncpg)"""
+    scheme, sep, rest = url.partition("://")
+    if scheme.startswith("postgres"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    if scheme.startswith("sqlite"):
+        return f"sqlite+aiosqlite{sep}{rest}"
+    return url
+
+# Create async engine and AsyncSessionLocal class for the API handlers
+async_engine = None
+AsyncSessionLocal = None
+if DB_MODE == "async":
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+    if IS_POSTGRES:
+        async_engine = create_async_engine(get_async_database_url(DATABASE_URL), **postgres_engine_options(async_driver=True))
+    else:
+        async_engine = create_async_engine(get_async_database_url(DATABASE_URL))
+        event.listen(async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+    AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+# Schema version recorded in the database. Bump it whenever models, indexes or
+# data migrations change so existing databases are upgraded at the next boot;
+# databases already at this version skip create_all and the migrations.
+# DB_SCHEMA_CHECK=full runs the complete setup on every boot instead.
+SCHEMA_VERSION = 4
+DB_SCHEMA_CHECK = os.getenv("DB_SCHEMA_CHECK", "version").lower()
+
 # Create Base class for models
 Base = declarative_base()
 
@@ -39,28 +132,101 @@ class User(Base):
     hashed_password = Column(String(255), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     is_active = Column(Boolean, default=True)
+    tokens_revoked_before = Column(DateTime, nullable=True)  # JWT auth: tokens issued earlier are rejected
 
 class UserSession(Base):
     __tablename__ = "user_sessions"
     
     id = Column(Integer, primary_key=True, index=True)
     session_token = Column(String(255), unique=True, index=True, nullable=False)
-    user_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    expires_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
 
 class DailyWellnessData(Base):
     __tablename__ = "daily_wellness_data"
+    __table_args__ = (
+        Index("ux_daily_wellness_data_user_date_type", "user_id", "date", "data_type", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, nullable=False)
     date = Column(String(10), nullable=False)  # YYYY-MM-DD format
     data_type = Column(String(50), nullable=False)  # hydration, brushing, breathing, etc.
     count = Column(Integer, default=0)
-    data_json = Column(Text)  # JSON string for additional data
+    # Puzzle rows: consecutive correct answers ending with the latest one, and the day's longest run
+    current_run = Column(Integer, nullable=True)
+    best_run = Column(Integer, nullable=True)
+    data_json = Column(Text)  # Legacy JSON list of events, migrated into wellness_events
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class WellnessEvent(Base):
+    __tablename__ = "wellness_events"
+    __table_args__ = (
+        Index("ix_wellness_events_user_date_type", "user_id", "date", "data_type"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False)
+    date = Column(String(10), nullable=False)  # YYYY-MM-DD format
+    data_type = Column(String(50), nullable=False)  # hydration, brushing, breathing, etc.
+    payload = Column(Text, nullable=False)  # JSON object for this single event
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+    
+    id = Column(Integer, primary_key=True)  # single row, id 1
+    version = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class WarmAffirmation(Base):
+    __tablename__ = "warm_affirmations"
+    
+    word_key = Column(String(255), primary_key=True)  # JSON list of the normalized words
+    affirmation = Column(Text, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+class LiveStreamTicket(Base):
+    __tablename__ = "live_stream_tickets"
+    
+    ticket = Column(String(64), primary_key=True)  # one-time credential for opening /api/live/
+    user_id = Column(Integer, nullable=False)
+    session = Column(String(64), nullable=True)  # digest of the session token; None for JWT
+    session_expires_at = Column(DateTime, nullable=True)  # when the stream has to end
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+# Streak row data_type covering activity of any type
+STREAK_ALL = "all"
+
+class WellnessStreak(Base):
+    __tablename__ = "wellness_streaks"
+    __table_args__ = (
+        Index("ux_wellness_streaks_user_type", "user_id", "data_type", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False)
+    data_type = Column(String(50), nullable=False)  # a wellness data type, or STREAK_ALL
+    current_streak = Column(Integer, default=0)  # consecutive active days ending at last_active_date
+    longest_streak = Column(Integer, default=0)
+    last_active_date = Column(String(10))  # YYYY-MM-DD format
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+def compute_streaks(active_dates: Iterable[str]) -> Tuple[int, int, Optional[str]]:
+    """Current run, longest run and last date from ascending YYYY-MM-DD dates"""
+    current = longest = 0
+    previous = None
+    for day in active_dates:
+        day_value = date.fromisoformat(day)
+        if previous is not None and day_value == previous:
+            continue
+        current = current + 1 if previous is not None and day_value - previous == timedelta(days=1) else 1
+        longest = max(longest, current)
+        previous = day_value
+    return current, longest, previous.isoformat() if previous else None
+
 # Database dependency
 def get_db():
     db = SessionLocal()
@@ -69,11 +235,354 @@ def get_db():
     finally:
         db.close()
 
+class SyncStreamedResult:
+    """AsyncResult.partitions() over a sync Result, fetching each partition in a worker thread"""
+
+    def __init__(self, adapter, result):
+        self.adapter = adapter
+        self.result = result
+
+    async def partitions(self, size: Optional[int] = None):
+        partitions = self.result.partitions(size)
+        while True:
+            rows = await self.adapter._run(next, partitions, None)
+            if rows is None:
+                return
+            yield rows
+
+class SyncSessionAdapter:
+    """Exposes the AsyncSession methods used by the API over a sync Session.
+
+    Each blocking call runs in a worker thread so DB_MODE=sync still keeps the
+    event loop free.
+    """
+
+    _executor = None
+    _slots = None
+
+    def __init__(self, session):
+        self.session = session
+
+    @classmethod
+    def acquire_slot(cls):
+        # A session holds its connection across awaits; capping open sessions
+        # at the thread count stops threads blocking on an exhausted pool
+        if cls._slots is None:
+            cls._slots = asyncio.Semaphore(DB_SYNC_THREADS)
+        return cls._slots
+
+    @classmethod
+    def shutdown(cls):
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=True)
+            cls._executor = None
+
+    async def _run(self, func, *args, **kwargs):
+        if SyncSessionAdapter._executor is None:
+            SyncSessionAdapter._executor = ThreadPoolExecutor(max_workers=DB_SYNC_THREADS, thread_name_prefix="db")
+        loop = asyncio.get_running_loop()
+        # Run in a copy of the caller's context (as asyncio.to_thread does) so
+        # context variables such as per-request metrics are visible in the thread
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(SyncSessionAdapter._executor, functools.partial(context.run, func, *args, **kwargs))
+
+    def add(self, instance):
+        self.session.add(instance)
+
+    def add_all(self, instances):
+        self.session.add_all(instances)
+
+    async def execute(self, statement, *args, **kwargs):
+        return await self._run(self.session.execute, statement, *args, **kwargs)
+
+    async def scalar(self, statement, *args, **kwargs):
+        return await self._run(self.session.scalar, statement, *args, **kwargs)
+
+    async def scalars(self, statement, *args, **kwargs):
+        return await self._run(self.session.scalars, statement, *args, **kwargs)
+
+    async def stream(self, statement, *args, **kwargs):
+        result = await self._run(self.session.execute, statement, *args, **kwargs)
+        return SyncStreamedResult(self, result)
+
+    async def get(self, entity, ident, **kwargs):
+        return await self._run(self.session.get, entity, ident, **kwargs)
+
+    async def delete(self, instance):
+        await self._run(self.session.delete, instance)
+
+    async def connection(self):
+        return await self._run(self.session.connection)
+
+    async def flush(self):
+        await self._run(self.session.flush)
+
+    async def commit(self):
+        await self._run(self.session.commit)
+
+    async def rollback(self):
+        await self._run(self.session.rollback)
+
+    async def refresh(self, instance):
+        await self._run(self.session.refresh, instance)
+
+    async def close(self):
+        await self._run(self.session.close)
+
+# Async session for background tasks and the API dependency below
+@asynccontextmanager
+async def open_async_session():
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        async with SyncSessionAdapter.acquire_slot():
+            db = SyncSessionAdapter(SessionLocal(expire_on_commit=False))
+            try:
+                yield db
+            finally:
+                await db.close()
+
+# Async database dependency used by the API handlers
+async def get_async_db():
+    async with open_async_session() as db:
+        yield db
+
+# Release pooled connections on shutdown
+async def dispose_engines():
+    if async_engine is not None:
+        await async_engine.dispose()
+    SyncSessionAdapter.shutdown()
+    engine.dispose()
+
 # Create all tables
 def create_tables():
     Base.metadata.create_all(bind=engine)
 
+# Merge duplicate (user_id, date, data_type) rows so the unique index can be built
+def merge_duplicate_daily_rows() -> int:
+    db = SessionLocal()
+    merged = 0
+    try:
+        duplicates = db.query(
+            DailyWellnessData.user_id, DailyWellnessData.date, DailyWellnessData.data_type
+        ).group_by(
+            DailyWellnessData.user_id, DailyWellnessData.date, DailyWellnessData.data_type
+        ).having(func.count(DailyWellnessData.id) > 1).all()
+        
+        for user_id, day, data_type in duplicates:
+            records = db.query(DailyWellnessData).filter(
+                DailyWellnessData.user_id == user_id,
+                DailyWellnessData.date == day,
+                DailyWellnessData.data_type == data_type
+            ).order_by(DailyWellnessData.id).all()
+            
+            keeper, extras = records[0], records[1:]
+            keeper.count = sum(record.count or 0 for record in records)
+            legacy_entries = []
+            for record in records:
+                legacy_entries.extend(load_legacy_entries(record))
+            keeper.data_json = json.dumps(legacy_entries) if legacy_entries else None
+            for record in extras:
+                db.delete(record)
+                merged += 1
+        
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    
+    return merged
+
+# Add nullable columns that create_all does not add to tables that already exist
+def ensure_columns():
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+                print(f"Added column {table.name}.{column.name}")
+
+# Add indexes that create_all does not add to tables that already exist
+def ensure_indexes():
+    existing = {index["name"] for index in inspect(engine).get_indexes(DailyWellnessData.__tablename__)}
+    if "ux_daily_wellness_data_user_date_type" not in existing:
+        merged = merge_duplicate_daily_rows()
+        if merged:
+            print(f"Merged {merged} duplicate daily wellness rows")
+    
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+# Event objects from a legacy data_json value; anything that is not a JSON
+# list of objects is skipped (and logged) rather than migrated
+def load_legacy_entries(record) -> list:
+    if not record.data_json:
+        return []
+    try:
+        entries = json.loads(record.data_json)
+    except ValueError:
+        print(f"Skipping unreadable data_json on daily row {record.id}")
+        return []
+    if not isinstance(entries, list):
+        print(f"Skipping data_json on daily row {record.id}: expected a list, got {type(entries).__name__}")
+        return []
+    events = [entry for entry in entries if isinstance(entry, dict)]
+    if len(events) < len(entries):
+        print(f"Skipping {len(entries) - len(events)} non-object data_json entries on daily row {record.id}")
+    return events
+
+# Explode legacy data_json lists into one wellness_events row per entry
+def migrate_data_json_to_events(batch_size: int = 500) -> int:
+    db = SessionLocal()
+    migrated = 0
+    try:
+        while True:
+            records = db.query(DailyWellnessData).filter(
+                DailyWellnessData.data_json.isnot(None)
+            ).limit(batch_size).all()
+            if not records:
+                break
+            
+            for record in records:
+                for entry in load_legacy_entries(record):
+                    try:
+                        created_at = datetime.fromisoformat(entry["timestamp"])
+                    except (KeyError, TypeError, ValueError):
+                        created_at = record.created_at
+                    db.add(WellnessEvent(
+                        user_id=record.user_id,
+                        date=record.date,
+                        data_type=record.data_type,
+                        payload=json.dumps(entry),
+                        created_at=created_at
+                    ))
+                    migrated += 1
+                
+                record.data_json = None
+            
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    
+    return migrated
+
+# Build wellness_streaks from the daily rollups when it has never been populated
+def backfill_wellness_streaks() -> int:
+    db = SessionLocal()
+    created = 0
+    try:
+        if db.query(WellnessStreak.id).first() is not None:
+            return 0
+        
+        active = DailyWellnessData.count > 0
+        per_type = db.query(DailyWellnessData.user_id, DailyWellnessData.data_type, DailyWellnessData.date).filter(
+            active
+        ).order_by(DailyWellnessData.user_id, DailyWellnessData.data_type, DailyWellnessData.date)
+        any_type = db.query(DailyWellnessData.user_id, DailyWellnessData.date).filter(active).distinct().order_by(
+            DailyWellnessData.user_id, DailyWellnessData.date
+        )
+        
+        dates_by_key = {}
+        for user_id, data_type, day in per_type:
+            dates_by_key.setdefault((user_id, data_type), []).append(day)
+        for user_id, day in any_type:
+            dates_by_key.setdefault((user_id, STREAK_ALL), []).append(day)
+        
+        for (user_id, data_type), days in dates_by_key.items():
+            current, longest, last_active_date = compute_streaks(days)
+            db.add(WellnessStreak(
+                user_id=user_id,
+                data_type=data_type,
+                current_streak=current,
+                longest_streak=longest,
+                last_active_date=last_active_date
+            ))
+            created += 1
+        
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    
+    return created
+
+# Fill in puzzle runs for rows logged before they were maintained incrementally
+def backfill_puzzle_runs() -> int:
+    db = SessionLocal()
+    updated = 0
+    try:
+        records = db.query(DailyWellnessData).filter(
+            DailyWellnessData.data_type == "puzzles",
+            DailyWellnessData.best_run.is_(None)
+        ).all()
+        for record in records:
+            payloads = db.query(WellnessEvent.payload).filter(
+                WellnessEvent.user_id == record.user_id,
+                WellnessEvent.date == record.date,
+                WellnessEvent.data_type == "puzzles"
+            ).order_by(WellnessEvent.id)
+            results = [json.loads(payload).get("correct", False) for payload, in payloads]
+            record.current_run, record.best_run = apply_results(0, 0, results)
+            updated += 1
+        
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    
+    return updated
+
+# Read the recorded schema version; None if it was never recorded
+def get_schema_version() -> Optional[int]:
+    try:
+        with engine.connect() as connection:
+            return connection.execute(select(SchemaVersion.version).where(SchemaVersion.id == 1)).scalar()
+    except DBAPIError:
+        return None  # schema_version table does not exist yet
+
+def set_schema_version():
+    with engine.begin() as connection:
+        updated = connection.execute(
+            update(SchemaVersion).where(SchemaVersion.id == 1).values(version=SCHEMA_VERSION, updated_at=datetime.utcnow())
+        ).rowcount
+        if not updated:
+            connection.execute(insert(SchemaVersion).values(id=1, version=SCHEMA_VERSION, updated_at=datetime.utcnow()))
+
 # Initialize database
 def init_database():
+    # One cheap query instead of create_all and the migration checks on every boot
+    if DB_SCHEMA_CHECK != "full":
+        version = get_schema_version()
+        if version is not None and version >= SCHEMA_VERSION:
+            print(f"Database schema is up to date (version {version})")
+            return
+    
     create_tables()
+    ensure_columns()
+    ensure_indexes()
+    migrated = migrate_data_json_to_events()
+    if migrated:
+        print(f"Migrated {migrated} wellness entries into wellness_events")
+    backfilled = backfill_wellness_streaks()
+    if backfilled:
+        print(f"Backfilled {backfilled} wellness streaks from daily data")
+    backfilled = backfill_puzzle_runs()
+    if backfilled:
+        print(f"Backfilled puzzle runs for {backfilled} daily rows")
+    set_schema_version()
     print("Database initialized successfully!")
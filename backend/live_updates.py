@@ -0,0 +1,416 @@
+"""
+Live counter updates for Wellness Arcade
+Clients keep one Server-Sent Events stream open on /api/live/ instead of
+re-requesting status endpoints after every action; log and reset handlers
+publish each change once it is committed. Messages go through a broker:
+in-process by default, or PostgreSQL LISTEN/NOTIFY (PUSH_BROKER=postgres) so
+every worker delivers to the streams it holds. Each stream has a bounded
+queue; a client that falls behind gets one "resync" event instead of the
+backlog and reloads its counters. Logging out, or logging in again, closes
+the affected streams through the broker as well.
+
+EventSource cannot send an Authorization header, so a stream is opened with a
+one-time ticket from an authenticated POST rather than the session token,
+which would otherwise end up in access logs. Tickets live in the database so
+any worker can redeem them.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import secrets
+import signal
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Set
+
+from sqlalchemy import delete
+
+from database import LiveStreamTicket
+
+# Live update configuration
+PUSH_ENABLED = os.getenv("PUSH_ENABLED", "true").lower() == "true"
+PUSH_BROKER = os.getenv("PUSH_BROKER", "memory").lower()  # "memory" or "postgres"
+PUSH_QUEUE_SIZE = int(os.getenv("PUSH_QUEUE_SIZE", "32"))  # events queued per stream before it resyncs
+PUSH_KEEPALIVE_SECONDS = float(os.getenv("PUSH_KEEPALIVE_SECONDS", "25"))
+PUSH_MAX_STREAMS = int(os.getenv("PUSH_MAX_STREAMS", "10000"))  # per worker
+PUSH_TICKET_TTL_SECONDS = float(os.getenv("PUSH_TICKET_TTL_SECONDS", "30"))  # to open a stream
+PUSH_PUBLISH_POOL_SIZE = int(os.getenv("PUSH_PUBLISH_POOL_SIZE", "4"))  # postgres broker NOTIFY connections
+
+# NOTIFY channel shared by every worker using the database
+PUSH_CHANNEL = "wellness_live"
+# Browsers wait this long before reconnecting a dropped stream
+RECONNECT_MS = 3000
+KEEPALIVE_FRAME = ": keepalive\n\n"
+RESYNC_FRAME = "event: resync\ndata: {}\n\n"
+# Control message sent through the broker instead of a frame: "!close <before> [session]"
+CLOSE_PREFIX = "!close "
+
+# Delivers a formatted frame to a user's local streams (all streams for None)
+Deliver = Callable[[Optional[int], str], None]
+
+
+def format_frame(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def session_key(token: str) -> str:
+    """Short digest identifying a session's streams without sending the token through the broker"""
+    return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+class MemoryBroker:
+    """Delivers in this process only; enough for a single worker"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._deliver: Optional[Deliver] = None
+
+    async def start(self, deliver: Deliver):
+        self._deliver = deliver
+
+    async def publish(self, user_id: int, frame: str):
+        if self._deliver is not None:
+            self._deliver(user_id, frame)
+
+    async def stop(self):
+        self._deliver = None
+
+
+class PostgresBroker:
+    """Fans out through LISTEN/NOTIFY on the application database, so a log
+    handled by one worker reaches streams held by the others. One connection
+    listens; publishes go through a small pool of their own so they neither
+    queue behind each other nor behind a reconnect."""
+
+    name = "postgres"
+
+    def __init__(self, database_url: str, channel: str = PUSH_CHANNEL, publish_pool_size: int = PUSH_PUBLISH_POOL_SIZE):
+        # asyncpg takes a plain postgresql:// DSN
+        scheme, sep, rest = database_url.partition("://")
+        self.dsn = f"postgresql{sep}{rest}"
+        self.channel = channel
+        self.publish_pool_size = max(1, publish_pool_size)
+        self._deliver: Optional[Deliver] = None
+        self._connection = None
+        self._pool = None
+        self._reconnecting: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()  # guards (re)connecting the listening connection
+
+    def _on_notify(self, connection, pid, channel, payload: str):
+        user_id, _, frame = payload.partition(" ")
+        if self._deliver is not None:
+            self._deliver(int(user_id), frame)
+
+    def _on_terminate(self, connection):
+        if self._deliver is not None:
+            self._reconnecting = asyncio.create_task(self._reconnect())
+
+    async def _connect(self):
+        import asyncpg
+
+        connection = await asyncpg.connect(self.dsn)
+        await connection.add_listener(self.channel, self._on_notify)
+        connection.add_termination_listener(self._on_terminate)
+        self._connection = connection
+
+    async def _reconnect(self):
+        """Listen again after the connection drops; streams missed the events
+        in between, so every local client is told to reload"""
+        delay = 0.5
+        while self._deliver is not None:
+            try:
+                async with self._lock:
+                    if self._connection is None or self._connection.is_closed():
+                        await self._connect()
+                self._deliver(None, RESYNC_FRAME)
+                return
+            except Exception as e:
+                print(f"Error reconnecting to the live update broker: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 10)
+
+    async def start(self, deliver: Deliver):
+        import asyncpg
+
+        self._deliver = deliver
+        self._pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=self.publish_pool_size)
+        async with self._lock:
+            await self._connect()
+
+    async def publish(self, user_id: int, frame: str):
+        # The pool replaces broken connections; the listener reconnects on its own
+        await self._pool.execute("SELECT pg_notify($1, $2)", self.channel, f"{user_id} {frame}")
+
+    async def stop(self):
+        self._deliver = None
+        async with self._lock:
+            if self._connection is not None and not self._connection.is_closed():
+                await self._connection.close()
+            self._connection = None
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+
+def create_broker(name: str = PUSH_BROKER):
+    if name == "postgres":
+        from database import DATABASE_URL, IS_POSTGRES
+
+        if not IS_POSTGRES:
+            raise ValueError("PUSH_BROKER=postgres needs a PostgreSQL DATABASE_URL")
+        return PostgresBroker(DATABASE_URL)
+    if name == "memory":
+        return MemoryBroker()
+    raise ValueError(f"Unknown PUSH_BROKER: {name}")
+
+
+class StreamTicket(NamedTuple):
+    user_id: int
+    session: Optional[str]
+    expires_at: Optional[datetime]
+
+
+class Subscriber:
+    """One open stream: pending frames plus a wake-up flag"""
+
+    __slots__ = ("user_id", "expires_at", "session", "opened_at", "closed", "frames", "ready")
+
+    def __init__(self, user_id: int, expires_at: Optional[datetime], session: Optional[str] = None):
+        self.user_id = user_id
+        self.expires_at = expires_at
+        self.session = session
+        self.opened_at = time.time()  # wall clock: compared with close requests from other workers
+        self.closed = False
+        self.frames: List[str] = []
+        self.ready = asyncio.Event()
+
+
+class LiveUpdates:
+    """Per-user fan-out of counter changes to open event streams"""
+
+    def __init__(self, enabled: bool = PUSH_ENABLED, broker_name: str = PUSH_BROKER,
+                 queue_size: int = PUSH_QUEUE_SIZE, keepalive_seconds: float = PUSH_KEEPALIVE_SECONDS,
+                 max_streams: int = PUSH_MAX_STREAMS, ticket_ttl_seconds: float = PUSH_TICKET_TTL_SECONDS):
+        self.enabled = enabled
+        self.broker_name = broker_name
+        self.queue_size = max(1, queue_size)
+        self.keepalive_seconds = keepalive_seconds
+        self.max_streams = max_streams
+        self.ticket_ttl_seconds = ticket_ttl_seconds
+        self.broker = None
+        self.streams = 0
+        self.published = 0
+        self.delivered = 0
+        self.resyncs = 0
+        self.rejected_streams = 0
+        self.publish_errors = 0
+        self.closed_streams = 0
+        self._subscribers: Dict[int, Set[Subscriber]] = {}
+        self._stopping = False
+
+    def has_capacity(self) -> bool:
+        if self.streams >= self.max_streams:
+            self.rejected_streams += 1
+            return False
+        return True
+
+    async def issue_ticket(self, user_id: int, session: Optional[str], expires_at: Optional[datetime], db) -> str:
+        """Store a one-time ticket for opening a stream as this user and session"""
+        ticket = secrets.token_urlsafe(32)
+        now = datetime.utcnow()
+        # Unused tickets are only ever a few seconds old; clear the expired ones here
+        await db.execute(delete(LiveStreamTicket).where(LiveStreamTicket.expires_at < now))
+        db.add(LiveStreamTicket(ticket=ticket, user_id=user_id, session=session, session_expires_at=expires_at,
+                                expires_at=now + timedelta(seconds=self.ticket_ttl_seconds)))
+        await db.commit()
+        return ticket
+
+    async def redeem_ticket(self, ticket: str, db) -> Optional[StreamTicket]:
+        """Consume a ticket; None if it is unknown, used or expired"""
+        row = (await db.execute(delete(LiveStreamTicket).where(
+            LiveStreamTicket.ticket == ticket,
+            LiveStreamTicket.expires_at >= datetime.utcnow()
+        ).returning(LiveStreamTicket.user_id, LiveStreamTicket.session, LiveStreamTicket.session_expires_at))).first()
+        await db.commit()
+        return StreamTicket(*row) if row else None
+
+    async def revoke_tickets(self, user_id: int, db, session: Optional[str] = None):
+        """Drop unused tickets of a user (of one session when given); the caller commits"""
+        statement = delete(LiveStreamTicket).where(LiveStreamTicket.user_id == user_id)
+        if session:
+            statement = statement.where(LiveStreamTicket.session == session)
+        await db.execute(statement)
+
+    def subscribe(self, user_id: int, expires_at: Optional[datetime] = None, session: Optional[str] = None) -> Subscriber:
+        subscriber = Subscriber(user_id, expires_at, session)
+        self._subscribers.setdefault(user_id, set()).add(subscriber)
+        self.streams += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self._subscribers.get(subscriber.user_id)
+        if subscribers is None or subscriber not in subscribers:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self._subscribers[subscriber.user_id]
+        self.streams -= 1
+
+    def deliver(self, user_id: Optional[int], frame: str):
+        """Queue a frame on the user's local streams (every stream when user_id is None)"""
+        if frame.startswith(CLOSE_PREFIX):
+            self._close_local(user_id, frame)
+            return
+        if user_id is None:
+            targets = [subscriber for subscribers in self._subscribers.values() for subscriber in subscribers]
+        else:
+            targets = self._subscribers.get(user_id, ())
+        for subscriber in targets:
+            if subscriber.frames and subscriber.frames[0] is RESYNC_FRAME:
+                continue  # the client reloads everything anyway
+            if len(subscriber.frames) >= self.queue_size:
+                # Slow consumer: drop the backlog, the client reloads its counters
+                subscriber.frames.clear()
+                subscriber.frames.append(RESYNC_FRAME)
+                self.resyncs += 1
+            else:
+                subscriber.frames.append(frame)
+                self.delivered += 1
+            subscriber.ready.set()
+
+    async def publish(self, user_id: int, event: str, data: dict):
+        """Send an event to every stream of a user; errors are logged, never raised"""
+        if not self.enabled or self.broker is None:
+            return
+        try:
+            await self.broker.publish(user_id, format_frame(event, data))
+            self.published += 1
+        except Exception as e:
+            self.publish_errors += 1
+            print(f"Error publishing live update: {e}")
+
+    def _close_local(self, user_id: int, message: str):
+        before, _, session = message[len(CLOSE_PREFIX):].partition(" ")
+        for subscriber in self._subscribers.get(user_id, ()):
+            if subscriber.opened_at < float(before) and (not session or subscriber.session == session):
+                subscriber.closed = True
+                subscriber.ready.set()
+                self.closed_streams += 1
+
+    async def close_user(self, user_id: int, session: Optional[str] = None):
+        """End a user's streams opened so far on every worker: only those of
+        one session when given, otherwise all of them"""
+        if not self.enabled or self.broker is None:
+            return
+        try:
+            await self.broker.publish(user_id, f"{CLOSE_PREFIX}{time.time()!r} {session or ''}".rstrip())
+        except Exception as e:
+            self.publish_errors += 1
+            print(f"Error closing live update streams: {e}")
+
+    async def publish_counter(self, user_id: int, data_type: str, delta: int, total_today: int,
+                              day: Optional[str] = None):
+        await self.publish(user_id, "counter", {
+            "date": day or date.today().isoformat(),
+            "data_type": data_type,
+            "delta": delta,
+            "total_today": total_today
+        })
+
+    async def publish_reset(self, user_id: int, data_types: List[str]):
+        await self.publish(user_id, "reset", {"date": date.today().isoformat(), "data_types": data_types})
+
+    async def stream(self, user_id: int, expires_at: Optional[datetime] = None,
+                     session: Optional[str] = None) -> AsyncIterator[str]:
+        """SSE frames for a user until the client disconnects, the session
+        expires or is closed, or the server stops; queued frames are sent in
+        one write"""
+        # Subscribed here so the finally below always unsubscribes
+        subscriber = self.subscribe(user_id, expires_at, session)
+        try:
+            yield f"retry: {RECONNECT_MS}\n\n"
+            loop = asyncio.get_running_loop()
+            while not self._stopping and not subscriber.closed:
+                if not subscriber.frames:
+                    # A timer rather than wait_for: no extra task per idle stream
+                    subscriber.ready.clear()
+                    keepalive = loop.call_later(self.keepalive_seconds, subscriber.ready.set)
+                    try:
+                        await subscriber.ready.wait()
+                    finally:
+                        keepalive.cancel()
+                    if self._stopping or subscriber.closed:
+                        return
+                    if not subscriber.frames:
+                        if subscriber.expires_at is not None and datetime.utcnow() >= subscriber.expires_at:
+                            return
+                        yield KEEPALIVE_FRAME
+                        continue
+                frames = "".join(subscriber.frames)
+                subscriber.frames.clear()
+                yield frames
+        finally:
+            self.unsubscribe(subscriber)
+
+    def close_streams(self):
+        self._stopping = True
+        for subscribers in self._subscribers.values():
+            for subscriber in subscribers:
+                subscriber.ready.set()
+
+    def close_streams_on_exit_signal(self):
+        """uvicorn waits for open requests before running the shutdown hooks and
+        a stream never finishes by itself, so end the streams as soon as
+        SIGINT/SIGTERM arrives, then let the server's own handler run"""
+        if threading.current_thread() is not threading.main_thread():
+            return
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            previous = signal.getsignal(signum)
+            if not callable(previous):
+                continue
+
+            def handler(received, frame, previous=previous):
+                loop.call_soon_threadsafe(self.close_streams)
+                previous(received, frame)
+
+            signal.signal(signum, handler)
+
+    async def start(self):
+        if not self.enabled or self.broker is not None:
+            return
+        self._stopping = False
+        broker = create_broker(self.broker_name)
+        await broker.start(self.deliver)
+        self.broker = broker
+        self.close_streams_on_exit_signal()
+
+    async def stop(self):
+        """End every open stream and disconnect from the broker"""
+        self.close_streams()
+        if self.broker is not None:
+            await self.broker.stop()
+            self.broker = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "broker": self.broker_name,
+            "streams": self.streams,
+            "users": len(self._subscribers),
+            "max_streams": self.max_streams,
+            "published": self.published,
+            "delivered": self.delivered,
+            "resyncs": self.resyncs,
+            "rejected_streams": self.rejected_streams,
+            "publish_errors": self.publish_errors,
+            "closed_streams": self.closed_streams,
+        }
+
+
+# Shared live update hub used by the API
+live_updates = LiveUpdates()
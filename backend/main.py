@@ -1,19 +1,35 @@
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
-from typing import List, Optional
-import uvicorn
-from datetime import datetime, date
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, Field
+from typing import Annotated, List, Literal, Optional, Tuple, Union
+from contextlib import aclosing
+from datetime import datetime, date, timedelta
 import json
 import os
-from sqlalchemy.orm import Session
-from ai_call import generate_ai_affirmation
+from sqlalchemy import select, insert, delete, update, case, or_, bindparam, func, Integer
+from sqlalchemy.ext.asyncio import AsyncSession
+from ai_call import generate_ai_affirmation, stream_ai_affirmation, close_http_client, get_ai_stats
+from ai_call import affirmation_cache, circuit_breaker, upstream_stats
+from affirmation_pool import affirmation_pool
 
 # Import our database and auth utilities
-from database import get_db, init_database, User, UserSession, DailyWellnessData
-from auth_utils import hash_password, verify_password, generate_session_token, get_token_expiry, is_token_expired
+from database import get_async_db, open_async_session, upsert_insert, dispose_engines, init_database, User, UserSession, DailyWellnessData, WellnessEvent
+from database import engine, async_engine
+from database import WellnessStreak, STREAK_ALL, compute_streaks
+from auth_utils import hash_password_async, verify_password_async, generate_session_token, get_token_expiry, is_token_expired, password_pool
+from auth_utils import AUTH_MODE, create_access_token, decode_access_token
+from session_cache import session_cache, CachedSession
+from session_sweeper import session_sweeper
+from token_revocation import token_revocations
+from static_assets import static_assets
+from write_buffer import write_buffer
+from live_updates import live_updates, session_key
+from data_export import data_exporter, EXPORT_MEDIA_TYPES
+from puzzle_engine import puzzle_bank, summarize_results, apply_results
+from metrics import METRICS_ENABLED, PROMETHEUS_CONTENT_TYPE, MetricsMiddleware, instrument_engine, render_metrics
 
 app = FastAPI(title="Wellness Arcade API", version="1.0.0")
 
@@ -28,7 +44,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files for frontend
+# Compress larger API responses. Starlette 0.46+ leaves responses that already carry
+# Content-Encoding (precompressed static assets) and text/event-stream (SSE) alone
+GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", "1000"))
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE)
+
+# Per-route latency and database metrics, exposed on /metrics
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    instrument_engine(engine)
+    if async_engine is not None:
+        instrument_engine(async_engine.sync_engine)
+
+# Serve static files for frontend
 # Handle both localhost (from root) and Railway (from backend) scenarios
 if os.path.exists("frontend"):
     # Running from root directory (localhost with root main.py)
@@ -39,44 +67,85 @@ elif os.path.exists(os.path.join(os.path.dirname(__file__), "..", "frontend")):
 else:
     frontend_path = None
 
-if frontend_path and os.path.exists(frontend_path):
-    app.mount("/static", StaticFiles(directory=frontend_path), name="static")
+async def static_response(path: str, request: Request):
+    """Serve a preloaded asset with ETag revalidation and a precompressed variant"""
+    await static_assets.wait_until_loaded()
+    asset = static_assets.get(path)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    status_code, headers, body = static_assets.select(
+        asset, request.headers.get("accept-encoding"), request.headers.get("if-none-match")
+    )
+    return Response(content=body, status_code=status_code, headers=headers)
+
+@app.api_route("/static/{asset_path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_static(asset_path: str, request: Request):
+    """Serve frontend assets from memory (loaded at startup)"""
+    return await static_response(asset_path, request)
 
 # Serve frontend files
 @app.get("/")
-async def serve_frontend():
+async def serve_frontend(request: Request):
     """Serve the main frontend page"""
-    if frontend_path:
-        frontend_file = os.path.join(frontend_path, "index.html")
-        if os.path.exists(frontend_file):
-            return FileResponse(frontend_file)
+    await static_assets.wait_until_loaded()
+    if static_assets.get("index.html"):
+        return await static_response("index.html", request)
     return {"message": "Frontend files not found"}
 
+# Schema creation and migrations run here unless a launcher already ran them
+# once for all workers (see the root main.py)
+DB_INIT_ON_STARTUP = os.getenv("DB_INIT_ON_STARTUP", "true").lower() == "true"
+
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
-    init_database()
-    # Clean up any expired sessions on startup
-    cleanup_expired_sessions()
-
-def cleanup_expired_sessions():
-    """Clean up expired sessions from the database"""
-    db = next(get_db())
+    if DB_INIT_ON_STARTUP:
+        init_database()
+    if frontend_path:
+        # Hash and precompress the frontend once, off the startup path; edits need a restart
+        static_assets.start_loading(frontend_path)
+    # Sweep expired sessions in the background (first sweep runs shortly after boot)
+    session_sweeper.start()
+    if AUTH_MODE == "jwt":
+        # Load and periodically refresh per-user token revocations
+        token_revocations.start()
+    # Keep popular affirmations pregenerated in the background
+    affirmation_pool.start()
+    # Group-commit queued log events when write-behind is enabled
+    write_buffer.start(store_event_groups, publish_committed_counters)
+    # Counter changes are pushed to open /api/live/ streams; the API keeps
+    # working (clients fall back to polling) if the broker is unreachable
     try:
-        expired_sessions = db.query(UserSession).filter(
-            UserSession.expires_at < datetime.utcnow()
-        ).all()
-        
-        for session in expired_sessions:
-            db.delete(session)
-        
-        db.commit()
-        print(f"Cleaned up {len(expired_sessions)} expired sessions")
+        await live_updates.start()
     except Exception as e:
-        print(f"Error cleaning up expired sessions: {e}")
-        db.rollback()
-    finally:
-        db.close()
+        print(f"Live updates unavailable: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Runs after uvicorn has drained in-flight requests; queued log events are
+    # committed (and their counters published, so the broker stops after the
+    # buffer) and background tasks stop before the HTTP client and the pools close
+    steps = [
+        ("write-behind buffer", write_buffer.stop),
+        ("live updates", live_updates.stop),
+        ("session sweeper", session_sweeper.stop),
+        ("token revocations", token_revocations.stop),
+        ("affirmation pool", affirmation_pool.stop),
+        ("AIML HTTP client", close_http_client),
+        ("database engines", dispose_engines),
+    ]
+    for name, step in steps:
+        try:
+            await step()
+        except Exception as e:
+            print(f"Error stopping {name}: {e}")
+    password_pool.shutdown()
+
+# Game data types tracked per day
+WELLNESS_TYPES = ["hydration", "brushing", "breathing", "puzzles", "emotions", "affirmations"]
+
+# Longest range served by /api/stats/history/
+MAX_HISTORY_DAYS = 366
 
 # Pydantic models
 class UserCreate(BaseModel):
@@ -99,8 +168,8 @@ class BreathingLog(BaseModel):
 
 class PuzzleResponse(BaseModel):
     puzzle_id: str
-    user_sequence: List[int]
-    correct: bool
+    user_sequence: List[int] = Field(max_length=64)
+    correct: Optional[bool] = None  # Ignored: answers are checked against the puzzle bank
 
 class EmotionLog(BaseModel):
     scenario_id: str
@@ -113,8 +182,35 @@ class AffirmationSubmit(BaseModel):
 class LogoutRequest(BaseModel):
     session_token: str
 
+# Batched events reuse the per-game models, tagged with their data type
+class HydrationEvent(HydrationLog):
+    type: Literal["hydration"]
+
+class BrushingEvent(BrushingLog):
+    type: Literal["brushing"]
+
+class BreathingEvent(BreathingLog):
+    type: Literal["breathing"]
+
+class PuzzleEvent(PuzzleResponse):
+    type: Literal["puzzles"]
+
+class EmotionEvent(EmotionLog):
+    type: Literal["emotions"]
+
+class AffirmationEvent(AffirmationSubmit):
+    type: Literal["affirmations"]
+
+WellnessEventIn = Annotated[
+    Union[HydrationEvent, BrushingEvent, BreathingEvent, PuzzleEvent, EmotionEvent, AffirmationEvent],
+    Field(discriminator="type")
+]
+
+class EventBatch(BaseModel):
+    events: List[WellnessEventIn] = Field(min_length=1, max_length=500)
+
 # Helper functions
-def get_current_user(authorization: str = Header(None), db: Session = Depends(get_db)):
+async def get_current_user(authorization: str = Header(None), db: AsyncSession = Depends(get_async_db)) -> CachedSession:
     if not authorization:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
@@ -124,91 +220,330 @@ def get_current_user(authorization: str = Header(None), db: Session = Depends(ge
     except IndexError:
         raise HTTPException(status_code=401, detail="Invalid authorization header")
     
+    return await authenticate_token(token, db)
+
+async def authenticate_token(token: str, db: AsyncSession) -> CachedSession:
+    """Resolve a session token or signed access token to its user"""
+    # Signed tokens are verified without touching the database
+    if AUTH_MODE == "jwt":
+        claims = decode_access_token(token)
+        if not claims:
+            raise HTTPException(status_code=401, detail="Not authenticated")
+        user_id = int(claims["sub"])
+        if token_revocations.is_revoked(user_id, claims["iat"]):
+            raise HTTPException(status_code=401, detail="Session expired")
+        return CachedSession(
+            user_id=user_id,
+            username=claims["username"],
+            expires_at=datetime.utcfromtimestamp(claims["exp"])
+        )
+    
+    # Serve recently validated sessions without touching the database
+    cached = session_cache.get(token)
+    if cached:
+        return cached
+    
     # Check if session exists in database
-    session = db.query(UserSession).filter(UserSession.session_token == token).first()
+    session = await db.scalar(select(UserSession).where(UserSession.session_token == token))
     if not session:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
     # Check if session is expired
     if is_token_expired(session.expires_at):
         # Remove expired session
-        db.delete(session)
-        db.commit()
+        await db.delete(session)
+        await db.commit()
         raise HTTPException(status_code=401, detail="Session expired")
     
     # Get user from database
-    user = db.query(User).filter(User.id == session.user_id).first()
+    user = await db.get(User, session.user_id)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     
-    return user.username
+    current_user = CachedSession(user_id=user.id, username=user.username, expires_at=session.expires_at)
+    session_cache.put(token, current_user)
+    return current_user
 
-def get_user_daily_data(username: str, data_type: str, db: Session):
+async def get_user_daily_data(user_id: int, data_type: str, db: AsyncSession):
+    """Read today's record without writing; missing rows come back as an unsaved zero view.
+    Rows are only created when an event is logged (see add_wellness_events).
+    Events still queued in the write-behind buffer are included in the count."""
     today = date.today().isoformat()
     
-    # Get user ID
-    user = db.query(User).filter(User.username == username).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    async def read():
+        record = await db.scalar(select(DailyWellnessData).where(
+            DailyWellnessData.user_id == user_id,
+            DailyWellnessData.date == today,
+            DailyWellnessData.data_type == data_type
+        ).execution_options(populate_existing=True))
+        return record, write_buffer.pending_count(user_id, today, data_type)
     
-    # Get or create daily data record
-    daily_record = db.query(DailyWellnessData).filter(
-        DailyWellnessData.user_id == user.id,
-        DailyWellnessData.date == today,
-        DailyWellnessData.data_type == data_type
-    ).first()
+    daily_record, pending = await write_buffer.consistent_read(read)
     
-    if not daily_record:
+    if not daily_record or pending:
         daily_record = DailyWellnessData(
-            user_id=user.id,
+            user_id=user_id,
             date=today,
             data_type=data_type,
-            count=0,
-            data_json="[]"
+            count=(daily_record.count if daily_record else 0) + pending
         )
-        db.add(daily_record)
-        db.commit()
-        db.refresh(daily_record)
     
     return daily_record
 
+async def add_wellness_events(user_id: int, data_type: str, payloads: List[dict], increment: int, db: AsyncSession) -> int:
+    """Append events and atomically bump the daily count without committing; returns the new count"""
+    key = (user_id, date.today().isoformat(), data_type)
+    return (await store_event_groups({key: (increment, payloads)}, db))[key]
+
+async def store_event_groups(groups: dict, db: AsyncSession) -> dict:
+    """Append events and bump daily counts for many (user_id, date, data_type) keys without committing.
+    groups maps each key to (increment, payloads); returns the new count per key. The statement count
+    does not grow with the number of keys, which keeps write-behind group commits short."""
+    now = datetime.utcnow()
+    # Sorted so concurrent writers lock rows in the same order
+    groups = sorted(groups.items())
+    
+    await db.execute(insert(WellnessEvent), [
+        {"user_id": user_id, "date": day, "data_type": data_type, "payload": json.dumps(payload), "created_at": now}
+        for (user_id, day, data_type), (_, payloads) in groups
+        for payload in payloads
+    ])
+    
+    # INSERT ... ON CONFLICT DO UPDATE SET count = count + :n so concurrent
+    # logs never lose updates and the daily row is created on first use
+    statement = upsert_insert(DailyWellnessData).values([
+        {
+            "user_id": user_id,
+            "date": day,
+            "data_type": data_type,
+            "count": increment,
+            "created_at": now,
+            "updated_at": now
+        }
+        for (user_id, day, data_type), (increment, _) in groups
+    ])
+    statement = statement.on_conflict_do_update(
+        index_elements=["user_id", "date", "data_type"],
+        set_={
+            "count": DailyWellnessData.count + statement.excluded.count,
+            "updated_at": statement.excluded.updated_at
+        }
+    ).returning(DailyWellnessData.user_id, DailyWellnessData.date, DailyWellnessData.data_type, DailyWellnessData.count)
+    new_counts = {(user_id, day, data_type): count for user_id, day, data_type, count in await db.execute(statement)}
+    
+    # Puzzle rows keep the current and best run of correct answers, advanced
+    # by each group's results in one step (an UPDATE sees the old values)
+    run_updates = []
+    for (user_id, day, data_type), (_, payloads) in groups:
+        if data_type == "puzzles":
+            runs = summarize_results(payload.get("correct", False) for payload in payloads)
+            run_updates.append({
+                "run_user_id": user_id,
+                "run_date": day,
+                "keep": 0 if runs.reset else 1,
+                "add": runs.trail if runs.reset else runs.lead,
+                "lead": runs.lead,
+                "inner": runs.inner
+            })
+    if run_updates:
+        daily = DailyWellnessData.__table__
+        current = func.coalesce(daily.c.current_run, 0)
+        best = func.coalesce(daily.c.best_run, 0)
+        extended = current + bindparam("lead", type_=Integer)
+        inner = bindparam("inner", type_=Integer)
+        best_so_far = case((extended > best, extended), else_=best)
+        await db.execute(update(daily).where(
+            daily.c.user_id == bindparam("run_user_id", type_=Integer),
+            daily.c.date == bindparam("run_date"),
+            daily.c.data_type == "puzzles"
+        ).values(
+            current_run=current * bindparam("keep", type_=Integer) + bindparam("add", type_=Integer),
+            best_run=case((best_so_far > inner, best_so_far), else_=inner)
+        ), run_updates)
+    
+    activity_by_day = {}
+    for user_id, day, data_type in new_counts:
+        activity_by_day.setdefault(day, set()).update({(user_id, data_type), (user_id, STREAK_ALL)})
+    for day, activity in activity_by_day.items():
+        await record_streak_activity(sorted(activity), db, day)
+    return new_counts
+
+async def record_streak_activity(activity: List[Tuple[int, str]], db: AsyncSession, day: Optional[str] = None):
+    """Extend streaks for (user_id, data_type) pairs active on day (default today) without committing;
+    a no-op after the first log of the day"""
+    active_day = date.fromisoformat(day) if day else date.today()
+    today = active_day.isoformat()
+    yesterday = (active_day - timedelta(days=1)).isoformat()
+    now = datetime.utcnow()
+    
+    continued = case((WellnessStreak.last_active_date == yesterday, WellnessStreak.current_streak + 1), else_=1)
+    statement = upsert_insert(WellnessStreak).values([
+        {
+            "user_id": user_id,
+            "data_type": data_type,
+            "current_streak": 1,
+            "longest_streak": 1,
+            "last_active_date": today,
+            "updated_at": now
+        }
+        for user_id, data_type in activity
+    ])
+    statement = statement.on_conflict_do_update(
+        index_elements=["user_id", "data_type"],
+        set_={
+            "current_streak": continued,
+            "longest_streak": case((continued > WellnessStreak.longest_streak, continued), else_=WellnessStreak.longest_streak),
+            "last_active_date": today,
+            "updated_at": now
+        },
+        where=or_(WellnessStreak.last_active_date.is_(None), WellnessStreak.last_active_date < today)
+    )
+    await db.execute(statement)
+
+async def rebuild_user_streaks(user_id: int, data_types: List[str], db: AsyncSession):
+    """Recompute a user's streaks from the daily rollups without committing (used after resets)"""
+    rows = await db.execute(select(DailyWellnessData.data_type, DailyWellnessData.date).where(
+        DailyWellnessData.user_id == user_id,
+        DailyWellnessData.count > 0
+    ).order_by(DailyWellnessData.date))
+    
+    dates_by_type = {STREAK_ALL: []}
+    for data_type, day in rows:
+        dates_by_type.setdefault(data_type, []).append(day)
+        dates_by_type[STREAK_ALL].append(day)
+    
+    data_types = data_types + [STREAK_ALL]
+    await db.execute(delete(WellnessStreak).where(
+        WellnessStreak.user_id == user_id,
+        WellnessStreak.data_type.in_(data_types)
+    ))
+    for data_type in data_types:
+        current, longest, last_active_date = compute_streaks(dates_by_type.get(data_type, []))
+        if last_active_date:
+            db.add(WellnessStreak(
+                user_id=user_id,
+                data_type=data_type,
+                current_streak=current,
+                longest_streak=longest,
+                last_active_date=last_active_date
+            ))
+
+async def publish_committed_counters(groups: dict, new_counts: dict):
+    """Push committed event groups (batch logs and write-behind flushes) to live streams"""
+    for (user_id, day, data_type), (increment, _) in groups.items():
+        await live_updates.publish_counter(user_id, data_type, increment, new_counts[(user_id, day, data_type)], day)
+
+async def log_wellness_event(user_id: int, data_type: str, payload: dict, db: AsyncSession, increment: int = 1) -> int:
+    """Append one event and atomically bump the daily count; returns the new count"""
+    if write_buffer.enabled:
+        # Acknowledge from the buffer; the flusher commits the event shortly
+        # and publishes it to live streams then
+        new_count = await write_buffer.append(user_id, date.today().isoformat(), data_type, [payload], increment, db)
+        if new_count is None:
+            new_count = (await get_user_daily_data(user_id, data_type, db)).count
+    else:
+        new_count = await add_wellness_events(user_id, data_type, [payload], increment, db)
+        await db.commit()
+        await live_updates.publish_counter(user_id, data_type, increment, new_count)
+    return new_count
+
+async def get_daily_events(user_id: int, data_type: str, db: AsyncSession) -> List[dict]:
+    """Return today's event payloads for a data type in logging order, including queued write-behind events"""
+    today = date.today().isoformat()
+    async def read():
+        payloads = await db.scalars(select(WellnessEvent.payload).where(
+            WellnessEvent.user_id == user_id,
+            WellnessEvent.date == today,
+            WellnessEvent.data_type == data_type
+        ).order_by(WellnessEvent.id))
+        return [json.loads(payload) for payload in payloads] + write_buffer.pending_events(user_id, today, data_type)
+    
+    return await write_buffer.consistent_read(read)
+
+async def get_puzzle_runs(user_id: int, db: AsyncSession) -> Tuple[int, int]:
+    """Today's current and best run of consecutive correct puzzle answers, read from the daily row"""
+    today = date.today().isoformat()
+    
+    async def read():
+        row = (await db.execute(select(DailyWellnessData.current_run, DailyWellnessData.best_run).where(
+            DailyWellnessData.user_id == user_id,
+            DailyWellnessData.date == today,
+            DailyWellnessData.data_type == "puzzles"
+        ))).first()
+        return row, write_buffer.pending_events(user_id, today, "puzzles")
+    
+    row, pending = await write_buffer.consistent_read(read)
+    current, best = ((row.current_run or 0), (row.best_run or 0)) if row else (0, 0)
+    return apply_results(current, best, [payload.get("correct", False) for payload in pending])
+
+async def reset_daily_data(user_id: int, data_types: List[str], db: AsyncSession):
+    """Zero today's counts and drop today's events for the given data types"""
+    today = date.today().isoformat()
+    # Queued write-behind events were logged before the reset; store them first
+    await write_buffer.flush(db)
+    await db.execute(
+        update(DailyWellnessData)
+        .where(
+            DailyWellnessData.user_id == user_id,
+            DailyWellnessData.date == today,
+            DailyWellnessData.data_type.in_(data_types)
+        )
+        .values(count=0, current_run=0, best_run=0, data_json=None, updated_at=datetime.utcnow())
+    )
+    await db.execute(delete(WellnessEvent).where(
+        WellnessEvent.user_id == user_id,
+        WellnessEvent.date == today,
+        WellnessEvent.data_type.in_(data_types)
+    ))
+    await rebuild_user_streaks(user_id, data_types, db)
+    await db.commit()
+    write_buffer.forget_stored(user_id, today, data_types)
+    await live_updates.publish_reset(user_id, data_types)
+
 # General endpoints
 @app.get("/api/ping/")
 async def ping():
     return {"message": "API is working", "timestamp": datetime.now().isoformat()}
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics: request latency and database work per route, AIML latency and component gauges"""
+    return PlainTextResponse(render_metrics({
+        "password_pool": password_pool.stats(),
+        "session_cache": session_cache.stats(),
+        "session_sweeper": session_sweeper.stats(),
+        "affirmation_cache": affirmation_cache.stats(),
+        "circuit_breaker": circuit_breaker.stats(),
+        "aiml_upstream": upstream_stats,
+        "affirmation_pool": affirmation_pool.stats(),
+        "write_behind": write_buffer.stats(),
+        "live_updates": live_updates.stats(),
+        "exports": data_exporter.stats()
+    }), media_type=PROMETHEUS_CONTENT_TYPE)
+
 @app.post("/api/cleanup-sessions/")
-async def cleanup_sessions_endpoint(db: Session = Depends(get_db)):
+async def cleanup_sessions_endpoint():
     """Endpoint to manually clean up expired sessions"""
     try:
-        expired_sessions = db.query(UserSession).filter(
-            UserSession.expires_at < datetime.utcnow()
-        ).all()
-        
-        count = len(expired_sessions)
-        for session in expired_sessions:
-            db.delete(session)
-        
-        db.commit()
-        return {"message": f"Cleaned up {count} expired sessions"}
+        result = await session_sweeper.sweep()
+        return {"message": f"Cleaned up {result['deleted']} expired sessions", "duration_ms": result["duration_ms"]}
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail=f"Error cleaning up sessions: {str(e)}")
 
 @app.post("/api/register/")
-async def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Check if username already exists
-    existing_user = db.query(User).filter(User.username == user.username).first()
+    existing_user = await db.scalar(select(User).where(User.username == user.username))
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already exists")
     
     # Check if email already exists
-    existing_email = db.query(User).filter(User.email == user.email).first()
+    existing_email = await db.scalar(select(User).where(User.email == user.email))
     if existing_email:
         raise HTTPException(status_code=400, detail="Email already exists")
     
     # Hash the password
-    hashed_password = hash_password(user.password)
+    hashed_password = await hash_password_async(user.password)
     
     # Create new user
     db_user = User(
@@ -218,26 +553,35 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return {"message": "User registered successfully", "username": user.username}
 
 @app.post("/api/login/")
-async def login(user: UserLogin, db: Session = Depends(get_db)):
+async def login(user: UserLogin, db: AsyncSession = Depends(get_async_db)):
     # Find user in database
-    db_user = db.query(User).filter(User.username == user.username).first()
+    db_user = await db.scalar(select(User).where(User.username == user.username))
     if not db_user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     # Verify password
-    if not verify_password(user.password, db_user.hashed_password):
+    if not await verify_password_async(user.password, db_user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
+    if AUTH_MODE == "jwt":
+        # Logging in replaces any earlier tokens, as it does for sessions
+        await token_revocations.revoke_user(db_user.id, db)
+        await live_updates.revoke_tickets(db_user.id, db)
+        await db.commit()
+        await live_updates.close_user(db_user.id)
+        session_token = create_access_token(db_user.id, db_user.username, get_token_expiry())
+        return {"message": "Login successful", "session_token": session_token}
+    
     # Clean up any existing sessions for this user (both expired and valid)
-    existing_sessions = db.query(UserSession).filter(UserSession.user_id == db_user.id).all()
-    for session in existing_sessions:
-        db.delete(session)
+    await db.execute(delete(UserSession).where(UserSession.user_id == db_user.id))
+    await live_updates.revoke_tickets(db_user.id, db)
+    session_cache.invalidate_user(db_user.id)
     
     # Generate new session token
     session_token = generate_session_token()
@@ -251,22 +595,38 @@ async def login(user: UserLogin, db: Session = Depends(get_db)):
     )
     
     db.add(db_session)
-    db.commit()
+    await db.commit()
+    # Streams opened with the replaced sessions end too
+    await live_updates.close_user(db_user.id)
     
     return {"message": "Login successful", "session_token": session_token}
 
 @app.post("/api/logout/")
-async def logout(logout_request: LogoutRequest, db: Session = Depends(get_db)):
+async def logout(logout_request: LogoutRequest, db: AsyncSession = Depends(get_async_db)):
+    if AUTH_MODE == "jwt":
+        claims = decode_access_token(logout_request.session_token, verify_exp=False)
+        if claims:
+            await token_revocations.revoke_user(int(claims["sub"]), db)
+            await live_updates.revoke_tickets(int(claims["sub"]), db)
+            await db.commit()
+            await live_updates.close_user(int(claims["sub"]))
+        return {"message": "Logout successful"}
+    
+    session_cache.invalidate(logout_request.session_token)
+    
     # Find and delete session from database
-    session = db.query(UserSession).filter(UserSession.session_token == logout_request.session_token).first()
+    session = await db.scalar(select(UserSession).where(UserSession.session_token == logout_request.session_token))
     if session:
-        db.delete(session)
-        db.commit()
+        user_id = session.user_id
+        await db.delete(session)
+        await live_updates.revoke_tickets(user_id, db, session_key(logout_request.session_token))
+        await db.commit()
+        await live_updates.close_user(user_id, session_key(logout_request.session_token))
     return {"message": "Logout successful"}
 
 @app.get("/api/user/")
-async def get_user_profile(username: str = Depends(get_current_user), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == username).first()
+async def get_user_profile(current_user: CachedSession = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    user = await db.get(User, current_user.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -292,84 +652,44 @@ async def get_daily_tip():
 
 # Hydration game endpoints
 @app.post("/api/hydration/log/")
-async def log_hydration(log: HydrationLog, username: str = Depends(get_current_user), db: Session = Depends(get_db)):
-    daily_record = get_user_daily_data(username, "hydration", db)
-    
-    # Update count
-    daily_record.count += log.glasses
-    
-    # Update data JSON
-    if daily_record.data_json is None:
-        data_list = []
-    else:
-        data_list = json.loads(daily_record.data_json)
-    data_list.append({
+async def log_hydration(log: HydrationLog, current_user: CachedSession = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    total_today = await log_wellness_event(current_user.user_id, "hydration", {
         "glasses": log.glasses,
         "timestamp": datetime.now().isoformat()
-    })
-    daily_record.data_json = json.dumps(data_list)
-    daily_record.updated_at = datetime.utcnow()
-    
-    db.commit()
+    }, db, increment=log.glasses)
     
-    return {"message": f"Logged {log.glasses} glass(es)", "total_today": daily_record.count}
+    return {"message": f"Logged {log.glasses} glass(es)", "total_today": total_today}
 
 @app.get("/api/hydration/status/")
-async def get_hydration_status(username: str = Depends(get_current_user), db: Session = Depends(get_db)):
-    daily_record = get_user_daily_data(username, "hydration", db)
+async def get_hydration_status(current_user: CachedSession = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    daily_record = await get_user_daily_data(current_user.user_id, "hydration", db)
     return {"glasses_today": daily_record.count, "goal": 8}
 
 @app.post("/api/hydration/reset/")
-async def reset_hydration(username: str = Depends(get_current_user), db: Session = Depends(get_db)):
-    daily_record = get_user_daily_data(username, "hydration", db)
-    
-    # Reset count and data
-    daily_record.count = 0
-    daily_record.data_json = "[]"
-    daily_record.updated_at = datetime.utcnow()
-    
-    db.commit()
+async def reset_hydration(current_user: CachedSession = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    await reset_daily_data(current_user.user_id, ["hydration"], db)
     
     return {"message": "Hydration data reset for today"}
 
 # Brushing teeth endpoints
 @app.post("/api/brushing/log/")
-async def log_brushing(log: BrushingLog, username: str = Depends(get_current_user), db: Session = Depends(get_db)):
-    daily_record = get_user_daily_data(username, "brushing", db)
-    
-    # Update count
-    daily_record.count += 1
-    
-    # Update data JSON
-    if daily_record.data_json is None:
-        data_list = []
-    else:
-        data_list = json.loads(daily_record.data_json)
-    data_list.append({
+async def log_brushing(log: BrushingLog, current_user: CachedSession = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    total_today = await log_wellness_event(current_user.user_id, "brushing", {
         "session_type": log.session_type,
         "timestamp": datetime.now().isoformat()
-    })
-    daily_record.data_json = json.dumps(data_list)
-    daily_record.updated_at = datetime.utcnow()
+    }, db)
     
-    db.commit()
-    
-    return {"message": f"Logged {log.session_type} brushing", "total_today": daily_record.count}
+    return {"message": f"Logged {log.session_type} brushing", "total_today": total_today}
 
 @app.get("/api/brushing/status/")
-async def get_brushing_status(username: str = Depends(get_current_user), db: Session = Depends(get_db)):
-    daily_record = get_user_daily_data(username, "brushing", db)
+async def get_brushing_status(current_user: CachedSession = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    daily_record = await get_user_daily_data(current_user.user_id, "brushing", db)
     return {"brushing_today": daily_record.count, "goal": 2}
 
 @app.get("/api/brushing/detailed/")
-async def get_brushing_detailed(username: str = Depends(get_current_user), db: Session = Depends(get_db)):
-    daily_record = get_user_daily_data(username, "brushing", db)
-    
-    # Parse the detailed data from JSON
-    if daily_record.data_json is None:
-        brushing_sessions = []
-    else:
-        brushing_sessions = json.loads(daily_record.data_json)
+async def get_brushing_detailed(current_user: CachedSession = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    daily_record = await get_user_daily_data(current_user.user_id, "brushing", db)
+    brushing_sessions = await get_daily_events(current_user.user_id, "brushing", db)
     
     # Determine which sessions were completed
     morning_completed = any(session["session_type"] == "morning" for session in brushing_sessions)
@@ -384,103 +704,66 @@ async def get_brushing_detailed(username: str = Depends(get_current_user), db: S
     }
 
 @app.post("/api/brushing/reset/")
-async def reset_brushing(username: str = Depends(get_current_user), db: Session = Depends(get_db)):
-    daily_record = get_user_daily_data(username, "brushing", db)
-    
-    # Reset count and data
-    daily_record.count = 0
-    daily_record.data_json = "[]"
-    daily_record.updated_at = datetime.utcnow()
-    
-    db.commit()
+async def reset_brushing(current_user: CachedSession = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    await reset_daily_data(current_user.user_id, ["brushing"], db)
     
     return {"message": "Brushing data reset for today"}
 
 # Breathing exercise endpoints
 @app.post("/api/breathing/log/")
-async def log_breathing(log: BreathingLog, username: str = Depends(get_current_user), db: Session = Depends(get_db)):
-    daily_record = get_user_daily_data(username, "breathing", db)
-    
-    # Update count
-    daily_record.count += 1
-    
-    # Update data JSON
-    if daily_record.data_json is None:
-        data_list = []
-    else:
-        data_list = json.loads(daily_record.data_json)
-    data_list.append({
+async def log_breathing(log: BreathingLog, current_user: CachedSession = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    total_today = await log_wellness_event(current_user.user_id, "breathing", {
         "duration_seconds": log.duration_seconds,
         "timestamp": datetime.now().isoformat()
-    })
-    daily_record.data_json = json.dumps(data_list)
-    daily_record.updated_at = datetime.utcnow()
+    }, db)
     
-    db.commit()
-    
-    return {"message": f"Logged breathing session", "total_today": daily_record.count}
+    return {"message": f"Logged breathing session", "total_today": total_today}
 
 @app.get("/api/breathing/status/")
-async def get_breathing_status(username: str = Depends(get_current_user), db: Session = Depends(get_db)):
-    daily_record = get_user_daily_data(username, "breathing", db)
+async def get_breathing_status(current_user: CachedSession = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    daily_record = await get_user_daily_data(current_user.user_id, "breathing", db)
     return {"sessions_today": daily_record.count}
 
 # Brain puzzle endpoints
+def check_puzzle_answer(puzzle_id: str, user_sequence: List[int]) -> bool:
+    """Validate an answer against the puzzle bank; unknown puzzle ids are a 400"""
+    try:
+        return puzzle_bank.check(puzzle_id, user_sequence)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Unknown puzzle: {puzzle_id}")
+
 @app.get("/api/puzzles/")
-async def get_puzzles():
-    puzzles = [
-        {"id": "sequence_1", "type": "sequence", "difficulty": 1},
-        {"id": "sequence_2", "type": "sequence", "difficulty": 2},
-        {"id": "sequence_3", "type": "sequence", "difficulty": 3},
-    ]
+async def get_puzzles(difficulty: Optional[int] = Query(None, ge=1, le=puzzle_bank.max_length), count: int = Query(1, ge=1, le=20)):
+    """Sequence puzzles from the bank: count puzzles of a difficulty (tiles to repeat), or one each of 1-3"""
+    if difficulty is None:
+        puzzles = [puzzle_bank.random_puzzle(level) for level in (1, 2, 3)]
+    else:
+        puzzles = [puzzle_bank.random_puzzle(difficulty) for _ in range(count)]
     return {"puzzles": puzzles}
 
 @app.post("/api/puzzles/submit/")
-async def submit_puzzle_response(response: PuzzleResponse, username: str = Depends(get_current_user), db: Session = Depends(get_db)):
-    daily_record = get_user_daily_data(username, "puzzles", db)
-    
-    # Update count
-    daily_record.count += 1
-    
-    # Update data JSON
-    if daily_record.data_json is None:
-        data_list = []
-    else:
-        data_list = json.loads(daily_record.data_json)
-    data_list.append({
+async def submit_puzzle_response(response: PuzzleResponse, current_user: CachedSession = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    """Check an answer on the server and log it; a correct answer comes with the next, one tile longer round"""
+    correct = check_puzzle_answer(response.puzzle_id, response.user_sequence)
+    total_today = await log_wellness_event(current_user.user_id, "puzzles", {
         "puzzle_id": response.puzzle_id,
         "user_sequence": response.user_sequence,
-        "correct": response.correct,
+        "correct": correct,
         "timestamp": datetime.now().isoformat()
-    })
-    daily_record.data_json = json.dumps(data_list)
-    daily_record.updated_at = datetime.utcnow()
-    
-    db.commit()
+    }, db)
     
-    return {"message": "Puzzle response logged", "correct": response.correct}
+    return {
+        "message": "Puzzle response logged",
+        "correct": correct,
+        "total_today": total_today,
+        "next_puzzle": puzzle_bank.next_puzzle(response.puzzle_id) if correct else None
+    }
 
 @app.get("/api/puzzles/status/")
-async def get_puzzle_status(username: str = Depends(get_current_user), db: Session = Depends(get_db)):
-    daily_record = get_user_daily_data(username, "puzzles", db)
-    
-    # Calculate high score from today's data
-    high_score = 0
-    if daily_record.data_json:
-        try:
-            data_list = json.loads(daily_record.data_json)
-            # Count consecutive correct answers to find high score
-            current_score = 0
-            for entry in data_list:
-                if entry.get("correct", False):
-                    current_score += 1
-                    high_score = max(high_score, current_score)
-                else:
-                    current_score = 0
-        except:
-            pass
-    
-    return {"high_score_today": high_score}
+async def get_puzzle_status(current_user: CachedSession = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    """Today's high score and current run, kept up to date as answers are logged"""
+    current_run, high_score = await get_puzzle_runs(current_user.user_id, db)
+    return {"high_score_today": high_score, "current_run": current_run}
 
 # Emotional awareness endpoints
 @app.get("/api/emotions/session/")
@@ -496,32 +779,18 @@ async def get_emotion_scenario():
     return random.choice(scenarios)
 
 @app.post("/api/emotions/log/")
-async def log_emotion(log: EmotionLog, username: str = Depends(get_current_user), db: Session = Depends(get_db)):
-    daily_record = get_user_daily_data(username, "emotions", db)
-    
-    # Update count
-    daily_record.count += 1
-    
-    # Update data JSON
-    if daily_record.data_json is None:
-        data_list = []
-    else:
-        data_list = json.loads(daily_record.data_json)
-    data_list.append({
+async def log_emotion(log: EmotionLog, current_user: CachedSession = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    total_today = await log_wellness_event(current_user.user_id, "emotions", {
         "scenario_id": log.scenario_id,
         "selected_mood": log.selected_mood,
         "timestamp": datetime.now().isoformat()
-    })
-    daily_record.data_json = json.dumps(data_list)
-    daily_record.updated_at = datetime.utcnow()
-    
-    db.commit()
+    }, db)
     
-    return {"message": "Emotion logged successfully"}
+    return {"message": "Emotion logged successfully", "total_today": total_today}
 
 @app.get("/api/emotions/status/")
-async def get_emotion_status(username: str = Depends(get_current_user), db: Session = Depends(get_db)):
-    daily_record = get_user_daily_data(username, "emotions", db)
+async def get_emotion_status(current_user: CachedSession = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    daily_record = await get_user_daily_data(current_user.user_id, "emotions", db)
     return {"scenarios_today": daily_record.count}
 
 @app.get("/api/emotions/tip/")
@@ -548,32 +817,18 @@ async def get_affirmation_words():
     return {"words": words}
 
 @app.post("/api/affirmations/submit/")
-async def submit_affirmation(affirmation: AffirmationSubmit, username: str = Depends(get_current_user), db: Session = Depends(get_db)):
-    daily_record = get_user_daily_data(username, "affirmations", db)
-    
-    # Update count
-    daily_record.count += 1
-    
-    # Update data JSON
-    if daily_record.data_json is None:
-        data_list = []
-    else:
-        data_list = json.loads(daily_record.data_json)
-    data_list.append({
+async def submit_affirmation(affirmation: AffirmationSubmit, current_user: CachedSession = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    total_today = await log_wellness_event(current_user.user_id, "affirmations", {
         "words": affirmation.words,
         "generated_affirmation": affirmation.generated_affirmation,
         "timestamp": datetime.now().isoformat()
-    })
-    daily_record.data_json = json.dumps(data_list)
-    daily_record.updated_at = datetime.utcnow()
+    }, db)
     
-    db.commit()
-    
-    return {"message": "Affirmation saved successfully"}
+    return {"message": "Affirmation saved successfully", "total_today": total_today}
 
 @app.get("/api/affirmations/status/")
-async def get_affirmation_status(username: str = Depends(get_current_user), db: Session = Depends(get_db)):
-    daily_record = get_user_daily_data(username, "affirmations", db)
+async def get_affirmation_status(current_user: CachedSession = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    daily_record = await get_user_daily_data(current_user.user_id, "affirmations", db)
     return {"affirmations_today": daily_record.count}
 
 @app.get("/api/affirmations/generate/")
@@ -586,51 +841,347 @@ async def generate_affirmation(words: str):
     word_list = words.split(",")
     selected_words = [w.strip() for w in word_list if w.strip()]
     
+    affirmation_pool.record_request(selected_words)
     generated_text = await generate_ai_affirmation(selected_words)
     
     return {"generated_affirmation": generated_text}
 
+@app.get("/api/affirmations/generate/stream/")
+async def generate_affirmation_stream(words: str):
+    """
+    Streaming variant of /api/affirmations/generate/ as Server-Sent Events.
+    Each event carries {"delta": "..."}; a final "done" event carries the full text.
+    """
+    word_list = words.split(",")
+    selected_words = [w.strip() for w in word_list if w.strip()]
+    affirmation_pool.record_request(selected_words)
+    
+    async def event_stream():
+        chunks = []
+        # Close the upstream stream as soon as the client goes away so the
+        # circuit breaker records the aborted call right away
+        async with aclosing(stream_ai_affirmation(selected_words)) as stream:
+            async for chunk in stream:
+                chunks.append(chunk)
+                yield f"data: {json.dumps({'delta': chunk})}\n\n"
+        yield f"event: done\ndata: {json.dumps({'generated_affirmation': ''.join(chunks)})}\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/api/affirmations/stats/")
+async def get_affirmation_generation_stats():
+    """Cache, circuit breaker, upstream and warm pool counters for affirmation generation"""
+    return {**get_ai_stats(), "pool": affirmation_pool.stats()}
+
 @app.get("/api/affirmations/history/")
-async def get_affirmation_history(username: str = Depends(get_current_user), db: Session = Depends(get_db)):
-    daily_record = get_user_daily_data(username, "affirmations", db)
-    if daily_record.data_json is None:
-        history_data = []
-    else:
-        history_data = json.loads(daily_record.data_json)
+async def get_affirmation_history(current_user: CachedSession = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    history_data = await get_daily_events(current_user.user_id, "affirmations", db)
     return {"history": history_data}
 
+# Dashboard endpoint
+@app.get("/api/dashboard/")
+async def get_dashboard(current_user: CachedSession = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    """All of today's counters in one request, without creating placeholder rows"""
+    today = date.today().isoformat()
+    user_id = current_user.user_id
+    
+    async def read():
+        counts = {}
+        puzzle_runs = (0, 0)
+        rows = await db.execute(select(
+            DailyWellnessData.data_type, DailyWellnessData.count, DailyWellnessData.current_run, DailyWellnessData.best_run
+        ).where(
+            DailyWellnessData.user_id == user_id,
+            DailyWellnessData.date == today
+        ))
+        for data_type, count, current_run, best_run in rows:
+            counts[data_type] = count
+            if data_type == "puzzles":
+                puzzle_runs = (current_run or 0, best_run or 0)
+        
+        # Brushing flags need today's event payloads
+        brushing_sessions = [json.loads(payload) for payload in await db.scalars(select(WellnessEvent.payload).where(
+            WellnessEvent.user_id == user_id,
+            WellnessEvent.date == today,
+            WellnessEvent.data_type == "brushing"
+        ).order_by(WellnessEvent.id))]
+        
+        # Add events still queued in the write-behind buffer
+        for data_type in WELLNESS_TYPES:
+            pending = write_buffer.pending_count(user_id, today, data_type)
+            if pending:
+                counts[data_type] = counts.get(data_type, 0) + pending
+        brushing_sessions.extend(write_buffer.pending_events(user_id, today, "brushing"))
+        pending_results = [payload.get("correct", False) for payload in write_buffer.pending_events(user_id, today, "puzzles")]
+        return counts, brushing_sessions, apply_results(*puzzle_runs, pending_results)
+    
+    counts, brushing_sessions, (_, high_score) = await write_buffer.consistent_read(read)
+    return {
+        "date": today,
+        "hydration": {"glasses_today": counts.get("hydration", 0), "goal": 8},
+        "brushing": {
+            "brushing_today": counts.get("brushing", 0),
+            "goal": 2,
+            "morning_completed": any(session.get("session_type") == "morning" for session in brushing_sessions),
+            "night_completed": any(session.get("session_type") == "night" for session in brushing_sessions)
+        },
+        "breathing": {"sessions_today": counts.get("breathing", 0)},
+        "puzzles": {"high_score_today": high_score},
+        "emotions": {"scenarios_today": counts.get("emotions", 0)},
+        "affirmations": {"affirmations_today": counts.get("affirmations", 0)}
+    }
+
+# Batched event logging
+@app.post("/api/events/batch/")
+async def log_event_batch(batch: EventBatch, current_user: CachedSession = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    """Log events across all game types in one transaction and return today's totals per type"""
+    timestamp = datetime.now().isoformat()
+    payloads_by_type = {}
+    increments_by_type = {}
+    
+    for event in batch.events:
+        payload = event.model_dump(exclude={"type"})
+        payload["timestamp"] = timestamp
+        if event.type == "puzzles":
+            payload["correct"] = check_puzzle_answer(event.puzzle_id, event.user_sequence)
+        payloads_by_type.setdefault(event.type, []).append(payload)
+        increment = event.glasses if event.type == "hydration" else 1
+        increments_by_type[event.type] = increments_by_type.get(event.type, 0) + increment
+    
+    totals = {}
+    today = date.today().isoformat()
+    if write_buffer.enabled:
+        for data_type, payloads in payloads_by_type.items():
+            totals[data_type] = await write_buffer.append(
+                current_user.user_id, today, data_type, payloads, increments_by_type[data_type], db
+            )
+        for data_type, total in totals.items():
+            if total is None:
+                totals[data_type] = (await get_user_daily_data(current_user.user_id, data_type, db)).count
+    else:
+        # All types in one store_event_groups call, so the statement count does not grow with the batch
+        groups = {
+            (current_user.user_id, today, data_type): (increments_by_type[data_type], payloads)
+            for data_type, payloads in payloads_by_type.items()
+        }
+        new_counts = await store_event_groups(groups, db)
+        await db.commit()
+        totals = {data_type: new_counts[(current_user.user_id, today, data_type)] for data_type in payloads_by_type}
+        # Published once committed, as the write-behind flusher does
+        await publish_committed_counters(groups, new_counts)
+    return {"message": f"Logged {len(batch.events)} event(s)", "totals_today": totals}
+
+# Live updates
+@app.post("/api/live/ticket/")
+async def live_stream_ticket(authorization: str = Header(None), current_user: CachedSession = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    """One-time ticket for opening /api/live/, valid for PUSH_TICKET_TTL_SECONDS"""
+    if live_updates.broker is None:
+        raise HTTPException(status_code=503, detail="Live updates are unavailable")
+    # Logging out of a session ends its streams; in JWT mode logout ends all of the user's
+    session = session_key(authorization.split(" ")[1]) if AUTH_MODE == "session" else None
+    ticket = await live_updates.issue_ticket(current_user.user_id, session, current_user.expires_at, db)
+    return {"ticket": ticket, "expires_in": live_updates.ticket_ttl_seconds}
+
+@app.get("/api/live/")
+async def live_counter_updates(ticket: str):
+    """
+    Server-Sent Events stream of the user's counter changes from every tab and device.
+    Events: "counter" {date, data_type, delta, total_today}, "reset" {date, data_types} and
+    "resync" when the client fell behind and should reload /api/dashboard/. EventSource
+    cannot send headers, so the stream is opened with a one-time ticket from
+    POST /api/live/ticket/ rather than the session token.
+    """
+    if live_updates.broker is None:
+        raise HTTPException(status_code=503, detail="Live updates are unavailable")
+    if not live_updates.has_capacity():
+        raise HTTPException(status_code=503, detail="Too many live connections", headers={"Retry-After": "30"})
+    # Redeem on a short-lived session: the stream must not hold a pooled connection
+    async with open_async_session() as db:
+        stream_ticket = await live_updates.redeem_ticket(ticket, db)
+    if stream_ticket is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired stream ticket")
+    return StreamingResponse(live_updates.stream(stream_ticket.user_id, stream_ticket.expires_at, stream_ticket.session), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # nginx: pass events through unbuffered
+    })
+
+# Historical stats endpoints
+def parse_data_types(types: Optional[str]) -> List[str]:
+    """Comma-separated data types from a query parameter (every type when empty)"""
+    data_types = [t.strip() for t in types.split(",") if t.strip()] if types else WELLNESS_TYPES
+    unknown = [t for t in data_types if t not in WELLNESS_TYPES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown data types: {', '.join(unknown)}")
+    return data_types
+
+@app.get("/api/stats/history/")
+async def get_stats_history(
+    from_date: Optional[str] = Query(None, alias="from"),
+    to_date: Optional[str] = Query(None, alias="to"),
+    types: Optional[str] = None,
+    current_user: CachedSession = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Daily counts per type between two dates (inclusive, default the last 30 days) from the daily rollups"""
+    try:
+        end = date.fromisoformat(to_date) if to_date else date.today()
+        start = date.fromisoformat(from_date) if from_date else end - timedelta(days=29)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must use the YYYY-MM-DD format")
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if (end - start).days >= MAX_HISTORY_DAYS:
+        raise HTTPException(status_code=400, detail=f"History is limited to {MAX_HISTORY_DAYS} days per request")
+    
+    data_types = parse_data_types(types)
+    
+    async def read():
+        # One range scan over the (user_id, date, data_type) unique index
+        rows = await db.execute(select(DailyWellnessData.date, DailyWellnessData.data_type, DailyWellnessData.count).where(
+            DailyWellnessData.user_id == current_user.user_id,
+            DailyWellnessData.date >= start.isoformat(),
+            DailyWellnessData.date <= end.isoformat(),
+            DailyWellnessData.data_type.in_(data_types)
+        ))
+        counts = {(day, data_type): count for day, data_type, count in rows}
+        # Today's events still queued in the write-behind buffer
+        today = date.today().isoformat()
+        if start.isoformat() <= today <= end.isoformat():
+            for data_type in data_types:
+                pending = write_buffer.pending_count(current_user.user_id, today, data_type)
+                if pending:
+                    counts[(today, data_type)] = (counts.get((today, data_type)) or 0) + pending
+        return counts
+    
+    counts = await write_buffer.consistent_read(read)
+    
+    days = []
+    totals = dict.fromkeys(data_types, 0)
+    for offset in range((end - start).days + 1):
+        day = (start + timedelta(days=offset)).isoformat()
+        entry = {"date": day}
+        for data_type in data_types:
+            entry[data_type] = counts.get((day, data_type)) or 0
+            totals[data_type] += entry[data_type]
+        days.append(entry)
+    
+    return {"from": start.isoformat(), "to": end.isoformat(), "types": data_types, "days": days, "totals": totals}
+
+@app.get("/api/stats/streaks/")
+async def get_stats_streaks(current_user: CachedSession = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    """Current and longest run of active days per type, plus across all types"""
+    today = date.today()
+    yesterday = (today - timedelta(days=1)).isoformat()
+    
+    async def read():
+        records = {record.data_type: record for record in await db.scalars(select(WellnessStreak).where(
+            WellnessStreak.user_id == current_user.user_id
+        ).execution_options(populate_existing=True))}
+        # Types with events still queued in the write-behind buffer are active today
+        active_today = set(write_buffer.pending_types(current_user.user_id, today.isoformat()))
+        if active_today:
+            active_today.add(STREAK_ALL)
+        return records, active_today
+    
+    records, active_today = await write_buffer.consistent_read(read)
+    
+    streaks = {}
+    for data_type in WELLNESS_TYPES + [STREAK_ALL]:
+        record = records.get(data_type)
+        current, longest, last_active_date = (
+            (record.current_streak, record.longest_streak, record.last_active_date) if record else (0, 0, None)
+        )
+        if data_type in active_today and (last_active_date is None or last_active_date < today.isoformat()):
+            # Same rule as record_streak_activity, applied before the flush
+            current = current + 1 if last_active_date == yesterday else 1
+            longest = max(longest, current)
+            last_active_date = today.isoformat()
+        # A streak stays alive until a full day passes without activity
+        alive = last_active_date is not None and last_active_date >= yesterday
+        streaks[data_type] = {
+            "current": current if alive else 0,
+            "longest": longest,
+            "last_active_date": last_active_date
+        }
+    
+    return {"date": today.isoformat(), "streaks": streaks}
+
 @app.post("/api/stats/reset/")
-async def reset_all_stats(username: str = Depends(get_current_user), db: Session = Depends(get_db)):
+async def reset_all_stats(current_user: CachedSession = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """Reset all wellness stats for the current user"""
     today = date.today().strftime("%Y-%m-%d")
     
-    # Get user object first
-    user = db.query(User).filter(User.username == username).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Get all daily records for today
-    records = db.query(DailyWellnessData).filter(
-        DailyWellnessData.user_id == user.id,
-        DailyWellnessData.date == today
-    ).all()
-    
-    # Reset counts and clear data_json for all wellness data types
-    wellness_types = ["hydration", "brushing", "breathing", "puzzles", "emotions", "affirmations"]
-    
-    for record in records:
-        if record.data_type in wellness_types:
-            record.count = 0
-            record.data_json = "[]"
-            record.updated_at = datetime.utcnow()
-    
-    db.commit()
+    # Reset counts and clear events for all wellness data types
+    await reset_daily_data(current_user.user_id, WELLNESS_TYPES, db)
     
     return {
         "message": "All wellness stats have been reset",
         "reset_date": today,
-        "reset_types": wellness_types
+        "reset_types": WELLNESS_TYPES
     }
 
+# Data export endpoints
+async def export_response(user_id: Optional[int], export_format: str, from_date: Optional[str], to_date: Optional[str],
+                          types: Optional[str], db: AsyncSession) -> StreamingResponse:
+    """Validate the filters and stream the export; user_id None exports every user"""
+    try:
+        start = date.fromisoformat(from_date).isoformat() if from_date else None
+        end = date.fromisoformat(to_date).isoformat() if to_date else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must use the YYYY-MM-DD format")
+    data_types = parse_data_types(types) if types else None
+    slot = data_exporter.acquire()
+    if slot is None:
+        raise HTTPException(status_code=503, detail="Too many exports in progress", headers={"Retry-After": "30"})
+    try:
+        # Include events queued in this worker's write-behind buffer
+        await write_buffer.flush(db)
+    except Exception:
+        slot.release()
+        raise
+    filename = f"wellness-export-{user_id if user_id is not None else 'all'}-{date.today().isoformat()}.{export_format}"
+    # The stream releases the slot when it ends; the background task covers a
+    # body that is never iterated
+    return StreamingResponse(
+        data_exporter.stream(slot, export_format, user_id, start, end, data_types),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        background=BackgroundTask(slot.release)
+    )
+
+@app.get("/api/export/")
+async def export_user_data(
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    from_date: Optional[str] = Query(None, alias="from"),
+    to_date: Optional[str] = Query(None, alias="to"),
+    types: Optional[str] = None,
+    current_user: CachedSession = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Stream all of the user's daily counters and then all of their events (optionally
+    between two dates and for some types) as NDJSON or CSV. Every record has a
+    "record" field of "daily" or "event"; event payloads are embedded as logged.
+    """
+    return await export_response(current_user.user_id, export_format, from_date, to_date, types, db)
+
+@app.get("/api/admin/export/")
+async def export_all_data(
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    from_date: Optional[str] = Query(None, alias="from"),
+    to_date: Optional[str] = Query(None, alias="to"),
+    types: Optional[str] = None,
+    authorization: str = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Bulk export of every user's data, in the /api/export/ format; needs Bearer EXPORT_ADMIN_TOKEN"""
+    if not data_exporter.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    token = authorization.split(" ")[-1] if authorization else None
+    if not data_exporter.is_admin_token(token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    return await export_response(None, export_format, from_date, to_date, types, db)
+
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
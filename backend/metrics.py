@@ -0,0 +1,236 @@
+"""
+Request metrics for Wellness Arcade
+An ASGI middleware times every request per route, SQLAlchemy cursor events
+count queries and database time for the request being served, and the AIML
+client reports upstream latency. render_metrics() writes everything in the
+Prometheus text format for the /metrics endpoint.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_SLOW_REQUEST_MS = float(os.getenv("METRICS_SLOW_REQUEST_MS", "0"))  # 0 disables slow request logging
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Statements kept per request for the slow request log
+MAX_LOGGED_STATEMENTS = 50
+
+
+class Histogram:
+    """Prometheus histogram keyed by a tuple of label values"""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, ...], list] = {}  # labels -> per-bucket counts, then sum and count
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            label_text = format_labels(self.label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels(self.label_names + ('le',), labels + (repr(float(bound)),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{format_labels(self.label_names + ('le',), labels + ('+Inf',))} {values[-1]}")
+            lines.append(f"{self.name}_sum{label_text} {values[-2]}")
+            lines.append(f"{self.name}_count{label_text} {values[-1]}")
+        return lines
+
+
+class Counter:
+    """Prometheus counter keyed by a tuple of label values"""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{format_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+def format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+# Metrics recorded by the middleware, the engine hooks and the AIML client
+request_duration = Histogram(
+    "wellness_http_request_duration_seconds", "Request latency by route", ("method", "route", "status"), LATENCY_BUCKETS
+)
+request_queries = Histogram(
+    "wellness_http_request_db_queries", "Database statements issued per request", ("method", "route"), QUERY_COUNT_BUCKETS
+)
+request_db_seconds = Counter(
+    "wellness_http_request_db_seconds_total", "Time spent executing database statements by route", ("method", "route")
+)
+background_queries = Counter(
+    "wellness_background_db_queries_total", "Database statements issued outside a request", ()
+)
+background_db_seconds = Counter(
+    "wellness_background_db_seconds_total", "Database time spent outside a request", ()
+)
+upstream_duration = Histogram(
+    "wellness_aiml_request_duration_seconds", "AIML upstream call latency by outcome", ("outcome",), LATENCY_BUCKETS
+)
+
+
+class RequestStats:
+    """Database work attributed to the request being served"""
+
+    __slots__ = ("queries", "db_seconds", "statements")
+
+    def __init__(self, record_statements: bool = False):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements: Optional[List[Tuple[float, str]]] = [] if record_statements else None
+
+
+_current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("metrics_request", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+
+    stats = _current_request.get()
+    if stats is None:
+        background_queries.inc(())
+        background_db_seconds.inc((), elapsed)
+        return
+    stats.queries += 1
+    stats.db_seconds += elapsed
+    if stats.statements is not None and len(stats.statements) < MAX_LOGGED_STATEMENTS:
+        stats.statements.append((elapsed, statement))
+
+
+def instrument_engine(engine):
+    """Count statements and database time on a (sync) engine"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def observe_upstream(outcome: str, seconds: float):
+    """Record one AIML upstream call ("ok", "error" or "timeout")"""
+    if METRICS_ENABLED:
+        upstream_duration.observe((outcome,), seconds)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency and database work per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(record_statements=METRICS_SLOW_REQUEST_MS > 0)
+        token = _current_request.set(stats)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_request.reset(token)
+            # Label by route template (the router stores the matched route in
+            # the scope) so path parameters and 404s cannot explode cardinality
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            record_request(scope["method"], route, status_code, elapsed, stats)
+
+
+def record_request(method: str, route: str, status_code: int, elapsed: float, stats: RequestStats):
+    request_duration.observe((method, route, str(status_code)), elapsed)
+    request_queries.observe((method, route), stats.queries)
+    request_db_seconds.inc((method, route), stats.db_seconds)
+
+    if METRICS_SLOW_REQUEST_MS and elapsed * 1000 >= METRICS_SLOW_REQUEST_MS:
+        print(f"[SLOW] {method} {route} {status_code} took {elapsed * 1000:.1f} ms: "
+              f"{stats.queries} queries, {stats.db_seconds * 1000:.1f} ms in the database")
+        for query_seconds, statement in stats.statements or []:
+            print(f"[SLOW]   {query_seconds * 1000:7.2f} ms  {' '.join(statement.split())[:300]}")
+
+
+def stats_to_gauges(prefix: str, stats: dict) -> List[str]:
+    """Flatten a component's stats() dict into gauge lines; strings become a label"""
+    lines = []
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            lines.extend(stats_to_gauges(name, value))
+        elif isinstance(value, bool):
+            lines.append(f"{name} {int(value)}")
+        elif isinstance(value, (int, float)):
+            lines.append(f"{name} {value}")
+        elif isinstance(value, str):
+            lines.append(f'{name}{format_labels(("value",), (value,))} 1')
+    return lines
+
+
+def render_metrics(component_stats: Dict[str, dict]) -> str:
+    """Prometheus text for the recorded metrics plus gauges from component stats"""
+    lines = []
+    for metric in (request_duration, request_queries, request_db_seconds, background_queries,
+                   background_db_seconds, upstream_duration):
+        lines.extend(metric.render())
+    for component, stats in component_stats.items():
+        lines.extend(stats_to_gauges(f"wellness_{component}", stats))
+    return "\n".join(lines) + "\n"
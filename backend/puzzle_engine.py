@@ -0,0 +1,116 @@
+"""
+Sequence puzzle engine for Wellness Arcade
+Puzzles come from a bank of tile sequences generated at import from a fixed
+seed, so every worker builds the same bank and any of them can check an
+answer. The bank is one flat byte array of PUZZLE_BANK_SIZE sequences of
+PUZZLE_MAX_LENGTH tiles: a puzzle is a (sequence, length) pair, serving or
+checking one is a slice, and the next Brain Sprint round is the same
+sequence one tile longer. Difficulty is the number of tiles to repeat.
+"""
+
+import os
+import random
+from array import array
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+# Puzzle bank configuration
+PUZZLE_BANK_SIZE = int(os.getenv("PUZZLE_BANK_SIZE", "4096"))  # sequences
+PUZZLE_BANK_SEED = int(os.getenv("PUZZLE_BANK_SEED", "20240601"))  # same on every worker
+PUZZLE_MAX_LENGTH = 32  # tiles in the longest puzzle
+TILE_COUNT = 4  # tiles on the Brain Sprint board, numbered from 1
+
+PUZZLE_ID_PREFIX = "seq"
+
+
+class PuzzleBank:
+    """Seeded, array-backed bank of tile sequences"""
+
+    def __init__(self, size: int = PUZZLE_BANK_SIZE, max_length: int = PUZZLE_MAX_LENGTH,
+                 seed: int = PUZZLE_BANK_SEED, tile_count: int = TILE_COUNT):
+        self.size = max(1, size)
+        self.max_length = max_length
+        self.tile_count = tile_count
+        # Random bytes mapped onto 1..tile_count; 256 is a multiple of 4, so
+        # the default board stays uniform
+        tiles = bytes((value % tile_count) + 1 for value in range(256))
+        raw = random.Random(seed).randbytes(self.size * max_length)
+        self._tiles = array("B", raw.translate(tiles))
+
+    @property
+    def nbytes(self) -> int:
+        return self._tiles.itemsize * len(self._tiles)
+
+    def puzzle_id(self, index: int, length: int) -> str:
+        return f"{PUZZLE_ID_PREFIX}-{index}-{length}"
+
+    def parse_id(self, puzzle_id: str) -> Tuple[int, int]:
+        """(sequence index, length) of a puzzle id; ValueError if it is not in the bank"""
+        prefix, index, length = puzzle_id.split("-")
+        index, length = int(index), int(length)
+        if prefix != PUZZLE_ID_PREFIX or not 0 <= index < self.size or not 1 <= length <= self.max_length:
+            raise ValueError(f"Unknown puzzle: {puzzle_id}")
+        return index, length
+
+    def sequence(self, index: int, length: int) -> List[int]:
+        start = index * self.max_length
+        return self._tiles[start:start + length].tolist()
+
+    def puzzle(self, index: int, length: int) -> dict:
+        return {
+            "id": self.puzzle_id(index, length),
+            "type": "sequence",
+            "difficulty": length,
+            "sequence": self.sequence(index, length)
+        }
+
+    def random_puzzle(self, difficulty: int) -> dict:
+        """A random puzzle with difficulty tiles (clamped to the bank's range)"""
+        length = min(max(difficulty, 1), self.max_length)
+        return self.puzzle(random.randrange(self.size), length)
+
+    def next_puzzle(self, puzzle_id: str) -> Optional[dict]:
+        """The same sequence one tile longer; None at the longest length"""
+        index, length = self.parse_id(puzzle_id)
+        return self.puzzle(index, length + 1) if length < self.max_length else None
+
+    def check(self, puzzle_id: str, answer: List[int]) -> bool:
+        """Whether answer repeats the puzzle's sequence; ValueError for unknown ids"""
+        index, length = self.parse_id(puzzle_id)
+        return len(answer) == length and self.sequence(index, length) == answer
+
+
+class PuzzleRuns(NamedTuple):
+    """Runs of correct answers in a group of results, so a stored (current, best)
+    pair can be advanced in one step"""
+    lead: int  # correct answers before the first wrong one (all of them if none was wrong)
+    inner: int  # longest run after the first wrong answer, including the trailing run
+    trail: int  # correct answers after the last wrong one
+    reset: bool  # whether any answer was wrong
+
+
+def summarize_results(results: Iterable[bool]) -> PuzzleRuns:
+    lead = inner = run = 0
+    reset = False
+    for correct in results:
+        if correct:
+            run += 1
+            if reset:
+                inner = max(inner, run)
+            else:
+                lead = run
+        else:
+            reset = True
+            run = 0
+    return PuzzleRuns(lead, inner, run if reset else 0, reset)
+
+
+def apply_results(current: int, best: int, results: Iterable[bool]) -> Tuple[int, int]:
+    """Current and best run of consecutive correct answers after results"""
+    runs = summarize_results(results)
+    best = max(best, current + runs.lead, runs.inner)
+    current = runs.trail if runs.reset else current + runs.lead
+    return current, best
+
+
+# Shared bank used by the API
+puzzle_bank = PuzzleBank()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Bulk seeding script for Wellness Arcade load environments
+Creates users, sessions and days of wellness history at production scale.
+Users are written in chunks, one transaction each, with executemany inserts
+(batched into multi-row INSERTs by SQLAlchemy). Each day's events, counters,
+puzzle runs and streaks are derived the way the API would have stored them.
+By default every user shares one precomputed password hash; --hash-mode
+unique bcrypt-hashes each user's password in a process pool instead.
+
+    python seed_database.py --users 100000 --days 30
+    python seed_database.py --users 5000 --days 365 --activity puzzles=0.8:12 --engagement-shape 0.5
+    python seed_database.py --users 1000 --hash-mode unique --bcrypt-rounds 10 --tokens-file tokens.csv
+
+Activity per game is a daily probability and a mean number of events on an
+active day (Poisson). Each user's probabilities are scaled by an engagement
+factor drawn from 2 * Beta(shape, shape): large shapes make users alike,
+shapes below 1 split them into heavy and idle users. Run it again with the
+same --prefix to add more users.
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+
+import bcrypt
+
+DEFAULT_PASSWORD = "wellness-seed"
+
+# data type -> (probability a user is active on a day, mean events on an active day)
+DEFAULT_ACTIVITY = {
+    "hydration": (0.85, 5.0),
+    "brushing": (0.9, 1.8),
+    "breathing": (0.5, 1.5),
+    "puzzles": (0.4, 6.0),
+    "emotions": (0.35, 1.3),
+    "affirmations": (0.3, 1.2),
+}
+
+EMOTION_SCENARIOS = ["scenario_1", "scenario_2", "scenario_3", "scenario_4", "scenario_5"]
+MOODS = ["happy", "sad", "anxious", "calm", "excited", "frustrated"]
+AFFIRMATION_WORDS = ["strong", "capable", "worthy", "brave", "confident", "grateful", "believe", "achieve"]
+
+# Buffered event rows before they are inserted (bounds memory per chunk)
+EVENT_FLUSH_ROWS = 20000
+
+
+def parse_activity(values):
+    """--activity type=probability:mean overrides on top of DEFAULT_ACTIVITY"""
+    activity = dict(DEFAULT_ACTIVITY)
+    for value in values or []:
+        try:
+            data_type, spec = value.split("=")
+            probability, mean = (float(part) for part in spec.split(":"))
+        except ValueError:
+            raise SystemExit(f"--activity expects type=probability:mean, got {value!r}")
+        if data_type not in DEFAULT_ACTIVITY:
+            raise SystemExit(f"Unknown data type in --activity: {data_type}")
+        activity[data_type] = (min(max(probability, 0.0), 1.0), max(mean, 0.0))
+    return activity
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Bulk-create users, sessions and wellness history")
+    parser.add_argument("--users", type=int, default=1000, help="Users to create")
+    parser.add_argument("--days", type=int, default=30, help="Days of history per user, ending today")
+    parser.add_argument("--prefix", default="seed_user_", help="Username prefix (numbering continues after existing users)")
+    parser.add_argument("--password", default=DEFAULT_PASSWORD, help="Password for every seeded user")
+    parser.add_argument("--hash-mode", choices=["fixed", "unique"], default="fixed",
+                        help="fixed: one precomputed hash for everyone; unique: a bcrypt hash per user")
+    parser.add_argument("--hash-workers", type=int, default=os.cpu_count() or 1, help="Processes for --hash-mode unique")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12, help="bcrypt cost (the API's default is 12)")
+    parser.add_argument("--sessions-per-user", type=int, default=1, help="Session tokens per user")
+    parser.add_argument("--expired-sessions", type=float, default=0.0, help="Fraction of sessions already expired")
+    parser.add_argument("--tokens-file", help="Write username,session_token lines for live sessions")
+    parser.add_argument("--activity", action="append", metavar="TYPE=P:MEAN",
+                        help="Daily probability and mean events per active day for a game (repeatable)")
+    parser.add_argument("--engagement-shape", type=float, default=2.0, help="Beta shape of per-user engagement")
+    parser.add_argument("--puzzle-accuracy", type=float, default=0.8, help="Share of correct puzzle answers")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Users per transaction")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+    args.activity = parse_activity(args.activity)
+    return args
+
+
+def hash_password(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def poisson(rng: random.Random, mean: float) -> int:
+    """Knuth's method; fine for the small means used here"""
+    limit = math.exp(-mean)
+    count, product = 0, rng.random()
+    while product > limit:
+        count += 1
+        product *= rng.random()
+    return count
+
+
+class HistoryGenerator:
+    """Builds one user's daily rows, events and streaks"""
+
+    def __init__(self, args, puzzle_bank, compute_streaks, apply_results, streak_all):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.puzzle_bank = puzzle_bank
+        self.compute_streaks = compute_streaks
+        self.apply_results = apply_results
+        self.streak_all = streak_all
+        today = date.today()
+        self.days = [(today - timedelta(days=offset)) for offset in range(args.days - 1, -1, -1)]
+
+    def payload(self, data_type: str, index: int, timestamp: str):
+        """(payload, increment) as the log endpoint would store them"""
+        rng = self.rng
+        if data_type == "hydration":
+            glasses = 1 if rng.random() < 0.8 else 2
+            return {"glasses": glasses, "timestamp": timestamp}, glasses
+        if data_type == "brushing":
+            return {"session_type": "morning" if index % 2 == 0 else "night", "timestamp": timestamp}, 1
+        if data_type == "breathing":
+            return {"duration_seconds": rng.choice([30, 60, 90, 120]), "timestamp": timestamp}, 1
+        if data_type == "puzzles":
+            puzzle = self.puzzle_bank.puzzle(rng.randrange(self.puzzle_bank.size), rng.randint(1, 8))
+            correct = rng.random() < self.args.puzzle_accuracy
+            answer = puzzle["sequence"] if correct else puzzle["sequence"][:-1]
+            return {"puzzle_id": puzzle["id"], "user_sequence": answer, "correct": correct, "timestamp": timestamp}, 1
+        if data_type == "emotions":
+            return {"scenario_id": rng.choice(EMOTION_SCENARIOS), "selected_mood": rng.choice(MOODS),
+                    "timestamp": timestamp}, 1
+        words = ["I", "am"] + rng.sample(AFFIRMATION_WORDS, 2)
+        return {"words": words, "generated_affirmation": f"I am {words[2]} and {words[3]}.", "timestamp": timestamp}, 1
+
+    def user_history(self, user_id: int, now: datetime):
+        """(daily rows, event rows, streak rows) for a user"""
+        rng = self.rng
+        shape = self.args.engagement_shape
+        engagement = 2 * rng.betavariate(shape, shape)
+        local_now = datetime.now()  # payload timestamps use local time, as in the API
+        daily_rows, event_rows = [], []
+        active_days = {data_type: [] for data_type in self.args.activity}
+        for day in self.days:
+            day_text = day.isoformat()
+            day_start = datetime.combine(day, datetime.min.time())
+            # Today's events all happened before now
+            seconds_in_day = min(86400, max(1, int((local_now - day_start).total_seconds())))
+            for data_type, (probability, mean) in self.args.activity.items():
+                if rng.random() >= probability * engagement:
+                    continue
+                events = max(1, poisson(rng, mean))
+                times = sorted(day_start + timedelta(seconds=rng.randrange(seconds_in_day)) for _ in range(events))
+                count = 0
+                results = []
+                for index, logged_at in enumerate(times):
+                    payload, increment = self.payload(data_type, index, logged_at.isoformat())
+                    count += increment
+                    if data_type == "puzzles":
+                        results.append(payload["correct"])
+                    event_rows.append({"user_id": user_id, "date": day_text, "data_type": data_type,
+                                       "payload": json.dumps(payload), "created_at": logged_at})
+                current_run, best_run = self.apply_results(0, 0, results) if data_type == "puzzles" else (None, None)
+                daily_rows.append({"user_id": user_id, "date": day_text, "data_type": data_type, "count": count,
+                                   "current_run": current_run, "best_run": best_run,
+                                   "created_at": times[0], "updated_at": times[-1]})
+                active_days[data_type].append(day_text)
+
+        streak_rows = []
+        all_days = sorted({day for days in active_days.values() for day in days})
+        for data_type, days in list(active_days.items()) + [(self.streak_all, all_days)]:
+            if not days:
+                continue
+            current, longest, last_active_date = self.compute_streaks(days)
+            streak_rows.append({"user_id": user_id, "data_type": data_type, "current_streak": current,
+                                "longest_streak": longest, "last_active_date": last_active_date, "updated_at": now})
+        return daily_rows, event_rows, streak_rows
+
+
+def main():
+    args = parse_args()
+    started = time.perf_counter()
+
+    from sqlalchemy import func, select
+
+    import database
+    from auth_utils import generate_session_token, get_token_expiry
+    from puzzle_engine import puzzle_bank, apply_results
+
+    database.init_database()
+    users_table = database.User.__table__
+    sessions_table = database.UserSession.__table__
+    daily_table = database.DailyWellnessData.__table__
+    events_table = database.WellnessEvent.__table__
+    streaks_table = database.WellnessStreak.__table__
+
+    with database.engine.connect() as connection:
+        first_number = connection.execute(select(func.count()).select_from(users_table).where(
+            users_table.c.username.startswith(args.prefix, autoescape=True)
+        )).scalar()
+
+    generator = HistoryGenerator(args, puzzle_bank, database.compute_streaks, apply_results, database.STREAK_ALL)
+    fixed_hash = hash_password(args.password, args.bcrypt_rounds) if args.hash_mode == "fixed" else None
+    pool = ProcessPoolExecutor(max_workers=args.hash_workers) if args.hash_mode == "unique" else None
+    tokens_file = open(args.tokens_file, "w", newline="") if args.tokens_file else None
+    tokens_writer = csv.writer(tokens_file) if tokens_file else None
+    totals = dict.fromkeys(["users", "sessions", "daily", "events", "streaks"], 0)
+
+    print(f"Seeding {args.users} users with {args.days} day(s) of history into {database.DATABASE_URL.split('://')[0]} "
+          f"(passwords: {args.hash_mode} hash)")
+    try:
+        for chunk_start in range(0, args.users, args.chunk_size):
+            chunk = range(chunk_start, min(chunk_start + args.chunk_size, args.users))
+            now = datetime.utcnow()
+            usernames = [f"{args.prefix}{first_number + i}" for i in chunk]
+            if pool is not None:
+                hashes = list(pool.map(hash_password, [args.password] * len(chunk), [args.bcrypt_rounds] * len(chunk),
+                                       chunksize=max(1, len(chunk) // (args.hash_workers * 4))))
+            else:
+                hashes = [fixed_hash] * len(chunk)
+
+            with database.engine.begin() as connection:
+                users = connection.execute(
+                    users_table.insert().returning(users_table.c.id, users_table.c.username, sort_by_parameter_order=True),
+                    [{"username": username, "email": f"{username}@example.com", "hashed_password": hashed,
+                      "created_at": now - timedelta(days=args.days), "is_active": True}
+                     for username, hashed in zip(usernames, hashes)]
+                ).all()
+
+                session_rows = []
+                for user_id, username in users:
+                    for _ in range(args.sessions_per_user):
+                        token = generate_session_token()
+                        expired = generator.rng.random() < args.expired_sessions
+                        expires_at = now - timedelta(hours=1) if expired else get_token_expiry()
+                        session_rows.append({"session_token": token, "user_id": user_id, "created_at": now,
+                                             "expires_at": expires_at})
+                        if tokens_writer is not None and not expired:
+                            tokens_writer.writerow([username, token])
+                if session_rows:
+                    connection.execute(sessions_table.insert(), session_rows)
+
+                daily_rows, event_rows, streak_rows = [], [], []
+                for user_id, _ in users:
+                    user_daily, user_events, user_streaks = generator.user_history(user_id, now)
+                    daily_rows.extend(user_daily)
+                    event_rows.extend(user_events)
+                    streak_rows.extend(user_streaks)
+                    if len(event_rows) >= EVENT_FLUSH_ROWS:
+                        connection.execute(events_table.insert(), event_rows)
+                        totals["events"] += len(event_rows)
+                        event_rows = []
+                for table, rows, key in ((events_table, event_rows, "events"), (daily_table, daily_rows, "daily"),
+                                         (streaks_table, streak_rows, "streaks")):
+                    if rows:
+                        connection.execute(table.insert(), rows)
+                        totals[key] += len(rows)
+
+            totals["users"] += len(users)
+            totals["sessions"] += len(session_rows)
+            elapsed = time.perf_counter() - started
+            print(f"  {totals['users']}/{args.users} users, {totals['daily']} daily rows, {totals['events']} events "
+                  f"({elapsed:.1f} s)")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if tokens_file is not None:
+            tokens_file.close()
+
+    elapsed = time.perf_counter() - started
+    rows = sum(totals.values())
+    print(f"Seeded {totals['users']} users, {totals['sessions']} sessions, {totals['daily']} daily rows, "
+          f"{totals['events']} events and {totals['streaks']} streaks in {elapsed:.1f} s ({rows / elapsed:,.0f} rows/s)")
+    print(f"Log in as {args.prefix}{first_number} with password {args.password!r}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
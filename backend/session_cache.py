@@ -0,0 +1,116 @@
+"""
+In-process session cache for Wellness Arcade
+Keeps recently authenticated session tokens in memory so that hot requests
+skip the UserSession and User lookups in get_current_user
+"""
+
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, NamedTuple, Optional, Set
+import os
+import threading
+
+# Cache configuration
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+SESSION_CACHE_TTL_SECONDS = int(os.getenv("SESSION_CACHE_TTL_SECONDS", "60"))
+
+
+class CachedSession(NamedTuple):
+    user_id: int
+    username: str
+    expires_at: datetime
+
+
+class SessionCache:
+    """Bounded LRU cache of session token -> CachedSession with a TTL.
+
+    Entries live until the earlier of the cache TTL and the session's own
+    expiry. The TTL bounds how long a session revoked by another worker
+    process can still be served from this process's cache.
+    """
+
+    def __init__(self, max_size: int = SESSION_CACHE_SIZE, ttl_seconds: int = SESSION_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._tokens_by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[CachedSession]:
+        """Return the cached session for a token, or None on a miss or expiry"""
+        now = datetime.utcnow()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            session, valid_until = entry
+            if now > valid_until:
+                self._remove(token)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return session
+
+    def put(self, token: str, session: CachedSession):
+        """Cache a session that was just validated against the database"""
+        if self.max_size <= 0:
+            return
+
+        valid_until = min(datetime.utcnow() + self.ttl, session.expires_at)
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+            self._entries[token] = (session, valid_until)
+            self._tokens_by_user.setdefault(session.user_id, set()).add(token)
+
+            # Evict least recently used entries
+            while len(self._entries) > self.max_size:
+                oldest_token = next(iter(self._entries))
+                self._remove(oldest_token)
+
+    def invalidate(self, token: str):
+        """Drop a single token (logout, expiry)"""
+        with self._lock:
+            self._remove(token)
+
+    def invalidate_user(self, user_id: int):
+        """Drop every cached token belonging to a user (login replaces old sessions)"""
+        with self._lock:
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._remove(token)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _remove(self, token: str):
+        # Caller must hold the lock
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        user_id = entry[0].user_id
+        tokens = self._tokens_by_user.get(user_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user_id]
+
+
+# Shared cache used by the API
+session_cache = SessionCache()
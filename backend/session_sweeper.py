@@ -0,0 +1,108 @@
+"""
+Expired session cleanup for Wellness Arcade
+Deletes expired sessions in chunks with set-based DELETE statements and runs
+the sweep periodically from an asyncio background task. With several workers
+only the one holding the sweeper lock sweeps.
+"""
+
+import asyncio
+import os
+import random
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import delete, select
+
+from coordination import LeaderLock
+from database import UserSession, open_async_session
+
+# Sweeper configuration
+SESSION_SWEEP_INTERVAL_SECONDS = float(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "3600"))
+SESSION_SWEEP_JITTER = float(os.getenv("SESSION_SWEEP_JITTER", "0.1"))  # fraction of the interval
+SESSION_SWEEP_CHUNK_SIZE = int(os.getenv("SESSION_SWEEP_CHUNK_SIZE", "5000"))
+SESSION_SWEEP_STARTUP_DELAY_SECONDS = float(os.getenv("SESSION_SWEEP_STARTUP_DELAY_SECONDS", "5"))
+
+
+async def delete_expired_sessions(chunk_size: int = SESSION_SWEEP_CHUNK_SIZE) -> dict:
+    """Delete expired sessions chunk by chunk; returns rows deleted and duration"""
+    started = time.perf_counter()
+    now = datetime.utcnow()
+    deleted = 0
+
+    async with open_async_session() as db:
+        while True:
+            # Each chunk is its own short transaction so writers are never
+            # blocked for the whole sweep; expires_at is indexed
+            expired_ids = select(UserSession.id).where(UserSession.expires_at < now).limit(chunk_size)
+            result = await db.execute(delete(UserSession).where(UserSession.id.in_(expired_ids.scalar_subquery())))
+            await db.commit()
+            deleted += result.rowcount
+            if result.rowcount < chunk_size:
+                break
+
+    return {"deleted": deleted, "duration_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+
+class SessionSweeper:
+    """Runs delete_expired_sessions shortly after startup and then on a jittered interval"""
+
+    def __init__(self, interval_seconds: float = SESSION_SWEEP_INTERVAL_SECONDS, jitter: float = SESSION_SWEEP_JITTER,
+                 startup_delay_seconds: float = SESSION_SWEEP_STARTUP_DELAY_SECONDS):
+        self.interval_seconds = interval_seconds
+        self.jitter = jitter
+        self.startup_delay_seconds = startup_delay_seconds
+        self.sweeps = 0
+        self.total_deleted = 0
+        self.last_sweep: Optional[dict] = None
+        self.leader_lock = LeaderLock("session_sweeper")
+        self._task: Optional[asyncio.Task] = None
+
+    async def sweep(self) -> dict:
+        result = await delete_expired_sessions()
+        self.sweeps += 1
+        self.total_deleted += result["deleted"]
+        self.last_sweep = {**result, "finished_at": datetime.utcnow().isoformat()}
+        print(f"Session sweep deleted {result['deleted']} expired sessions in {result['duration_ms']} ms")
+        return result
+
+    async def run(self):
+        # The first sweep clears whatever expired while the service was down;
+        # only the later ones are jittered so replicas drift apart
+        await asyncio.sleep(self.startup_delay_seconds)
+        while True:
+            try:
+                # Other workers skip the sweep until the leader exits
+                if await asyncio.to_thread(self.leader_lock.acquire):
+                    await self.sweep()
+            except Exception as e:
+                print(f"Error cleaning up expired sessions: {e}")
+            await asyncio.sleep(self.interval_seconds * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def start(self):
+        if self.interval_seconds <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.leader_lock.release)
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval_seconds,
+            "leader": self.leader_lock.is_leader,
+            "sweeps": self.sweeps,
+            "total_deleted": self.total_deleted,
+            "last_sweep": self.last_sweep,
+        }
+
+
+# Shared sweeper used by the API
+session_sweeper = SessionSweeper()
@@ -0,0 +1,151 @@
+"""
+Static frontend assets for Wellness Arcade
+Files are read once at startup, content-hashed and precompressed (gzip, and
+brotli when the brotli package is installed) so requests are served from
+memory. HTML references to /static/<name> are rewritten to hashed names that
+are cached as immutable; everything else revalidates cheaply with its ETag.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import mimetypes
+import os
+from typing import Dict, NamedTuple, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip variants are always built
+    brotli = None
+
+STATIC_PREFIX = "/static/"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Smaller files are not worth a compressed variant
+MIN_COMPRESS_BYTES = 256
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+
+class Asset(NamedTuple):
+    content_type: str
+    etag: str  # content hash; variants append their encoding
+    variants: Dict[str, bytes]  # encoding ("identity", "gzip", "br") -> body
+    cache_control: str
+
+
+def content_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()[:12]
+
+
+def hashed_name(path: str, digest: str) -> str:
+    """style.css -> style.<digest>.css"""
+    root, extension = os.path.splitext(path)
+    return f"{root}.{digest}{extension}"
+
+
+def build_variants(body: bytes, content_type: str) -> Dict[str, bytes]:
+    variants = {"identity": body}
+    if len(body) < MIN_COMPRESS_BYTES or not content_type.startswith(COMPRESSIBLE_TYPES):
+        return variants
+    compressed = gzip.compress(body, compresslevel=9, mtime=0)
+    if len(compressed) < len(body):
+        variants["gzip"] = compressed
+    if brotli is not None:
+        compressed = brotli.compress(body, quality=11)
+        if len(compressed) < len(body):
+            variants["br"] = compressed
+    return variants
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> set:
+    """Encodings the client accepts with a non-zero quality"""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticAssets:
+    """In-memory, precompressed copy of the frontend directory"""
+
+    def __init__(self):
+        self.assets: Dict[str, Asset] = {}
+        self.hashed_names: Dict[str, str] = {}  # original relative path -> hashed relative path
+        self._loading: Optional[asyncio.Task] = None
+
+    def load(self, directory: str) -> int:
+        """Read and prepare every file under directory; returns the number of files"""
+        bodies = {}
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                full_path = os.path.join(root, filename)
+                relative_path = os.path.relpath(full_path, directory).replace(os.sep, "/")
+                with open(full_path, "rb") as f:
+                    bodies[relative_path] = f.read()
+
+        assets: Dict[str, Asset] = {}
+        hashed_names: Dict[str, str] = {}
+        # Hash the referenced files first so HTML can point at their hashed names
+        for path, body in bodies.items():
+            if not path.endswith(".html"):
+                hashed_names[path] = hashed_name(path, content_hash(body))
+        for path, body in bodies.items():
+            if path.endswith(".html"):
+                text = body.decode("utf-8")
+                for original, hashed in hashed_names.items():
+                    text = text.replace(f'"{STATIC_PREFIX}{original}"', f'"{STATIC_PREFIX}{hashed}"')
+                body = text.encode("utf-8")
+            content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            if content_type.startswith("text/") or content_type == "application/javascript":
+                content_type += "; charset=utf-8"
+            variants = build_variants(body, content_type)
+            digest = content_hash(body)
+            # Unhashed names stay valid (revalidated); hashed names never change
+            assets[path] = Asset(content_type, digest, variants, REVALIDATE_CACHE_CONTROL)
+            if path in hashed_names:
+                assets[hashed_names[path]] = Asset(content_type, digest, variants, IMMUTABLE_CACHE_CONTROL)
+
+        self.assets = assets
+        self.hashed_names = hashed_names
+        return len(bodies)
+
+    def start_loading(self, directory: str):
+        """Load in a worker thread so startup does not wait on compression"""
+        self._loading = asyncio.create_task(self._load_in_background(directory))
+
+    async def _load_in_background(self, directory: str):
+        loaded = await asyncio.to_thread(self.load, directory)
+        print(f"Loaded {loaded} static assets from {directory}")
+
+    async def wait_until_loaded(self):
+        if self._loading is not None:
+            await asyncio.shield(self._loading)
+
+    def get(self, path: str) -> Optional[Asset]:
+        return self.assets.get(path)
+
+    def select(self, asset: Asset, accept_encoding: Optional[str], if_none_match: Optional[str]) -> Tuple[int, Dict[str, str], bytes]:
+        """Status, headers and body for a request; 304 when the client's copy is current"""
+        accepted = accepted_encodings(accept_encoding)
+        encoding = next((coding for coding in ("br", "gzip") if coding in asset.variants and coding in accepted), "identity")
+        etag = f'"{asset.etag}"' if encoding == "identity" else f'"{asset.etag}-{encoding}"'
+        headers = {"ETag": etag, "Cache-Control": asset.cache_control, "Vary": "Accept-Encoding"}
+
+        if if_none_match:
+            client_tags = {tag.strip().removeprefix("W/").strip('"') for tag in if_none_match.split(",")}
+            if "*" in client_tags or any(tag.split("-")[0] == asset.etag for tag in client_tags):
+                return 304, headers, b""
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        headers["Content-Type"] = asset.content_type
+        return 200, headers, asset.variants[encoding]
+
+
+# Shared asset store used by the API
+static_assets = StaticAssets()
@@ -0,0 +1,86 @@
+"""
+Token revocation for JWT authentication in Wellness Arcade
+Signed tokens are verified without database access, so logout and re-login
+revoke them through a per-user "revoked before" timestamp. Tokens issued
+before that time are rejected. The timestamps live in users.tokens_revoked_before
+and are mirrored in memory, refreshed periodically so other workers see them.
+The worker that handles the logout rejects the old tokens at once; every other
+worker keeps accepting them until its next refresh, so a revoked token can stay
+usable for up to JWT_REVOCATION_REFRESH_SECONDS.
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import select, update
+
+from auth_utils import utc_timestamp
+from database import User, open_async_session
+
+# Also the longest a revoked token stays usable on other workers
+JWT_REVOCATION_REFRESH_SECONDS = float(os.getenv("JWT_REVOCATION_REFRESH_SECONDS", "30"))
+
+# Only revocations younger than the longest token lifetime can still matter
+TOKEN_LIFETIME = timedelta(hours=24)
+
+
+class TokenRevocations:
+    """In-memory map of user id -> revoked-before timestamp backed by the users table"""
+
+    def __init__(self, refresh_seconds: float = JWT_REVOCATION_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._revoked_before: Dict[int, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def is_revoked(self, user_id: int, issued_at: float) -> bool:
+        revoked_before = self._revoked_before.get(user_id)
+        return revoked_before is not None and issued_at < revoked_before
+
+    async def revoke_user(self, user_id: int, db):
+        """Revoke every token issued to a user up to now"""
+        now = datetime.utcnow()
+        await db.execute(update(User).where(User.id == user_id).values(tokens_revoked_before=now))
+        await db.commit()
+        self._revoked_before[user_id] = utc_timestamp(now)
+
+    async def refresh(self):
+        """Merge recent revocations from the database into the in-memory map"""
+        cutoff = datetime.utcnow() - TOKEN_LIFETIME
+        async with open_async_session() as db:
+            rows = (await db.execute(select(User.id, User.tokens_revoked_before).where(
+                User.tokens_revoked_before > cutoff
+            ))).all()
+        # Keep the later of both, so a revoke_user() that lands while the query runs is not lost
+        for user_id, revoked_before in rows:
+            timestamp = utc_timestamp(revoked_before)
+            self._revoked_before[user_id] = max(timestamp, self._revoked_before.get(user_id, timestamp))
+        oldest = utc_timestamp(cutoff)
+        for user_id in [user_id for user_id, timestamp in self._revoked_before.items() if timestamp <= oldest]:
+            del self._revoked_before[user_id]
+
+    async def run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Error refreshing token revocations: {e}")
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Shared revocation list used by the API
+token_revocations = TokenRevocations()
@@ -0,0 +1,357 @@
+"""
+Write-behind event buffer for Wellness Arcade
+With WRITE_BEHIND_ENABLED, log endpoints acknowledge an event as soon as it
+is queued in memory. A background flusher commits queued events in groups
+(every WRITE_BEHIND_FLUSH_MS or WRITE_BEHIND_BATCH_SIZE logs, whichever
+comes first), so many logs share one transaction. Reads combine the stored
+rows with this process's pending events, so a user always sees their own
+writes. Pending events are flushed on shutdown; a crash loses at most the
+events queued since the last flush.
+
+Logs are acknowledged with the count this process stored at its last flush
+plus its pending increments, without a read. That is only right while this
+process is the sole writer, so write-behind takes a leader lock at startup
+and a second process using the same database writes directly instead. A batch that keeps failing is split in
+halves so the logs around a bad one still commit, and a single log that fails
+WRITE_BEHIND_MAX_RETRIES times is dropped to the dead-letter log rather than
+blocking everything queued behind it.
+"""
+
+import asyncio
+import json
+import os
+import time
+from datetime import date
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from coordination import LeaderLock
+from database import open_async_session
+
+# Write-behind configuration
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() == "true"
+WRITE_BEHIND_FLUSH_MS = float(os.getenv("WRITE_BEHIND_FLUSH_MS", "50"))
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500"))  # logs per transaction
+WRITE_BEHIND_QUEUE_SIZE = int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", "10000"))  # logs queued before callers flush
+WRITE_BEHIND_MAX_STALENESS_MS = float(os.getenv("WRITE_BEHIND_MAX_STALENESS_MS", "5000"))
+WRITE_BEHIND_MAX_RETRIES = int(os.getenv("WRITE_BEHIND_MAX_RETRIES", "5"))  # failed commits before a batch is split
+WRITE_BEHIND_DEAD_LETTER_FILE = os.getenv("WRITE_BEHIND_DEAD_LETTER_FILE", "")  # JSON lines; always printed too
+
+# Longest pause between retries while the database is failing
+MAX_RETRY_DELAY_SECONDS = 5.0
+
+# (user_id, date, data_type)
+PendingKey = Tuple[int, str, str]
+
+# Stores {key: (increment, payloads)} without committing and returns the new count per key
+EventWriter = Callable[[Dict[PendingKey, list], AsyncSession], Awaitable[Dict[PendingKey, int]]]
+
+# Called with the same groups and the new counts once they are committed
+CommitListener = Callable[[Dict[PendingKey, list], Dict[PendingKey, int]], Awaitable[None]]
+
+T = TypeVar("T")
+
+
+class PendingWrite(NamedTuple):
+    key: PendingKey
+    payloads: List[dict]
+    increment: int
+    queued_at: float  # time.monotonic()
+    sequence: int  # increases with every append, so a flush can stop at what was queued when it began
+
+
+class WriteBuffer:
+    """Bounded in-memory queue of log events committed in groups by a background task"""
+
+    def __init__(self, enabled: bool = WRITE_BEHIND_ENABLED, flush_ms: float = WRITE_BEHIND_FLUSH_MS,
+                 batch_size: int = WRITE_BEHIND_BATCH_SIZE, queue_size: int = WRITE_BEHIND_QUEUE_SIZE,
+                 max_staleness_ms: float = WRITE_BEHIND_MAX_STALENESS_MS, max_retries: int = WRITE_BEHIND_MAX_RETRIES,
+                 dead_letter_file: str = WRITE_BEHIND_DEAD_LETTER_FILE):
+        self.enabled = enabled
+        self.flush_seconds = flush_ms / 1000
+        self.batch_size = max(1, batch_size)
+        self.queue_size = max(1, queue_size)
+        self.max_staleness_seconds = max_staleness_ms / 1000
+        self.max_retries = max(1, max_retries)
+        self.dead_letter_file = dead_letter_file
+        self.flushes = 0
+        self.flushed_logs = 0
+        self.failed_flushes = 0
+        self.caller_flushes = 0
+        self.read_retries = 0
+        self.largest_batch = 0
+        self.dead_lettered = 0
+        self.last_flush_ms: Optional[float] = None
+        self._queue: List[PendingWrite] = []
+        # While a failing batch is split, commits are smaller than batch_size
+        # until its logs are committed or dropped (_isolating counts them)
+        self._commit_size = self.batch_size
+        self._isolating = 0
+        self._head_failures = 0
+        # Per key: [pending increment, pending payloads] until the flush commits
+        self._pending: Dict[PendingKey, list] = {}
+        # Stored count per key as returned by this process's last flush, so
+        # logs are acknowledged without a read (today's keys only)
+        self._stored: Dict[PendingKey, int] = {}
+        self._stored_day: Optional[str] = None
+        # Odd while a batch is being committed; readers retry if it changed
+        # under them so a batch is never counted as both stored and pending
+        self._commit_sequence = 0
+        self._appended = 0
+        self.owner_lock = LeaderLock("write_behind")
+        self._writer: Optional[EventWriter] = None
+        self._on_commit: Optional[CommitListener] = None
+        self._task: Optional[asyncio.Task] = None
+        self._create_primitives()
+
+    def _create_primitives(self):
+        # Created again in start() so they belong to the serving event loop
+        self._batch_ready = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._committed = asyncio.Condition()
+
+    def _needs_flush(self) -> bool:
+        return bool(self._queue) and (
+            len(self._queue) >= self.queue_size
+            or time.monotonic() - self._queue[0].queued_at > self.max_staleness_seconds
+        )
+
+    async def append(self, user_id: int, day: str, data_type: str, payloads: List[dict], increment: int,
+                     db: AsyncSession) -> Optional[int]:
+        """Queue events for a user and return the count to acknowledge (stored
+        plus pending), or None when this process has not stored the key yet.
+        When the queue is full, or its oldest log is older than the staleness
+        limit, the caller first commits the queue on its own session: producers
+        slow down to database speed and flush errors reach them instead of
+        piling up."""
+        while self._needs_flush():
+            self.caller_flushes += 1
+            await self.flush(db)
+        key = (user_id, day, data_type)
+        self._appended += 1
+        self._queue.append(PendingWrite(key, payloads, increment, time.monotonic(), self._appended))
+        pending = self._pending.setdefault(key, [0, []])
+        pending[0] += increment
+        pending[1].extend(payloads)
+        if len(self._queue) >= self.batch_size:
+            self._batch_ready.set()
+        stored = self._stored.get(key)
+        return None if stored is None else stored + pending[0]
+
+    def pending_count(self, user_id: int, day: str, data_type: str) -> int:
+        pending = self._pending.get((user_id, day, data_type))
+        return pending[0] if pending else 0
+
+    def pending_events(self, user_id: int, day: str, data_type: str) -> List[dict]:
+        pending = self._pending.get((user_id, day, data_type))
+        return list(pending[1]) if pending else []
+
+    def pending_types(self, user_id: int, day: str) -> List[str]:
+        """Data types with queued events for a user on a day"""
+        return [key[2] for key in self._pending if key[0] == user_id and key[1] == day]
+
+    def forget_stored(self, user_id: int, day: str, data_types: List[str]):
+        """Drop remembered counts changed outside the buffer (such as a reset)"""
+        for data_type in data_types:
+            self._stored.pop((user_id, day, data_type), None)
+
+    async def consistent_read(self, read: Callable[[], Awaitable[T]]) -> T:
+        """Run read(), which queries stored rows and then adds pending events,
+        again if a batch was committed meanwhile; readers never block commits"""
+        if not self.enabled:
+            return await read()
+        while True:
+            if self._commit_sequence % 2:
+                async with self._committed:
+                    await self._committed.wait_for(lambda: self._commit_sequence % 2 == 0)
+            sequence = self._commit_sequence
+            result = await read()
+            if self._commit_sequence == sequence:
+                return result
+            self.read_retries += 1
+
+    async def flush(self, db: Optional[AsyncSession] = None):
+        """Commit everything queued so far on db (or a new session); logs
+        appended meanwhile are left to the next flush, so a caller flushing
+        under load returns. On failure the events stay queued (unless retries
+        ran out) and the error is raised"""
+        if not self._queue:
+            return
+        if db is None:
+            async with open_async_session() as db:
+                await self.flush(db)
+            return
+        last = self._appended
+        while self._queue and self._queue[0].sequence <= last:
+            # Check out a connection before taking the lock (each commit returns
+            # it): the lock holder must never wait for a connection held by
+            # callers waiting for the lock
+            await db.connection()
+            async with self._flush_lock:
+                batch = [item for item in self._queue[:self._commit_size] if item.sequence <= last]
+                if batch:
+                    try:
+                        await self._commit(batch, db)
+                    except Exception as e:
+                        self._batch_failed(batch, e)
+                        raise
+                    del self._queue[:len(batch)]
+                    self._head_failures = 0
+                    self._isolated(len(batch))
+        if len(self._queue) < self.batch_size:
+            self._batch_ready.clear()
+
+    async def _commit(self, batch: List[PendingWrite], db: AsyncSession):
+        started = time.perf_counter()
+        grouped: Dict[PendingKey, list] = {}  # key -> [increment, payloads]
+        for item in batch:
+            group = grouped.setdefault(item.key, [0, []])
+            group[0] += item.increment
+            group[1].extend(item.payloads)
+
+        try:
+            stored = await self._writer(grouped, db)
+            self._commit_sequence += 1
+            try:
+                await db.commit()
+                # Stored rows now include the batch; stop adding it on reads
+                for key, (increment, payloads) in grouped.items():
+                    pending = self._pending[key]
+                    pending[0] -= increment
+                    del pending[1][:len(payloads)]
+                    if not pending[1] and pending[0] == 0:
+                        del self._pending[key]
+                today = date.today().isoformat()
+                if self._stored_day != today:
+                    self._stored.clear()
+                    self._stored_day = today
+                self._stored.update((key, count) for key, count in stored.items() if key[1] == today)
+            finally:
+                self._commit_sequence += 1
+                async with self._committed:
+                    self._committed.notify_all()
+        except Exception:
+            self.failed_flushes += 1
+            await db.rollback()
+            raise
+
+        self.flushes += 1
+        self.flushed_logs += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        if self._on_commit is not None:
+            # The batch is stored; a listener error must not make it retry
+            try:
+                await self._on_commit(grouped, stored)
+            except Exception as e:
+                print(f"Error notifying write-behind commit listener: {e}")
+
+    def _isolated(self, logs: int):
+        self._isolating = max(0, self._isolating - logs)
+        if not self._isolating:
+            self._commit_size = self.batch_size
+
+    def _batch_failed(self, batch: List[PendingWrite], error: Exception):
+        """Count a failed commit of the batch at the head of the queue; once it
+        has failed max_retries times, split it, or drop it if it is one log"""
+        self._head_failures += 1
+        if self._head_failures < self.max_retries:
+            return
+        self._head_failures = 0
+        if len(batch) > 1:
+            self._isolating = self._isolating or len(batch)
+            self._commit_size = max(1, len(batch) // 2)
+            print(f"Write-behind batch of {len(batch)} logs failed {self.max_retries} times; retrying in batches of {self._commit_size}")
+            return
+
+        item = self._queue.pop(0)
+        pending = self._pending[item.key]
+        pending[0] -= item.increment
+        # The head of the queue holds the oldest pending payloads of its key
+        del pending[1][:len(item.payloads)]
+        if not pending[1] and pending[0] == 0:
+            del self._pending[item.key]
+        self._isolated(1)
+        self.dead_lettered += 1
+
+        user_id, day, data_type = item.key
+        record = json.dumps({"user_id": user_id, "date": day, "data_type": data_type, "increment": item.increment,
+                             "payloads": item.payloads, "error": str(error)})
+        print(f"Dead-lettered write-behind log after {self.max_retries} failed commits: {record}")
+        if self.dead_letter_file:
+            try:
+                with open(self.dead_letter_file, "a") as f:
+                    f.write(record + "\n")
+            except OSError as e:
+                print(f"Error writing write-behind dead-letter file: {e}")
+
+    async def run(self):
+        retry_delay = self.flush_seconds
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+                retry_delay = self.flush_seconds
+            except Exception as e:
+                print(f"Error flushing write-behind events ({len(self._queue)} queued): {e}")
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), retry_delay)
+                except asyncio.TimeoutError:
+                    pass
+                retry_delay = min(max(retry_delay * 2, 0.1), MAX_RETRY_DELAY_SECONDS)
+
+    def start(self, writer: EventWriter, on_commit: Optional[CommitListener] = None):
+        """Start the flusher; writer stores a batch of grouped events without
+        committing and on_commit hears about each batch once it is committed"""
+        self._writer = writer
+        self._on_commit = on_commit
+        if not self.enabled or self._task is not None:
+            return
+        if not self.owner_lock.acquire():
+            # Acknowledged counts would miss the other process's logs
+            print("Write-behind is active in another process using this database; this worker writes directly")
+            self.enabled = False
+            return
+        self._create_primitives()
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop the flusher and commit whatever is still queued"""
+        if self._task is not None:
+            # Let a flush in progress finish rather than cancelling it mid-commit
+            self._stopping.set()
+            self._batch_ready.set()
+            await self._task
+            self._task = None
+        if self._queue:
+            queued = len(self._queue)
+            await self.flush()
+            print(f"Flushed {queued} queued write-behind log(s) on shutdown")
+        self.owner_lock.release()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "queued": len(self._queue),
+            "queue_size": self.queue_size,
+            "oldest_queued_ms": round((time.monotonic() - self._queue[0].queued_at) * 1000, 2) if self._queue else 0,
+            "flushes": self.flushes,
+            "flushed_logs": self.flushed_logs,
+            "failed_flushes": self.failed_flushes,
+            "caller_flushes": self.caller_flushes,
+            "read_retries": self.read_retries,
+            "largest_batch": self.largest_batch,
+            "commit_size": self._commit_size,
+            "dead_lettered": self.dead_lettered,
+            "last_flush_ms": self.last_flush_ms or 0,
+        }
+
+
+# Shared buffer used by the API
+write_buffer = WriteBuffer()
@@ -141,17 +141,19 @@ class WellnessAPI {
     }
 
     // Brain puzzle methods
-    async getPuzzles() {
-        return await this.makeRequest('/api/puzzles/');
+    // Sequence puzzles from the server's bank; difficulty is the number of tiles
+    async getPuzzles(difficulty = null, count = 1) {
+        const query = difficulty ? `?difficulty=${difficulty}&count=${count}` : '';
+        return await this.makeRequest('/api/puzzles/' + query);
     }
 
-    async submitPuzzleResponse(puzzleId, userSequence, correct) {
+    // The server checks the answer; a correct one comes back with next_puzzle
+    async submitPuzzleResponse(puzzleId, userSequence) {
         return await this.makeRequest('/api/puzzles/submit/', {
             method: 'POST',
             body: JSON.stringify({
                 puzzle_id: puzzleId,
-                user_sequence: userSequence,
-                correct: correct
+                user_sequence: userSequence
             })
         });
     }
@@ -211,6 +213,96 @@ class WellnessAPI {
         return await this.makeRequest('/api/affirmations/history/');
     }
 
+    // Dashboard: every game's counters for today in one request
+    async getDashboard() {
+        return await this.makeRequest('/api/dashboard/');
+    }
+
+    // Batched logging: events are objects like { type: 'hydration', glasses: 1 }
+    async logEventsBatch(events) {
+        return await this.makeRequest('/api/events/batch/', {
+            method: 'POST',
+            body: JSON.stringify({ events })
+        });
+    }
+
+    // History and streaks: dates are YYYY-MM-DD strings, types an optional array
+    async getStatsHistory(from = null, to = null, types = null) {
+        const params = new URLSearchParams();
+        if (from) params.set('from', from);
+        if (to) params.set('to', to);
+        if (types) params.set('types', types.join(','));
+        const query = params.toString();
+        return await this.makeRequest('/api/stats/history/' + (query ? '?' + query : ''));
+    }
+
+    async getStreaks() {
+        return await this.makeRequest('/api/stats/streaks/');
+    }
+
+    // Live counter updates over Server-Sent Events. handlers: onCounter({data_type, delta, total_today}),
+    // onReset({data_types}) and onResync() when events may have been missed. Returns an object with close()
+    openLiveUpdates(handlers) {
+        if (!this.sessionToken || typeof EventSource === 'undefined') {
+            return null;
+        }
+        let source = null;
+        let retryTimer = null;
+        let closed = false;
+        let connectedBefore = false;
+
+        const reconnectLater = () => {
+            // Stay closed once logged out (a 401 clears the session token)
+            if (!closed && this.sessionToken) {
+                retryTimer = setTimeout(connect, 3000);
+            }
+        };
+
+        const connect = async () => {
+            let ticket;
+            try {
+                // EventSource cannot send an Authorization header, so each connection
+                // is opened with a one-time ticket instead of the session token
+                ticket = (await this.makeRequest('/api/live/ticket/', { method: 'POST' })).ticket;
+            } catch (error) {
+                reconnectLater();
+                return;
+            }
+            if (closed) {
+                return;
+            }
+            source = new EventSource(`${this.baseURL}/api/live/?ticket=${encodeURIComponent(ticket)}`);
+            source.addEventListener('counter', event => handlers.onCounter(JSON.parse(event.data)));
+            source.addEventListener('reset', event => handlers.onReset(JSON.parse(event.data)));
+            source.addEventListener('resync', () => handlers.onResync());
+            // Reload whatever changed while the stream was down
+            source.addEventListener('open', () => {
+                if (connectedBefore) {
+                    handlers.onResync();
+                }
+                connectedBefore = true;
+            });
+            // The ticket is spent, so reconnect with a new one instead of letting the browser retry
+            source.addEventListener('error', () => {
+                source.close();
+                source = null;
+                reconnectLater();
+            });
+        };
+
+        connect();
+        return {
+            close() {
+                closed = true;
+                clearTimeout(retryTimer);
+                if (source) {
+                    source.close();
+                    source = null;
+                }
+            }
+        };
+    }
+
     // Utility methods
     isAuthenticated() {
         return this.sessionToken !== null;
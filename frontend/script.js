@@ -5,6 +5,7 @@ let brainHighScore = 0;
 let moodScenariosCompleted = 0;
 let affirmationsCreated = 0;
 let currentBrainSequence = [];
+let currentPuzzle = null;
 let playerSequence = [];
 let isPlayerTurn = false;
 let sprintCurrentScore = 0;
@@ -21,6 +22,10 @@ const WATER_GOAL = 8;
 let isAuthenticated = false;
 let currentUser = null;
 
+// Live counter updates (EventSource) while logged in
+let liveUpdates = null;
+let puzzleRefreshTimer = null;
+
 // Initialize authentication
 async function initAuth() {
     // console.log('initAuth called, checking authentication...');
@@ -40,11 +45,13 @@ async function initAuth() {
             // Load user's existing wellness data from API
             // console.log('Loading user wellness data...');
             await loadUserWellnessData();
+            startLiveUpdates();
         } catch (error) {
             console.error('Auth check failed:', error);
             // Clear authentication state
             isAuthenticated = false;
             currentUser = null;
+            stopLiveUpdates();
             api.logout();
             updateAuthMenu();
             showUserWelcome();
@@ -141,6 +148,7 @@ function closeAuthDropdown() {
 async function handleLogout() {
     try {
         await api.logout();
+        stopLiveUpdates();
         isAuthenticated = false;
         currentUser = null;
         updateAuthMenu();
@@ -503,18 +511,33 @@ function startGame() {
         tile.classList.add('disabled');
     });
     
-    setTimeout(() => {
-        addToSequence();
-    }, 1000);
+    setTimeout(loadFirstRound, 1000);
 }
 
-function addToSequence() {
-    const newTile = Math.floor(Math.random() * 4) + 1;
-    currentBrainSequence.push(newTile);
-    
+// Rounds come from the server's puzzle bank: each correct answer returns the
+// same sequence one tile longer
+async function loadFirstRound() {
+    try {
+        const response = await api.getPuzzles(1);
+        startRound(response.puzzles[0]);
+    } catch (error) {
+        console.error('Failed to load puzzle:', error);
+        document.getElementById('sprint-message').textContent = 'Could not load a puzzle. Please try again!';
+        document.getElementById('startSprintBtn').disabled = false;
+    }
+}
+
+function startRound(puzzle) {
+    currentPuzzle = puzzle;
+    currentBrainSequence = puzzle.sequence;
     showSequence();
 }
 
+function endSprint() {
+    showGameOverPopup(sprintCurrentScore);
+    document.getElementById('startSprintBtn').disabled = false;
+}
+
 function showSequence() {
     let i = 0;
     const interval = setInterval(() => {
@@ -558,27 +581,30 @@ async function handleTileClick(event) {
             tile.classList.add('disabled');
         });
         
+        // Log the wrong answer so today's run ends on the server too
+        try {
+            await api.submitPuzzleResponse(currentPuzzle.id, playerSequence);
+        } catch (error) {
+            console.error('Failed to log puzzle result:', error);
+        }
+        
         // Update high score if needed BEFORE showing popup
         if (sprintCurrentScore > brainHighScore) {
             brainHighScore = sprintCurrentScore;
-            // Log puzzle result to API if authenticated
-            if (isAuthenticated) {
+            // Without live updates, reload the high score from the API
+            if (!liveUpdates) {
                 try {
-                    await api.submitPuzzleResponse('brain_sprint', [], false); // Log game over
-                    // Reload puzzle data from API to get updated high score
                     const puzzleStatus = await api.getPuzzleStatus();
                     brainHighScore = puzzleStatus.high_score_today;
                 } catch (error) {
-                    console.error('Failed to log puzzle result:', error);
+                    console.error('Failed to load puzzle high score:', error);
                 }
             }
             updateDashboard();
         }
         
         // Show game over popup with updated high score
-        showGameOverPopup(sprintCurrentScore);
-        
-        document.getElementById('startSprintBtn').disabled = false;
+        endSprint();
         return;
     }
     
@@ -587,26 +613,36 @@ async function handleTileClick(event) {
         sprintCurrentScore++;
         document.getElementById('sprint-current-score').textContent = sprintCurrentScore;
         document.getElementById('sprint-message').textContent = 'Correct! Next round...';
+        const answer = playerSequence;
         playerSequence = [];
         isPlayerTurn = false;
         
-        // Log correct answer to API if authenticated
-        if (isAuthenticated) {
-            try {
-                await api.submitPuzzleResponse('brain_sprint', playerSequence, true);
-            } catch (error) {
-                console.error('Failed to log puzzle result:', error);
-            }
-        }
-        
         // Disable tiles while showing next sequence
         document.querySelectorAll('.sprint-tile').forEach(tile => {
             tile.disabled = true;
             tile.classList.add('disabled');
         });
         
+        // The server checks the answer and hands out the next round
+        let nextPuzzle = null;
+        try {
+            const response = await api.submitPuzzleResponse(currentPuzzle.id, answer);
+            nextPuzzle = response.next_puzzle;
+        } catch (error) {
+            console.error('Failed to log puzzle result:', error);
+        }
+        if (!nextPuzzle) {
+            // Longest sequence completed, or the server could not be reached
+            if (sprintCurrentScore > brainHighScore) {
+                brainHighScore = sprintCurrentScore;
+                updateDashboard();
+            }
+            endSprint();
+            return;
+        }
+        
         setTimeout(() => {
-            addToSequence();
+            startRound(nextPuzzle);
         }, 1500);
     }
 }
@@ -701,8 +737,8 @@ function startBreathing() {
             // Log to API if authenticated
             if (isAuthenticated) {
                 try {
-                    await api.logBreathing(16);
-                    breathingSessions++;
+                    const response = await api.logBreathing(16);
+                    breathingSessions = response.total_today;
                     updateDashboard();
                     showAuthStatus('Breathing session logged!', 'success');
                 } catch (error) {
@@ -786,10 +822,8 @@ async function handleMoodSelection(event) {
     // Log mood to API if authenticated
     if (isAuthenticated) {
         try {
-            await api.logEmotion('current_scenario', selectedMood);
-            // Reload mood data from API
-            const moodStatus = await api.getEmotionStatus();
-            moodScenariosCompleted = moodStatus.scenarios_today;
+            const response = await api.logEmotion('current_scenario', selectedMood);
+            moodScenariosCompleted = response.total_today;
             updateDashboard();
         } catch (error) {
             console.error('Failed to log mood:', error);
@@ -914,10 +948,8 @@ async function generateAffirmation() {
     // Save affirmation to API if authenticated
     if (isAuthenticated) {
         try {
-            await api.submitAffirmation(userAffirmation, generatedText);
-            // Reload affirmation data from API
-            const affirmationStatus = await api.getAffirmationStatus();
-            affirmationsCreated = affirmationStatus.affirmations_today;
+            const response = await api.submitAffirmation(userAffirmation, generatedText);
+            affirmationsCreated = response.total_today;
             updateDashboard();
             // console.log('Affirmation saved to API');
         } catch (error) {
@@ -1050,6 +1082,7 @@ document.addEventListener('DOMContentLoaded', function() {
             
             // Load user's existing wellness data from API
             await loadUserWellnessData();
+            startLiveUpdates();
             
             showAuthStatus('Login successful!', 'success');
         } catch (error) {
@@ -1109,35 +1142,15 @@ async function loadUserWellnessData() {
     // console.log('Loading user wellness data from API...');
     
     try {
-        // Load hydration data
-        const hydrationStatus = await api.getHydrationStatus();
-        waterLogged = hydrationStatus.glasses_today;
-        // console.log('Hydration data loaded:', hydrationStatus);
-        
-        // Load brushing data
-        const brushingStatus = await api.getBrushingStatus();
-        brushLogged = brushingStatus.brushing_today;
-        // console.log('Brushing data loaded:', brushingStatus);
-        
-        // Load breathing data
-        const breathingStatus = await api.getBreathingStatus();
-        breathingSessions = breathingStatus.sessions_today;
-        // console.log('Breathing data loaded:', breathingStatus);
-        
-        // Load brain puzzle data
-        const puzzleStatus = await api.getPuzzleStatus();
-        brainHighScore = puzzleStatus.high_score_today;
-        // console.log('Puzzle data loaded:', puzzleStatus);
-        
-        // Load mood data
-        const moodStatus = await api.getEmotionStatus();
-        moodScenariosCompleted = moodStatus.scenarios_today;
-        // console.log('Mood data loaded:', moodStatus);
-        
-        // Load affirmation data
-        const affirmationStatus = await api.getAffirmationStatus();
-        affirmationsCreated = affirmationStatus.affirmations_today;
-        // console.log('Affirmation data loaded:', affirmationStatus);
+        // Load every game's counters in one request
+        const dashboard = await api.getDashboard();
+        waterLogged = dashboard.hydration.glasses_today;
+        brushLogged = dashboard.brushing.brushing_today;
+        breathingSessions = dashboard.breathing.sessions_today;
+        brainHighScore = dashboard.puzzles.high_score_today;
+        moodScenariosCompleted = dashboard.emotions.scenarios_today;
+        affirmationsCreated = dashboard.affirmations.affirmations_today;
+        // console.log('Dashboard data loaded:', dashboard);
         
         // Update dashboard with loaded data
         updateDashboard();
@@ -1162,6 +1175,85 @@ async function loadUserWellnessData() {
     }
 }
 
+// Live updates: counters logged from any tab or device arrive as they are
+// committed, so the page never re-requests status endpoints
+function startLiveUpdates() {
+    stopLiveUpdates();
+    liveUpdates = api.openLiveUpdates({
+        onCounter: applyCounterUpdate,
+        onReset: applyCounterReset,
+        onResync: loadUserWellnessData
+    });
+}
+
+function stopLiveUpdates() {
+    if (liveUpdates) {
+        liveUpdates.close();
+        liveUpdates = null;
+    }
+    clearTimeout(puzzleRefreshTimer);
+}
+
+function applyCounterUpdate(update) {
+    switch (update.data_type) {
+        case 'hydration':
+            waterLogged = update.total_today;
+            break;
+        case 'brushing':
+            brushLogged = update.total_today;
+            break;
+        case 'breathing':
+            breathingSessions = update.total_today;
+            break;
+        case 'emotions':
+            moodScenariosCompleted = update.total_today;
+            break;
+        case 'affirmations':
+            affirmationsCreated = update.total_today;
+            break;
+        case 'puzzles':
+            // The high score depends on the whole day's answers; reload it once per burst
+            clearTimeout(puzzleRefreshTimer);
+            puzzleRefreshTimer = setTimeout(refreshPuzzleHighScore, 1000);
+            return;
+    }
+    refreshCounterViews();
+}
+
+function applyCounterReset(reset) {
+    const counters = {
+        hydration: () => { waterLogged = 0; },
+        brushing: () => { brushLogged = 0; },
+        breathing: () => { breathingSessions = 0; },
+        puzzles: () => { brainHighScore = 0; },
+        emotions: () => { moodScenariosCompleted = 0; },
+        affirmations: () => { affirmationsCreated = 0; }
+    };
+    reset.data_types.forEach(dataType => counters[dataType] && counters[dataType]());
+    refreshCounterViews();
+}
+
+async function refreshPuzzleHighScore() {
+    try {
+        const puzzleStatus = await api.getPuzzleStatus();
+        brainHighScore = puzzleStatus.high_score_today;
+        updateDashboard();
+    } catch (error) {
+        console.error('Failed to load puzzle high score:', error);
+    }
+}
+
+function refreshCounterViews() {
+    // Redraw the open game too, if it shows a counter
+    if (document.getElementById('plant')) {
+        updateHydrationView();
+    } else if (document.getElementById('smile')) {
+        updateSmileView();
+    } else {
+        updateDashboard();
+    }
+}
+
 // Enhanced game functions with API integration
 async function handleWaterLogWithAPI() {
     if (!isAuthenticated) {
@@ -1225,8 +1317,8 @@ async function handleBreathingWithAPI() {
     }
     
     try {
-        await api.logBreathing(30);
-        breathingSessions++;
+        const response = await api.logBreathing(30);
+        breathingSessions = response.total_today;
         updateDashboard();
         showAuthStatus('Breathing session logged!', 'success');
     } catch (error) {
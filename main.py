@@ -1,24 +1,112 @@
 #!/usr/bin/env python3
 """
 Railway entry point for Wellness Arcade
-This file helps Railway detect this as a Python project
+This file helps Railway detect this as a Python project. It runs the one-time
+database setup in this process, then serves the app with WEB_CONCURRENCY
+uvicorn workers. The default is one per available CPU once nothing is
+configured that only works within one process (the in-memory live update
+broker, write-behind logging), and one worker otherwise. On SIGTERM/SIGINT uvicorn
+stops accepting connections, drains in-flight requests for up to
+GRACEFUL_SHUTDOWN_SECONDS and runs each worker's shutdown hook, which closes
+the database pools and the AIML HTTP client.
 """
 
+import secrets
 import sys
 import os
-import subprocess
 
 # Add backend directory to Python path
-backend_path = os.path.join(os.path.dirname(__file__), 'backend')
+backend_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
 sys.path.insert(0, backend_path)
 
 # Change to backend directory
 os.chdir(backend_path)
 
+
+def default_workers() -> int:
+    """Available CPUs, honouring container CPU affinity where supported"""
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def per_process_settings() -> list:
+    """Enabled settings whose state lives in one worker and breaks with several"""
+    from live_updates import PUSH_BROKER, PUSH_ENABLED
+    from write_buffer import WRITE_BEHIND_ENABLED
+
+    settings = []
+    if PUSH_ENABLED and PUSH_BROKER == "memory":
+        settings.append("PUSH_BROKER=memory (live updates only reach streams held by the worker that handled "
+                        "the log; set PUSH_BROKER=postgres or PUSH_ENABLED=false)")
+    if WRITE_BEHIND_ENABLED:
+        settings.append("WRITE_BEHIND_ENABLED=true (reads only include logs queued by the worker serving them)")
+    return settings
+
+
+def check_workers(workers: int):
+    """Refuse worker counts the configuration cannot serve correctly"""
+    if workers <= 1:
+        return
+    settings = per_process_settings()
+    if settings:
+        sys.exit(f"Refusing to start {workers} workers with per-process state: " + "; ".join(settings)
+                 + ". Set WEB_CONCURRENCY=1 or change these settings.")
+
+    auth_mode = os.getenv("AUTH_MODE", "session").lower()
+    if auth_mode == "jwt" and not os.getenv("JWT_SECRET_KEY"):
+        # Every worker must verify the tokens the others sign
+        os.environ["JWT_SECRET_KEY"] = secrets.token_urlsafe(64)
+        print("JWT_SECRET_KEY not set, using one random key for all workers; tokens will not survive a restart")
+    if auth_mode == "session":
+        from session_cache import SESSION_CACHE_TTL_SECONDS
+
+        if SESSION_CACHE_TTL_SECONDS > 0:
+            print(f"Note: with {workers} workers a logged-out or replaced session stays valid on the other "
+                  f"workers for up to SESSION_CACHE_TTL_SECONDS ({SESSION_CACHE_TTL_SECONDS} s)")
+
+
+def select_implementation(env_name: str, preferred: str, fallback: str) -> str:
+    """Use the setting if given, else the faster implementation when it is installed"""
+    choice = os.getenv(env_name, "auto").lower()
+    if choice != "auto":
+        return choice
+    try:
+        __import__(preferred)
+        return preferred
+    except ImportError:
+        return fallback
+
+
 # Import and run the FastAPI app
 if __name__ == "__main__":
     import uvicorn
-    from main import app
-    
+    from database import engine, init_database
+
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    if os.getenv("WEB_CONCURRENCY"):
+        workers = int(os.environ["WEB_CONCURRENCY"])
+    else:
+        workers = 1 if per_process_settings() else default_workers()
+    check_workers(workers)
+    loop = select_implementation("UVICORN_LOOP", "uvloop", "asyncio")
+    http = select_implementation("UVICORN_HTTP", "httptools", "h11")
+    graceful_shutdown_seconds = int(os.getenv("GRACEFUL_SHUTDOWN_SECONDS", "30"))
+
+    # Create tables and run migrations once, before any worker starts;
+    # workers inherit DB_INIT_ON_STARTUP=false and skip it
+    init_database()
+    engine.dispose()
+    os.environ["DB_INIT_ON_STARTUP"] = "false"
+
+    print(f"Starting {workers} worker(s) on port {port} (loop={loop}, http={http})")
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        workers=workers,
+        loop=loop,
+        http=http,
+        timeout_graceful_shutdown=graceful_shutdown_seconds,
+    )